@@ -0,0 +1,93 @@
+"""
+Ahead-of-time generation of JSON schema validators for the xray_settings models.
+
+Every pydantic model defined in `xray_settings.routers` gets an importable module
+in `xray_settings._compiled`, so `validate_input` skips the compilation at runtime.
+The schema is still generated once per model to check the digest of the module.
+
+    python -m xray_settings.build_validators            # (re)generate modules
+    python -m xray_settings.build_validators --check    # exit 1 if any module is stale
+"""
+import argparse
+import importlib
+import inspect
+import re
+import sys
+from pathlib import Path
+from typing import Iterator, Type
+
+import fastjsonschema
+from pydantic import BaseModel
+from xray_settings.validators import COMPILED_PACKAGE, compiled_module_name, schema_digest
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+ROUTERS_DIR = PACKAGE_DIR / "routers"
+OUTPUT_DIR = PACKAGE_DIR / COMPILED_PACKAGE.rsplit(".", 1)[-1]
+
+HEADER = '''"""Generated by `python -m xray_settings.build_validators`. Do not edit."""
+MODEL = "{model}"
+SCHEMA_DIGEST = "{digest}"
+'''
+DIGEST_PATTERN = re.compile(r'^SCHEMA_DIGEST = "([0-9a-f]+)"$', re.MULTILINE)
+
+
+def iter_models() -> Iterator[Type[BaseModel]]:
+    """Pydantic models defined in `xray_settings.routers` and its subdirectories."""
+    for path in sorted(ROUTERS_DIR.rglob("*.py")):
+        relative = path.relative_to(PACKAGE_DIR.parent).with_suffix("")
+        module = importlib.import_module(".".join(relative.parts))
+        for _, obj in inspect.getmembers(module, inspect.isclass):
+            if issubclass(obj, BaseModel) and obj.__module__ == module.__name__:
+                yield obj
+
+
+def render(model: Type[BaseModel]) -> tuple[str, str]:
+    """Returns the schema digest and the module source of the model validator."""
+    schema = model.model_json_schema()
+    digest = schema_digest(schema)
+    header = HEADER.format(model=f"{model.__module__}.{model.__qualname__}", digest=digest)
+    return digest, header + fastjsonschema.compile_to_code(schema)
+
+
+def build() -> int:
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    (OUTPUT_DIR / "__init__.py").write_text('"""Generated validators. Do not edit."""\n')
+
+    generated = {OUTPUT_DIR / "__init__.py"}
+    for model in iter_models():
+        path = OUTPUT_DIR / f"{compiled_module_name(model)}.py"
+        _, source = render(model)
+        path.write_text(source, encoding="utf-8")
+        generated.add(path)
+        print(f"{model.__qualname__} -> {path.relative_to(PACKAGE_DIR.parent)}")
+
+    for path in OUTPUT_DIR.glob("*.py"):
+        if path not in generated:
+            path.unlink()
+    return 0
+
+
+def check() -> int:
+    stale = []
+    for model in iter_models():
+        path = OUTPUT_DIR / f"{compiled_module_name(model)}.py"
+        digest, _ = render(model)
+        found = DIGEST_PATTERN.search(path.read_text(encoding="utf-8")) if path.exists() else None
+        if found is None or found.group(1) != digest:
+            stale.append(model.__qualname__)
+
+    if stale:
+        print(f"Stale validators: {', '.join(stale)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--check", action="store_true", help="only check for stale modules")
+    args = parser.parse_args()
+    sys.exit(check() if args.check else build())
+
+
+if __name__ == "__main__":
+    main()
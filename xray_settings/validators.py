@@ -0,0 +1,129 @@
+"""
+Process-wide registry of compiled JSON schema validators.
+
+`fastjsonschema.compile` generates and `exec`s python source for every call,
+so validators are compiled once per (name, schema digest) and reused.
+Validators of the xray_settings models are loaded from the modules generated by
+`python -m xray_settings.build_validators` when they exist and were generated from
+the current schema of the model, stale modules are ignored with a logged warning.
+"""
+import hashlib
+import importlib
+import json
+import threading
+from typing import Any, Callable, Type
+
+import fastjsonschema
+from loguru import logger
+from pydantic import BaseModel
+
+Validator = Callable[[Any], Any]
+
+COMPILED_PACKAGE = "xray_settings._compiled"
+
+
+def schema_digest(schema: dict) -> str:
+    """Stable digest of a JSON schema, independent of key order."""
+    dumped = json.dumps(schema, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha1(dumped.encode("utf-8")).hexdigest()
+
+
+def compiled_module_name(model: Type[BaseModel]) -> str:
+    """Name of the generated validator module of the model, relative to `COMPILED_PACKAGE`."""
+    module = model.__module__.removeprefix("xray_settings.routers.")
+    return f"{module.replace('.', '__')}__{model.__qualname__}"
+
+
+def _load_compiled(model: Type[BaseModel], digest: str) -> Validator | None:
+    try:
+        module = importlib.import_module(f"{COMPILED_PACKAGE}.{compiled_module_name(model)}")
+    except ImportError:
+        return None
+    if getattr(module, "SCHEMA_DIGEST", None) != digest:
+        logger.warning(
+            f"{module.__name__} is stale, compiling {model.__qualname__} at runtime. "
+            "Run `python -m xray_settings.build_validators`.",
+        )
+        return None
+    return module.validate
+
+
+class ValidatorRegistry:
+    """
+    Compiled validators keyed by parameter name plus schema digest.
+
+    Only the latest schema of each name is kept: a lookup with a different digest
+    recompiles and replaces the stale validator.
+    """
+
+    def __init__(self) -> None:
+        self._validators: dict[str, tuple[str, Validator]] = {}
+        self._model_validators: dict[Type[BaseModel], Validator] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.compiled_ahead = 0
+        self.invalidations = 0
+
+    def get(self, name: str, schema: dict) -> Validator:
+        digest = schema_digest(schema)
+        cached = self._validators.get(name)
+        if cached is not None and cached[0] == digest:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        validator = fastjsonschema.compile(schema)
+        with self._lock:
+            self._validators[name] = (digest, validator)
+        return validator
+
+    def get_for_model(self, model: Type[BaseModel]) -> Validator:
+        """Validator of a pydantic model. Model schemas do not change at runtime."""
+        validator = self._model_validators.get(model)
+        if validator is not None:
+            self.hits += 1
+            return validator
+
+        self.misses += 1
+        schema = model.model_json_schema()
+        validator = _load_compiled(model, schema_digest(schema))
+        if validator is not None:
+            self.compiled_ahead += 1
+        else:
+            validator = fastjsonschema.compile(schema)
+        with self._lock:
+            self._model_validators[model] = validator
+        return validator
+
+    def warm(self, name: str, schema: dict | None) -> None:
+        if schema is None:
+            return
+        digest = schema_digest(schema)
+        cached = self._validators.get(name)
+        if cached is not None and cached[0] == digest:
+            return
+        validator = fastjsonschema.compile(schema)
+        with self._lock:
+            self._validators[name] = (digest, validator)
+
+    def invalidate(self, name: str | None = None) -> None:
+        """Drop the validator of `name`, or every validator when `name` is None."""
+        with self._lock:
+            if name is None:
+                self.invalidations += len(self._validators)
+                self._validators.clear()
+            elif self._validators.pop(name, None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._validators) + len(self._model_validators),
+            "hits": self.hits,
+            "misses": self.misses,
+            "compiled_ahead": self.compiled_ahead,
+            "invalidations": self.invalidations,
+        }
+
+
+validator_registry = ValidatorRegistry()
@@ -5,6 +5,7 @@ import fastjsonschema
 from fastapi import HTTPException
 from pydantic import BaseModel
 from pydantic_core import ErrorDetails
+from xray_settings.validators import validator_registry
 
 
 class AuthLevel(enum.Enum):
@@ -20,7 +21,7 @@ class AuthLevel(enum.Enum):
 
 
 async def validate_input(input: dict, model: Type[BaseModel]):
-    validator = fastjsonschema.compile(model.model_json_schema())
+    validator = validator_registry.get_for_model(model)
     try:
         validator(input)
     except fastjsonschema.exceptions.JsonSchemaValueException as err:
@@ -1,3 +1,5 @@
+import uuid
+from datetime import datetime
 from typing import Any, AsyncGenerator
 
 import pytest
@@ -14,6 +16,9 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from xray_swagger.db.dependencies import get_db_session
+from xray_swagger.db.models.mmap_session import MmapSession
+from xray_swagger.db.models.product import Product
+from xray_swagger.db.models.user import User
 from xray_swagger.db.utils import create_database, drop_database
 from xray_swagger.services.redis.dependency import get_redis_pool
 from xray_swagger.settings import settings
@@ -85,6 +90,28 @@ async def dbsession(
         await connection.close()
 
 
+@pytest.fixture
+async def seeded_product(dbsession: AsyncSession) -> tuple[Product, MmapSession]:
+    """
+    Create a product with its author and an mmap session to point inspection sessions at.
+
+    :param dbsession: current session.
+    :return: product and mmap session.
+    """
+    user = User(username=uuid.uuid4().hex, password="-", fullname="-")
+    dbsession.add(user)
+    await dbsession.flush()
+    product = Product(name=uuid.uuid4().hex, creator_id=user.id, last_editor_id=user.id)
+    mmap_session = MmapSession(
+        uuid=uuid.uuid4(),
+        image_s3_key=uuid.uuid4().hex,
+        session_started_at=datetime.utcnow(),
+    )
+    dbsession.add_all([product, mmap_session])
+    await dbsession.flush()
+    return product, mmap_session
+
+
 @pytest.fixture
 async def fake_redis_pool() -> AsyncGenerator[ConnectionPool, None]:
     """
@@ -0,0 +1,111 @@
+"""
+Keyset (cursor) pagination.
+
+A page is read with `WHERE (k1, k2) < (:k1, :k2) ORDER BY k1 DESC, k2 DESC LIMIT n`
+on an index of the keys, so its cost does not depend on how deep the page is.
+The cursor is the key of the boundary row plus the direction, base64 encoded.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Generic, NamedTuple, Sequence, TypeVar
+
+from sqlalchemy import BigInteger, Select, SmallInteger, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+T = TypeVar("T")
+
+NEXT = "n"
+PREV = "p"
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not issued for this ordering."""
+
+
+def _coerce(key: InstrumentedAttribute, value: Any) -> Any:
+    """The cursor value of `key` as its column type, or ValueError / TypeError."""
+    python_type = key.type.python_type
+    if python_type is datetime:
+        parsed = datetime.fromisoformat(value)
+        # 컬럼은 timezone 없는 UTC
+        if parsed.tzinfo is not None:
+            raise ValueError(f"{key.key} must be naive, got {value!r}")
+        return parsed
+    # bool은 int의 subclass지만 key 값이 아니다
+    if not isinstance(value, python_type) or isinstance(value, bool):
+        raise TypeError(f"{key.key} must be {python_type.__name__}, got {value!r}")
+    if python_type is int:
+        bits = 63 if isinstance(key.type, BigInteger) else 31
+        bits = 15 if isinstance(key.type, SmallInteger) else bits
+        if not -(1 << bits) <= value < 1 << bits:
+            raise ValueError(f"{key.key} is out of range, got {value!r}")
+    return value
+
+
+class Page(NamedTuple, Generic[T]):
+    items: list[T]
+    next_cursor: str | None
+    prev_cursor: str | None
+
+
+def _encode(direction: str, key: Sequence[Any]) -> str:
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in key]
+    raw = json.dumps([direction, values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _decode(cursor: str, keys: Sequence[InstrumentedAttribute]) -> tuple[str, list[Any]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, values = json.loads(raw)
+        if direction not in {NEXT, PREV} or len(values) != len(keys):
+            raise InvalidCursor(cursor)
+        return direction, [_coerce(key, value) for key, value in zip(keys, values)]
+    except (binascii.Error, ValueError, TypeError) as err:
+        raise InvalidCursor(cursor) from err
+
+
+async def paginate(
+    session: AsyncSession,
+    stmt: Select,
+    keys: Sequence[InstrumentedAttribute],
+    cursor: str | None,
+    limit: int,
+    descending: bool = False,
+) -> Page:
+    """
+    Reads one page of `stmt` ordered by `keys`, which must be unique together.
+
+    :raises InvalidCursor: when `cursor` cannot be decoded for `keys`.
+    """
+    direction, after = _decode(cursor, keys) if cursor else (NEXT, None)
+    # 이전 페이지는 역순으로 읽은 뒤 뒤집는다
+    forward = direction == NEXT
+    ascending = forward != descending
+    if after is not None:
+        row_key = tuple_(*keys)
+        stmt = stmt.where(row_key > tuple_(*after) if ascending else row_key < tuple_(*after))
+    stmt = stmt.order_by(*(key.asc() if ascending else key.desc() for key in keys))
+
+    raw = await session.execute(stmt.limit(limit + 1))
+    items = list(raw.scalars().all())
+    has_more = len(items) > limit
+    items = items[:limit]
+    if not forward:
+        items.reverse()
+    if not items:
+        return Page(items, None, None)
+
+    first = [getattr(items[0], key.key) for key in keys]
+    last = [getattr(items[-1], key.key) for key in keys]
+    # 앞으로 읽었으면 이전 페이지는 cursor가 있었을 때만, 뒤로 읽었으면 다음 페이지는 항상 있다
+    has_next = has_more if forward else True
+    has_prev = (after is not None) if forward else has_more
+    return Page(
+        items,
+        _encode(NEXT, last) if has_next else None,
+        _encode(PREV, first) if has_prev else None,
+    )
@@ -2,11 +2,11 @@ from __future__ import annotations
 
 import typing
 
-from loguru import logger
 from sqlalchemy import select
 
 from xray_swagger.db.dao._base import DAOBase
 from xray_swagger.db.models.mmap_session import MmapSession
+from xray_swagger.logging import debug
 
 if typing.TYPE_CHECKING:
     from xray_swagger.web.api.mmap_session.schema import (
@@ -34,6 +34,23 @@ class MmapSessionDAO(DAOBase):
         )
         return raw.scalar()
 
+    async def get_chain(self, first: MmapSession, last: MmapSession) -> list[MmapSession]:
+        """Sessions from `first` through `last` in acquisition order."""
+        raw = await self.session.execute(
+            select(MmapSession)
+            .where(
+                MmapSession.session_started_at >= first.session_started_at,
+                MmapSession.session_started_at <= last.session_started_at,
+            )
+            .order_by(MmapSession.session_started_at, MmapSession.uuid),
+        )
+        chain = list(raw.scalars().fetchall())
+        # 같은 시각에 시작한 session이 있으면 first/last 바깥 것은 제외
+        uuids = [row.uuid for row in chain]
+        if first.uuid not in uuids or last.uuid not in uuids:
+            return []
+        return chain[uuids.index(first.uuid) : uuids.index(last.uuid) + 1]
+
     async def get_all(self) -> list[MmapSession]:
         raw = await self.session.execute(select(MmapSession))
         return list(raw.scalars().fetchall())
@@ -48,17 +65,17 @@ class MmapSessionDAO(DAOBase):
 
     async def update(self, db_obj: MmapSession, payload: MmapSessionUpdateDTO):
         refined_update_fields = payload.model_dump(exclude_unset=True)
-        logger.debug(f"{refined_update_fields=}")
+        debug("refined_update_fields={}", refined_update_fields)
         for k in refined_update_fields.keys():
-            logger.debug(f"{type(db_obj).__name__}.{k} = {db_obj.__getattribute__(k)}")
+            debug("{}.{} = {}", type(db_obj).__name__, k, db_obj.__getattribute__(k))
         # UPDATE FIELDS
         async with self.session.begin_nested():
-            logger.debug(f"=== UPDATE {type(db_obj).__name__} ===")
+            debug("=== UPDATE {} ===", type(db_obj).__name__)
             for k, v in refined_update_fields.items():
                 db_obj.__setattr__(k, v)
 
         for k in refined_update_fields.keys():
-            logger.debug(f"{type(db_obj).__name__}.{k} = {db_obj.__getattribute__(k)}")
+            debug("{}.{} = {}", type(db_obj).__name__, k, db_obj.__getattribute__(k))
 
     async def delete(self, db_obj: MmapSession) -> None:
         async with self.session.begin_nested():
@@ -1,18 +1,31 @@
 from __future__ import annotations
 
 import typing
+from datetime import datetime
+from typing import AsyncIterator
 
-from sqlalchemy import and_, select
+from sqlalchemy import and_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
 
 from xray_swagger.db.dao._base import DAOBase
+from xray_swagger.db.dao._keyset import Page, paginate
 from xray_swagger.db.models.defect import Defect, DefectCategory
+from xray_swagger.db.models.mmap_session import MmapSession
 from xray_swagger.db.models.product import InspectionSession, Product
+from xray_swagger.logging import debug
 
 # import sqlalchemy.orm as orm
 
 
 if typing.TYPE_CHECKING:
-    from xray_swagger.web.api.products.schema import InspectionSessionDTO, ProductDTO
+    from xray_swagger.web.api.products.schema import (
+        DefectCreateDTO,
+        InspectionSessionCreateDTO,
+        InspectionSessionDTO,
+        ProductDTO,
+        SessionDefectCreateDTO,
+    )
 
 
 __all__ = (
@@ -25,7 +38,7 @@ class ProductDAO(DAOBase):
     async def create(self, payload: "ProductDTO") -> Product:
         async with self.session.begin_nested():
             new_product = Product(**payload.model_dump(exclude_none=True))
-            print(new_product)
+            debug("{}", new_product)
             self.session.add(new_product)
         return new_product
 
@@ -37,9 +50,8 @@ class ProductDAO(DAOBase):
         )
         return raw.scalar()
 
-    async def get_all(self, offset: int = 0, limit: int = 20) -> list[Product]:
-        raw = await self.session.execute(select(Product).offset(offset).limit(limit))
-        return list(raw.scalars().fetchall())
+    async def get_all(self, cursor: str | None = None, limit: int = 20) -> Page[Product]:
+        return await paginate(self.session, select(Product), [Product.id], cursor, limit)
 
     async def filter(self, name_query: str) -> list[Product]:
         raw = await self.session.execute(
@@ -52,26 +64,62 @@ class ProductDAO(DAOBase):
     async def update(self, db_obj: Product, update_fields: "ProductDTO") -> Product:
         refined_update_fields = update_fields.model_dump(exclude_none=True)
         for k in refined_update_fields.keys():
-            print(f"{type(db_obj).__name__}.{k} = {db_obj.__getattribute__(k)}")
+            debug("{}.{} = {}", type(db_obj).__name__, k, db_obj.__getattribute__(k))
         # UPDATE FIELDS
         async with self.session.begin_nested():
-            print(f"=== UPDATE {type(db_obj).__name__}")
+            debug("=== UPDATE {}", type(db_obj).__name__)
             for k, v in refined_update_fields.items():
                 db_obj.__setattr__(k, v)
 
         for k in refined_update_fields.keys():
-            print(f"{type(db_obj).__name__}.{k} = {db_obj.__getattribute__(k)}")
+            debug("{}.{} = {}", type(db_obj).__name__, k, db_obj.__getattribute__(k))
         return db_obj
 
 
 class InspectionSessionDAO(DAOBase):
+    # asyncpg의 bind parameter 개수 제한(32767) 안쪽으로 INSERT 하나당 row 수를 제한
+    insert_chunk_size = 1000
+
     async def create(self, payload: "InspectionSessionDTO"):
         async with self.session.begin_nested():
             new_isp_sess = InspectionSession(**payload.model_dump(exclude_none=True))
-            print(new_isp_sess)
+            debug("{}", new_isp_sess)
             self.session.add(new_isp_sess)
         return new_isp_sess
 
+    async def create_many(
+        self,
+        payloads: list["InspectionSessionCreateDTO"],
+    ) -> dict[tuple[str, datetime], int]:
+        """
+        Inserts sessions with multi-row INSERTs, skipping existing rows.
+
+        A session is unique by `(image_s3_key, session_started_at)`: the partition key
+        must be part of every unique constraint of a partitioned table.
+
+        :return: ids of the inserted rows by `(image_s3_key, session_started_at)`.
+        """
+        created: dict[tuple[str, datetime], int] = {}
+        for start in range(0, len(payloads), self.insert_chunk_size):
+            chunk = payloads[start : start + self.insert_chunk_size]
+            raw = await self.session.execute(
+                insert(InspectionSession)
+                .values([payload.model_dump() for payload in chunk])
+                .on_conflict_do_nothing(
+                    index_elements=[
+                        InspectionSession.image_s3_key,
+                        InspectionSession.session_started_at,
+                    ],
+                )
+                .returning(
+                    InspectionSession.image_s3_key,
+                    InspectionSession.session_started_at,
+                    InspectionSession.id,
+                ),
+            )
+            created.update(((key, started_at), row_id) for key, started_at, row_id in raw.tuples())
+        return created
+
     async def get_by_id(self, product_id: int, id: int) -> InspectionSession:
         raw = await self.session.execute(
             select(InspectionSession).where(
@@ -83,19 +131,42 @@ class InspectionSessionDAO(DAOBase):
         )
         return raw.scalar()
 
+    async def get_with_mmap_sessions(
+        self,
+        product_id: int,
+        id: int,
+    ) -> tuple[InspectionSession, MmapSession, MmapSession | None] | None:
+        """The session with its start and end mmap sessions, in one query."""
+        start = aliased(MmapSession)
+        end = aliased(MmapSession)
+        raw = await self.session.execute(
+            select(InspectionSession, start, end)
+            .join(start, start.uuid == InspectionSession.start_mmap_session_uuid)
+            .outerjoin(end, end.uuid == InspectionSession.end_mmap_session_uuid)
+            .where(
+                and_(
+                    InspectionSession.product_id == product_id,
+                    InspectionSession.id == id,
+                ),
+            ),
+        )
+        return raw.tuples().first()
+
     async def get_all(
         self,
         product_id: int,
-        offset: int = 0,
+        cursor: str | None = None,
         limit: int = 20,
-    ) -> list[InspectionSession]:
-        raw = await self.session.execute(
-            select(InspectionSession)
-            .where(InspectionSession.product_id == product_id)
-            .offset(offset)
-            .limit(limit),
+    ) -> Page[InspectionSession]:
+        """Latest sessions first."""
+        return await paginate(
+            self.session,
+            select(InspectionSession).where(InspectionSession.product_id == product_id),
+            [InspectionSession.session_started_at, InspectionSession.id],
+            cursor,
+            limit,
+            descending=True,
         )
-        return list(raw.scalars().fetchall())
 
     async def filter(self, product_id: int) -> list[InspectionSession]:
         raw = await self.session.execute(
@@ -105,28 +176,120 @@ class InspectionSessionDAO(DAOBase):
         )
         return list(raw.scalars().fetchall())
 
+    async def iter_with_mmap_sessions(
+        self,
+        product_id: int,
+        since: datetime,
+        until: datetime,
+        batch_size: int = 100,
+    ) -> AsyncIterator[list[tuple[InspectionSession, MmapSession, MmapSession | None]]]:
+        """
+        Sessions started in [since, until) with their mmap sessions, oldest first.
+
+        Batches are read by keyset on (session_started_at, id), so only one is held at a time.
+        """
+        start = aliased(MmapSession)
+        end = aliased(MmapSession)
+        stmt = (
+            select(InspectionSession, start, end)
+            .join(start, start.uuid == InspectionSession.start_mmap_session_uuid)
+            .outerjoin(end, end.uuid == InspectionSession.end_mmap_session_uuid)
+            .where(
+                InspectionSession.product_id == product_id,
+                InspectionSession.session_started_at >= since,
+                InspectionSession.session_started_at < until,
+            )
+            .order_by(InspectionSession.session_started_at, InspectionSession.id)
+            .limit(batch_size)
+        )
+        key = tuple_(InspectionSession.session_started_at, InspectionSession.id)
+        after = None
+        while True:
+            page = stmt if after is None else stmt.where(key > tuple_(*after))
+            rows = list((await self.session.execute(page)).tuples().all())
+            if not rows:
+                return
+            last = rows[-1][0]
+            after = (last.session_started_at, last.id)
+            yield rows
+
 
 class DefectDAO(DAOBase):
-    async def create(self, payload: "Defect"):
+    async def create(self, payload: "DefectCreateDTO", isp_sess: InspectionSession):
         async with self.session.begin_nested():
-            new_isp_sess = Defect(**payload.model_dump(exclude_none=True))
-            print(new_isp_sess)
-            self.session.add(new_isp_sess)
-        return new_isp_sess
+            new_defect = Defect(
+                **payload.model_dump(exclude_none=True),
+                session_started_at=isp_sess.session_started_at,
+            )
+            self.session.add(new_defect)
+        debug("new_defect={!r}", new_defect)
+        return new_defect
+
+    async def create_many(
+        self,
+        isp_sess: InspectionSession,
+        payloads: list["SessionDefectCreateDTO"],
+    ) -> list[int]:
+        """Inserts the defects of one inspection session, returning ids in payload order."""
+        if not payloads:
+            return []
+        raw = await self.session.execute(
+            insert(Defect).returning(Defect.id, sort_by_parameter_order=True),
+            [
+                {
+                    **payload.model_dump(),
+                    "product_id": isp_sess.product_id,
+                    "inspection_session_id": isp_sess.id,
+                    "session_started_at": isp_sess.session_started_at,
+                }
+                for payload in payloads
+            ],
+        )
+        return list(raw.scalars().all())
 
     async def filter(
         self,
         product_id: int,
         isp_sess_id: int | None = None,
         defect_category: DefectCategory | None = None,
-    ) -> list[Defect]:
+        cursor: str | None = None,
+        limit: int = 100,
+    ) -> Page[Defect]:
+        """Latest defects first."""
         q = [Defect.product_id == product_id]
         if isp_sess_id:
             q.append(Defect.inspection_session_id == isp_sess_id)
         if defect_category:
             q.append(Defect.defect_category == defect_category)
 
-        raw = await self.session.execute(
+        return await paginate(
+            self.session,
             select(Defect).filter(*q),
+            [Defect.id],
+            cursor,
+            limit,
+            descending=True,
         )
-        return list(raw.scalars().fetchall())
+
+    async def filter_by_sessions(
+        self,
+        product_id: int,
+        isp_sesses: list[InspectionSession],
+    ) -> dict[int, list[Defect]]:
+        """Defects of the sessions by inspection session id, pruned to their partitions."""
+        if not isp_sesses:
+            return {}
+        started = [isp_sess.session_started_at for isp_sess in isp_sesses]
+        raw = await self.session.execute(
+            select(Defect)
+            .where(
+                Defect.product_id == product_id,
+                Defect.inspection_session_id.in_([isp_sess.id for isp_sess in isp_sesses]),
+                Defect.session_started_at.between(min(started), max(started)),
+            )
+            .order_by(Defect.id),
+        )
+        defects: dict[int, list[Defect]] = {}
+        for defect in raw.scalars():
+            defects.setdefault(defect.inspection_session_id, []).append(defect)
+        return defects
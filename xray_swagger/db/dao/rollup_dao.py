@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import and_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from xray_swagger.db.dao._base import DAOBase
+from xray_swagger.db.models.defect import Defect, DefectCategory
+from xray_swagger.db.models.product import InspectionSession
+from xray_swagger.db.models.rollup import (
+    DefectCategoryRollup,
+    DefectRateRollup,
+    RollupGranularity,
+)
+
+__all__ = ("DefectRateRollupDAO",)
+
+
+class DefectRateRollupDAO(DAOBase):
+    """
+    Incremental defect-rate rollups.
+
+    Counters are added with INSERT ... ON CONFLICT DO UPDATE,
+    in the transaction that inserts the sessions and defects.
+    """
+
+    async def _increment(self, model: type, counters: tuple[str, ...], rows: list[dict]) -> None:
+        if not rows:
+            return
+        stmt = insert(model).values(rows)
+        table = model.__table__
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[column.name for column in table.primary_key],
+                set_={name: table.c[name] + stmt.excluded[name] for name in counters},
+            ),
+        )
+
+    async def record_sessions(self, product_id: int, started_at: Iterable[datetime]) -> None:
+        """Counts new inspection sessions of a product."""
+        started_at = list(started_at)
+        rows = []
+        for granularity in RollupGranularity:
+            buckets = Counter(granularity.truncate(ts) for ts in started_at)
+            rows.extend(
+                {
+                    "product_id": product_id,
+                    "granularity": granularity,
+                    "bucket_start": bucket_start,
+                    "session_count": count,
+                    "ng_session_count": 0,
+                }
+                for bucket_start, count in buckets.items()
+            )
+        await self._increment(DefectRateRollup, ("session_count",), rows)
+
+    async def record_defects(
+        self,
+        product_id: int,
+        isp_sess_id: int,
+        categories: Iterable[DefectCategory],
+    ) -> None:
+        """
+        Counts new defects of one inspection session.
+
+        Must run before the defects are inserted: the categories already
+        stored for the session decide whether it is a newly NG session.
+        The session row is locked so concurrent batches of the same session
+        do not both count it.
+        """
+        counts = Counter(categories)
+        if not counts:
+            return
+        started_at = await self.session.scalar(
+            select(InspectionSession.session_started_at)
+            .where(
+                and_(
+                    InspectionSession.product_id == product_id,
+                    InspectionSession.id == isp_sess_id,
+                ),
+            )
+            .with_for_update(),
+        )
+        if started_at is None:
+            return
+        raw = await self.session.execute(
+            select(Defect.defect_category)
+            .where(
+                Defect.inspection_session_id == isp_sess_id,
+                Defect.session_started_at == started_at,
+            )
+            .distinct(),
+        )
+        existing = set(raw.scalars().all())
+
+        rate_rows = []
+        category_rows = []
+        for granularity in RollupGranularity:
+            key = {
+                "product_id": product_id,
+                "granularity": granularity,
+                "bucket_start": granularity.truncate(started_at),
+            }
+            if not existing:
+                rate_rows.append({**key, "session_count": 0, "ng_session_count": 1})
+            category_rows.extend(
+                {
+                    **key,
+                    "defect_category": category,
+                    "defect_count": count,
+                    "ng_session_count": int(category not in existing),
+                }
+                for category, count in counts.items()
+            )
+        await self._increment(DefectRateRollup, ("ng_session_count",), rate_rows)
+        await self._increment(
+            DefectCategoryRollup,
+            ("defect_count", "ng_session_count"),
+            category_rows,
+        )
+
+    async def get_buckets(
+        self,
+        product_id: int,
+        granularity: RollupGranularity,
+        from_: datetime,
+        to: datetime,
+    ) -> tuple[list[DefectRateRollup], list[DefectCategoryRollup]]:
+        """Buckets starting in [truncate(from_), to)."""
+        rate_raw = await self.session.execute(
+            select(DefectRateRollup)
+            .where(
+                DefectRateRollup.product_id == product_id,
+                DefectRateRollup.granularity == granularity,
+                DefectRateRollup.bucket_start >= granularity.truncate(from_),
+                DefectRateRollup.bucket_start < to,
+            )
+            .order_by(DefectRateRollup.bucket_start),
+        )
+        category_raw = await self.session.execute(
+            select(DefectCategoryRollup).where(
+                DefectCategoryRollup.product_id == product_id,
+                DefectCategoryRollup.granularity == granularity,
+                DefectCategoryRollup.bucket_start >= granularity.truncate(from_),
+                DefectCategoryRollup.bucket_start < to,
+            ),
+        )
+        return list(rate_raw.scalars().all()), list(category_raw.scalars().all())
@@ -1,10 +1,10 @@
 from __future__ import annotations
 
 import typing
+from datetime import datetime
 
-import fastjsonschema
-from loguru import logger
-from sqlalchemy import and_, select
+from sqlalchemy import and_, event, select
+from xray_settings.validators import validator_registry
 
 from xray_swagger.db.dao._base import DAOBase
 from xray_swagger.db.models.settings import (
@@ -12,6 +12,7 @@ from xray_swagger.db.models.settings import (
     SettingsProduct,
     SettingsProductParameter,
 )
+from xray_swagger.logging import debug
 
 if typing.TYPE_CHECKING:
     from xray_swagger.web.api.settings.schema import (
@@ -53,7 +54,7 @@ class SettingsProductDAO(DAOBase):
     async def create(self, payload: "FullSettingsProductDTO"):
         async with self.session.begin_nested():
             new_settings_product = SettingsProduct(**payload.model_dump(exclude_unset=True))
-            print(new_settings_product)
+            debug("{}", new_settings_product)
             self.session.add(new_settings_product)
 
     async def filter_by_product(self, product_id: int) -> list[SettingsProduct]:
@@ -79,17 +80,17 @@ class SettingsProductDAO(DAOBase):
 
     async def update(self, db_obj: SettingsProduct, payload: SettingsProductUpdateDTO):
         refined_update_fields = payload.model_dump(exclude_unset=True)
-        logger.debug(f"{refined_update_fields=}")
+        debug("refined_update_fields={}", refined_update_fields)
         for k in refined_update_fields.keys():
-            logger.debug(f"{type(db_obj).__name__}.{k} = {db_obj.__getattribute__(k)}")
+            debug("{}.{} = {}", type(db_obj).__name__, k, db_obj.__getattribute__(k))
         # UPDATE FIELDS
         async with self.session.begin_nested():
-            logger.debug(f"=== UPDATE {type(db_obj).__name__} ===")
+            debug("=== UPDATE {} ===", type(db_obj).__name__)
             for k, v in refined_update_fields.items():
                 db_obj.__setattr__(k, v)
 
         for k in refined_update_fields.keys():
-            logger.debug(f"{type(db_obj).__name__}.{k} = {db_obj.__getattribute__(k)}")
+            debug("{}.{} = {}", type(db_obj).__name__, k, db_obj.__getattribute__(k))
 
 
 class SettingsGlobalDAO(DAOBase):
@@ -106,11 +107,21 @@ class SettingsGlobalDAO(DAOBase):
         return list(raw.scalars().fetchall())
 
     async def update(self, db_obj: SettingsGlobal, update_value) -> None:
-        json_validator = fastjsonschema.compile(db_obj.json_schema)
+        json_validator = validator_registry.get(db_obj.setting_param_name, db_obj.json_schema)
         new_value = json_validator(update_value)
         db_obj.value = new_value
+        # server_onupdate는 DDL에 반영되지 않으므로 직접 갱신한다. (ETag 산정에 사용)
+        db_obj.modified_at = datetime.utcnow()
         await self.session.commit()
         await self.session.refresh(db_obj)
 
 
+@event.listens_for(SettingsProductParameter.json_schema, "set")
+@event.listens_for(SettingsGlobal.json_schema, "set")
+def _invalidate_validator(target, value, oldvalue, initiator) -> None:
+    """스키마가 변경된 설정의 validator를 registry에서 제거한다."""
+    if target.setting_param_name is not None:
+        validator_registry.invalidate(target.setting_param_name)
+
+
 # class SettingsProductChangelogDAO(IDAO): ...
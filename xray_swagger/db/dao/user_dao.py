@@ -7,6 +7,7 @@ from sqlalchemy import select
 
 from xray_swagger.db.dao._base import DAOBase
 from xray_swagger.db.models.user import AuthLevel, User
+from xray_swagger.logging import debug
 
 if typing.TYPE_CHECKING:
     from xray_swagger.web.api.users.schema import UserUpdateDTO
@@ -35,9 +36,9 @@ class UserDAO(DAOBase):
             authlevel=authlevel,
         )
         self.session.add(new_user)
-        print(f"{new_user.id=}")
+        debug("new_user.id={}", new_user.id)
         await self.session.flush()
-        print(f"{new_user.id=}")
+        debug("new_user.id={}", new_user.id)
         return new_user
 
     async def get_by_id(self, id: int) -> User:
@@ -57,15 +58,15 @@ class UserDAO(DAOBase):
     async def update(self, db_obj: User, update_fields: UserUpdateDTO) -> User:
         refined_update_fields = update_fields.model_dump(exclude_unset=True)
         for k in refined_update_fields.keys():
-            print(f"{type(db_obj).__name__}.{k} = {db_obj.__getattribute__(k)}")
+            debug("{}.{} = {}", type(db_obj).__name__, k, db_obj.__getattribute__(k))
         # UPDATE FIELDS
         async with self.session.begin_nested():
-            print(f"=== UPDATE {type(db_obj).__name__}")
+            debug("=== UPDATE {}", type(db_obj).__name__)
             for k, v in refined_update_fields.items():
                 db_obj.__setattr__(k, v)
 
         for k in refined_update_fields.keys():
-            print(f"{type(db_obj).__name__}.{k} = {db_obj.__getattribute__(k)}")
+            debug("{}.{} = {}", type(db_obj).__name__, k, db_obj.__getattribute__(k))
         return db_obj
 
     async def delete(self, db_obj: User) -> None:
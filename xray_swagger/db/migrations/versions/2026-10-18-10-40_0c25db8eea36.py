@@ -0,0 +1,100 @@
+"""Defect rate rollups
+
+Revision ID: 0c25db8eea36
+Revises: 3089411c15aa
+Create Date: 2026-10-18 10:40:12.381104
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0c25db8eea36"
+down_revision = "3089411c15aa"
+branch_labels = None
+depends_on = None
+
+GRANULARITIES = {"HOUR": "hour", "DAY": "day"}
+
+
+def upgrade() -> None:
+    rollupgranularity = postgresql.ENUM("HOUR", "DAY", name="rollupgranularity")
+    rollupgranularity.create(op.get_bind())
+    granularity = postgresql.ENUM(name="rollupgranularity", create_type=False)
+    defectcategory = postgresql.ENUM(name="defectcategory", create_type=False)
+
+    op.create_table(
+        "defect_rate_rollup",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("granularity", granularity, nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("session_count", sa.Integer(), nullable=False),
+        sa.Column("ng_session_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["product_id"],
+            ["product.id"],
+        ),
+        sa.PrimaryKeyConstraint("product_id", "granularity", "bucket_start"),
+    )
+    op.create_table(
+        "defect_category_rollup",
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("granularity", granularity, nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("defect_category", defectcategory, nullable=False),
+        sa.Column("defect_count", sa.Integer(), nullable=False),
+        sa.Column("ng_session_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["product_id"],
+            ["product.id"],
+        ),
+        sa.PrimaryKeyConstraint("product_id", "granularity", "bucket_start", "defect_category"),
+    )
+
+    # 기존 이력 backfill
+    # session_started_at은 timezone 없는 UTC이므로 date_trunc 결과가 naive_utc로 자른 bucket과 같다
+    for name, unit in GRANULARITIES.items():
+        op.execute(
+            sa.text(
+                f"""
+                INSERT INTO defect_rate_rollup
+                    (product_id, granularity, bucket_start, session_count, ng_session_count)
+                SELECT
+                    s.product_id,
+                    '{name}',
+                    date_trunc('{unit}', s.session_started_at),
+                    count(*),
+                    count(*) FILTER (
+                        WHERE EXISTS (SELECT 1 FROM defect d WHERE d.inspection_session_id = s.id)
+                    )
+                FROM inspection_session s
+                GROUP BY 1, 2, 3
+                """,
+            ),
+        )
+        op.execute(
+            sa.text(
+                f"""
+                INSERT INTO defect_category_rollup
+                    (product_id, granularity, bucket_start, defect_category,
+                     defect_count, ng_session_count)
+                SELECT
+                    s.product_id,
+                    '{name}',
+                    date_trunc('{unit}', s.session_started_at),
+                    d.defect_category,
+                    count(*),
+                    count(DISTINCT s.id)
+                FROM defect d
+                JOIN inspection_session s ON s.id = d.inspection_session_id
+                GROUP BY 1, 2, 3, 4
+                """,
+            ),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("defect_category_rollup")
+    op.drop_table("defect_rate_rollup")
+    op.execute(sa.text("DROP TYPE IF EXISTS rollupgranularity;"))
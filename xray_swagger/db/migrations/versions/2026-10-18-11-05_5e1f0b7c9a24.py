@@ -0,0 +1,58 @@
+"""Filter indexes of defect, inspection_session and mmap_session
+
+Revision ID: 5e1f0b7c9a24
+Revises: 0c25db8eea36
+Create Date: 2026-10-18 11:05:41.802217
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5e1f0b7c9a24"
+down_revision = "0c25db8eea36"
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    (
+        "idx_defect_product_session_category",
+        "defect",
+        ["product_id", "inspection_session_id", "defect_category"],
+        {},
+    ),
+    ("idx_defect_product_category", "defect", ["product_id", "defect_category"], {}),
+    ("idx_defect_session_category", "defect", ["inspection_session_id", "defect_category"], {}),
+    (
+        "idx_inspection_session_product_started",
+        "inspection_session",
+        ["product_id", "session_started_at", "id"],
+        {},
+    ),
+    (
+        "idx_mmap_session_preserved",
+        "mmap_session",
+        ["session_started_at"],
+        {"postgresql_where": sa.text("is_preserved")},
+    ),
+)
+
+
+def upgrade() -> None:
+    # 운영 중인 테이블을 잠그지 않도록 CONCURRENTLY (transaction 밖에서 실행)
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                **kwargs,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
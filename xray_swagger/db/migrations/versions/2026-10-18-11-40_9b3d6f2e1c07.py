@@ -0,0 +1,54 @@
+"""Defect indexes ordered by id for keyset pagination
+
+Revision ID: 9b3d6f2e1c07
+Revises: 5e1f0b7c9a24
+Create Date: 2026-10-18 11:40:27.514390
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9b3d6f2e1c07"
+down_revision = "5e1f0b7c9a24"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "idx_defect_product_id",
+            "defect",
+            ["product_id", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "idx_defect_product_category_id",
+            "defect",
+            ["product_id", "defect_category", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "idx_defect_product_category",
+            table_name="defect",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "idx_defect_product_category",
+            "defect",
+            ["product_id", "defect_category"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "idx_defect_product_category_id",
+            table_name="defect",
+            postgresql_concurrently=True,
+        )
+        op.drop_index("idx_defect_product_id", table_name="defect", postgresql_concurrently=True)
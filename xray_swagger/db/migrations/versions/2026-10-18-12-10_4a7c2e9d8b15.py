@@ -0,0 +1,193 @@
+"""Partition inspection_session and defect by month
+
+Revision ID: 4a7c2e9d8b15
+Revises: 9b3d6f2e1c07
+Create Date: 2026-10-18 12:10:03.128774
+
+"""
+from datetime import date, datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4a7c2e9d8b15"
+down_revision = "9b3d6f2e1c07"
+branch_labels = None
+depends_on = None
+
+# 이 revision 시점의 값으로 고정. 이후 달의 파티션은 partition manager가
+# settings.partition_months_ahead에 따라 만든다.
+MONTHS_AHEAD = 3
+
+INSPECTION_SESSION_COLUMNS = """
+    id INTEGER NOT NULL DEFAULT nextval('inspection_session_id_seq'),
+    product_id INTEGER NOT NULL REFERENCES product (id),
+    image_s3_key VARCHAR(512) NOT NULL,
+    session_started_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    session_ended_at TIMESTAMP WITHOUT TIME ZONE,
+    system_error TEXT,
+    start_mmap_session_uuid UUID NOT NULL REFERENCES mmap_session (uuid),
+    start_mmap_session_ptr INTEGER NOT NULL,
+    end_mmap_session_uuid UUID REFERENCES mmap_session (uuid),
+    end_mmap_session_ptr INTEGER
+"""
+DEFECT_COLUMNS = """
+    id INTEGER NOT NULL DEFAULT nextval('defect_id_seq'),
+    defect_category defectcategory NOT NULL,
+    inspection_module VARCHAR(128) NOT NULL,
+    coordinates JSON,
+    product_id INTEGER NOT NULL REFERENCES product (id),
+    inspection_session_id INTEGER NOT NULL
+"""
+INSPECTION_SESSION_FIELDS = (
+    "id, product_id, image_s3_key, session_started_at, session_ended_at, system_error, "
+    "start_mmap_session_uuid, start_mmap_session_ptr, end_mmap_session_uuid, end_mmap_session_ptr"
+)
+DEFECT_FIELDS = "id, defect_category, inspection_module, coordinates, product_id"
+
+INDEXES = {
+    "inspection_session": (
+        ("ix_inspection_session_id", "id"),
+        ("idx_inspection_session_product_started", "product_id, session_started_at, id"),
+    ),
+    "defect": (
+        ("ix_defect_id", "id"),
+        (
+            "idx_defect_product_session_category",
+            "product_id, inspection_session_id, defect_category",
+        ),
+        ("idx_defect_product_id", "product_id, id"),
+        ("idx_defect_product_category_id", "product_id, defect_category, id"),
+        ("idx_defect_session_category", "inspection_session_id, defect_category"),
+    ),
+}
+
+
+# xray_swagger.db.partitions의 이 revision 시점 사본. migration은 이후 변경에 영향받지 않아야 한다.
+def month_start(ts: date) -> date:
+    return date(ts.year, ts.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def _detach_old(table: str) -> None:
+    # 기존 테이블은 복사가 끝난 뒤 지운다. 이름이 겹치는 index/sequence 소유권을 먼저 정리.
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    op.execute(f"ALTER TABLE {table}_old RENAME CONSTRAINT {table}_pkey TO {table}_old_pkey")
+    for name, _ in INDEXES[table]:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def _create_indexes(table: str) -> None:
+    for name, columns in INDEXES[table]:
+        op.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+def upgrade() -> None:
+    _detach_old("defect")
+    _detach_old("inspection_session")
+
+    op.execute(
+        f"""
+        CREATE TABLE inspection_session ({INSPECTION_SESSION_COLUMNS},
+            PRIMARY KEY (id, session_started_at),
+            UNIQUE (image_s3_key, session_started_at)
+        ) PARTITION BY RANGE (session_started_at)
+        """,
+    )
+    op.execute(
+        f"""
+        CREATE TABLE defect ({DEFECT_COLUMNS},
+            session_started_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, session_started_at),
+            FOREIGN KEY (inspection_session_id, session_started_at)
+                REFERENCES inspection_session (id, session_started_at)
+        ) PARTITION BY RANGE (session_started_at)
+        """,
+    )
+    _create_indexes("inspection_session")
+    _create_indexes("defect")
+
+    # 기존 데이터의 첫 달부터 MONTHS_AHEAD 개월 뒤까지 월 파티션 + DEFAULT 파티션
+    now = month_start(datetime.utcnow())
+    oldest = op.get_bind().scalar(
+        sa.text("SELECT min(session_started_at) FROM inspection_session_old"),
+    )
+    month = month_start(oldest) if oldest else now
+    while month <= add_months(now, MONTHS_AHEAD):
+        for table in ("inspection_session", "defect"):
+            op.execute(
+                f"CREATE TABLE {partition_name(table, month)} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')",
+            )
+        month = add_months(month, 1)
+    for table in ("inspection_session", "defect"):
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+    op.execute(
+        f"INSERT INTO inspection_session ({INSPECTION_SESSION_FIELDS}) "  # noqa: S608
+        f"SELECT {INSPECTION_SESSION_FIELDS} FROM inspection_session_old",
+    )
+    op.execute(
+        f"""
+        INSERT INTO defect ({DEFECT_FIELDS}, inspection_session_id, session_started_at)
+        SELECT {', '.join(f'd.{field}' for field in DEFECT_FIELDS.split(', '))},
+            d.inspection_session_id, s.session_started_at
+        FROM defect_old d JOIN inspection_session_old s ON s.id = d.inspection_session_id
+        """,
+    )
+
+    op.execute("DROP TABLE defect_old")
+    op.execute("DROP TABLE inspection_session_old")
+    op.execute("ALTER SEQUENCE inspection_session_id_seq OWNED BY inspection_session.id")
+    op.execute("ALTER SEQUENCE defect_id_seq OWNED BY defect.id")
+
+
+def downgrade() -> None:
+    for table in ("defect", "inspection_session"):
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+        for name, _ in INDEXES[table]:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    op.execute(
+        f"""
+        CREATE TABLE inspection_session ({INSPECTION_SESSION_COLUMNS},
+            PRIMARY KEY (id),
+            UNIQUE (image_s3_key)
+        )
+        """,
+    )
+    op.execute(
+        f"""
+        CREATE TABLE defect ({DEFECT_COLUMNS} REFERENCES inspection_session (id),
+            PRIMARY KEY (id)
+        )
+        """,
+    )
+    _create_indexes("inspection_session")
+    _create_indexes("defect")
+
+    op.execute(
+        f"INSERT INTO inspection_session ({INSPECTION_SESSION_FIELDS}) "  # noqa: S608
+        f"SELECT {INSPECTION_SESSION_FIELDS} FROM inspection_session_partitioned",
+    )
+    op.execute(
+        f"INSERT INTO defect ({DEFECT_FIELDS}, inspection_session_id) "  # noqa: S608
+        f"SELECT {DEFECT_FIELDS}, inspection_session_id FROM defect_partitioned",
+    )
+
+    # 파티션은 부모 테이블과 함께 삭제된다
+    op.execute("DROP TABLE defect_partitioned")
+    op.execute("DROP TABLE inspection_session_partitioned")
+    op.execute("ALTER SEQUENCE inspection_session_id_seq OWNED BY inspection_session.id")
+    op.execute("ALTER SEQUENCE defect_id_seq OWNED BY defect.id")
@@ -1,7 +1,19 @@
 import enum
 import typing
 
-from sqlalchemy import JSON, Column, Enum, ForeignKey, Integer, String
+from sqlalchemy import (
+    DDL,
+    JSON,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    ForeignKeyConstraint,
+    Index,
+    Integer,
+    String,
+    event,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from xray_swagger.db.base import Base
@@ -27,12 +39,35 @@ class Defect(Base):
         ForeignKey("product.id"),
         nullable=False,
     )
-    inspection_session_id = Column(
-        Integer,
-        ForeignKey("inspection_session.id"),
-        nullable=False,
-    )
+    inspection_session_id = Column(Integer, nullable=False)
+    # inspection_session과 같은 파티션 키. session의 값을 그대로 복사한다.
+    session_started_at = Column(DateTime, primary_key=True)
     inspection_session: Mapped["InspectionSession"] = relationship(
         back_populates="defects",
     )
-    # TODO: Index("idx_product_param", product_id, inspection_session_id, defect_category)
+    __table_args__ = (
+        ForeignKeyConstraint(
+            [inspection_session_id, session_started_at],
+            ["inspection_session.id", "inspection_session.session_started_at"],
+        ),
+        # DefectDAO.filter: product / product + session / product + session + category
+        Index(
+            "idx_defect_product_session_category",
+            product_id,
+            inspection_session_id,
+            defect_category,
+        ),
+        # DefectDAO.filter: 최신순 페이지네이션 (product / product + category)
+        Index("idx_defect_product_id", product_id, id),
+        Index("idx_defect_product_category_id", product_id, defect_category, id),
+        # session 단위 조회 (집계, FK join)
+        Index("idx_defect_session_category", inspection_session_id, defect_category),
+        {"postgresql_partition_by": "RANGE (session_started_at)"},
+    )
+
+
+event.listen(
+    Defect.__table__,
+    "after_create",
+    DDL("CREATE TABLE %(table)s_default PARTITION OF %(table)s DEFAULT"),
+)
@@ -1,6 +1,6 @@
 import typing
 
-from sqlalchemy import UUID, Boolean, Column, DateTime, String
+from sqlalchemy import UUID, Boolean, Column, DateTime, Index, String
 
 from xray_swagger.db.base import Base
 
@@ -14,3 +14,8 @@ class MmapSession(Base):
     session_started_at = Column(DateTime, nullable=False)
     session_ended_at = Column(DateTime, nullable=True)
     is_preserved = Column(Boolean, nullable=False, default=True)
+
+    __table_args__ = (
+        # MmapSessionDAO.filter: 보존 중인 session만 (대부분의 row는 보존 해제됨)
+        Index("idx_mmap_session_preserved", session_started_at, postgresql_where=is_preserved),
+    )
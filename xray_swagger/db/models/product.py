@@ -5,11 +5,29 @@ SELECT COUNT(id) FROM ProductInspectionSession
 WHERE
     id NOT IN Contaminant.product_inspection_session
     AND session_ended_at BETWEEN '2011/05/01' AND '2011/05/31';
+
+-> rollup.py의 집계 테이블로 조회 (GET /products/{id}/defect-rate)
+
+InspectionSession, Defect는 session_started_at 기준 월 단위 RANGE 파티션.
+파티션 키가 PK/unique에 포함되어야 하므로 PK는 (id, session_started_at)이다.
+파티션 생성/만료 삭제는 xray_swagger/db/partitions.py 참고.
 """
 
 import typing
 
-from sqlalchemy import UUID, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    DDL,
+    UUID,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    event,
+)
 from sqlalchemy.orm import Mapped, relationship
 
 from xray_swagger.db.base import Base
@@ -33,9 +51,10 @@ class InspectionSession(Base):
     product_id = Column(Integer, ForeignKey("product.id"), nullable=False)
     product = relationship("Product", back_populates="inspection_sessions")
 
-    image_s3_key = Column(String(512), nullable=False, unique=True)
+    image_s3_key = Column(String(512), nullable=False)
 
-    session_started_at = Column(DateTime, nullable=False)
+    # 파티션 키
+    session_started_at = Column(DateTime, primary_key=True)
     session_ended_at = Column(DateTime, nullable=True)
 
     system_error = Column(Text, nullable=True)
@@ -59,3 +78,19 @@ class InspectionSession(Base):
     defects: Mapped["Defect"] = relationship(
         back_populates="inspection_session",
     )
+
+    __table_args__ = (
+        # unique에도 파티션 키가 포함되어야 한다
+        UniqueConstraint(image_s3_key, session_started_at),
+        # 제품별 기간 조회, 최신순 페이지네이션
+        Index("idx_inspection_session_product_started", product_id, session_started_at, id),
+        {"postgresql_partition_by": "RANGE (session_started_at)"},
+    )
+
+
+# create_all로 만든 DB(테스트, 개발)는 월 파티션 없이 DEFAULT 파티션 하나로 동작한다.
+event.listen(
+    InspectionSession.__table__,
+    "after_create",
+    DDL("CREATE TABLE %(table)s_default PARTITION OF %(table)s DEFAULT"),
+)
@@ -0,0 +1,46 @@
+"""
+불량률 집계 테이블.
+
+InspectionSession, Defect가 생성될 때 시간/일 단위 bucket에 누적한다.
+bucket은 InspectionSession.session_started_at(UTC)을 기준으로 자른다.
+defect-rate 조회는 범위 안의 bucket만 읽으므로 이력의 크기와 무관하다.
+"""
+import enum
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer
+
+from xray_swagger.db.base import Base
+from xray_swagger.db.models.defect import DefectCategory
+
+
+class RollupGranularity(enum.Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+    def truncate(self, ts: datetime) -> datetime:
+        """Start of the bucket containing `ts`."""
+        if self is RollupGranularity.DAY:
+            return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+        return ts.replace(minute=0, second=0, microsecond=0)
+
+
+class DefectRateRollup(Base):
+    product_id = Column(Integer, ForeignKey("product.id"), primary_key=True)
+    granularity = Column(Enum(RollupGranularity), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+
+    session_count = Column(Integer, nullable=False, default=0)
+    # defect가 하나 이상 있는 inspection session 수
+    ng_session_count = Column(Integer, nullable=False, default=0)
+
+
+class DefectCategoryRollup(Base):
+    product_id = Column(Integer, ForeignKey("product.id"), primary_key=True)
+    granularity = Column(Enum(RollupGranularity), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    defect_category = Column(Enum(DefectCategory), primary_key=True)
+
+    defect_count = Column(Integer, nullable=False, default=0)
+    # 해당 category의 defect가 하나 이상 있는 inspection session 수
+    ng_session_count = Column(Integer, nullable=False, default=0)
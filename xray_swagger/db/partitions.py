@@ -0,0 +1,171 @@
+"""
+Monthly partitions of `inspection_session` and `defect`.
+
+Both tables are partitioned by RANGE on `session_started_at`, one partition per month
+(`inspection_session_y2023m08`, `defect_y2023m08`, ...).
+The manager creates the partitions of the coming months ahead of the data
+and drops the partitions older than the NG image retention period,
+so expiring a month is a metadata operation instead of a mass DELETE.
+
+Rows outside every monthly partition land in the `*_default` partition.
+The manager does not purge it and reports its rows.
+"""
+import asyncio
+import re
+from datetime import date, datetime, timedelta
+
+from loguru import logger
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection, async_sessionmaker
+from xray_settings.routers.image import NGImageRetentionPeriod
+
+from xray_swagger.db.dao.settings_dao import SettingsGlobalDAO
+from xray_swagger.settings import settings
+
+# defect가 inspection_session을 참조하므로 inspection_session을 먼저 만들고 나중에 지운다.
+PARTITIONED_TABLES = ("inspection_session", "defect")
+RETENTION_SETTING = "Image.NGImageRetentionPeriod"
+# 여러 worker 중 하나만 관리 작업을 수행하도록 하는 advisory lock key
+ADVISORY_LOCK_KEY = 0x78726179  # "xray"
+
+UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(ts: date) -> date:
+    return date(ts.year, ts.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+async def _exists(conn: AsyncConnection, name: str) -> bool:
+    return await conn.scalar(text("SELECT to_regclass(:name)"), {"name": name}) is not None
+
+
+async def create_partitions(conn: AsyncConnection, first: date, last: date) -> list[str]:
+    """Creates the missing monthly partitions from `first` through `last`."""
+    created = []
+    month = month_start(first)
+    while month <= last:
+        for table in PARTITIONED_TABLES:
+            name = partition_name(table, month)
+            if await _exists(conn, name):
+                continue
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(
+                        text(
+                            f"CREATE TABLE {name} PARTITION OF {table} "
+                            f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')",
+                        ),
+                    )
+            except SQLAlchemyError as err:
+                # DEFAULT 파티션에 해당 기간의 row가 이미 있으면 실패한다
+                logger.warning(f"Cannot create partition {name}: {err}")
+                continue
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+async def _partitions(conn: AsyncConnection, table: str) -> dict[str, datetime | None]:
+    """Partitions of `table` with their exclusive upper bound, None for DEFAULT."""
+    raw = await conn.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)",
+        ),
+        {"table": table},
+    )
+    bounds = {}
+    for name, bound in raw.all():
+        found = UPPER_BOUND.search(bound)
+        bounds[name] = datetime.fromisoformat(found.group(1)) if found else None
+    return bounds
+
+
+async def drop_expired_partitions(conn: AsyncConnection, cutoff: datetime) -> list[str]:
+    """Drops the partitions whose every row started before `cutoff`."""
+    dropped = []
+    for table in reversed(PARTITIONED_TABLES):
+        for name, upper in sorted((await _partitions(conn, table)).items()):
+            if upper is None or upper > cutoff:
+                continue
+            try:
+                async with conn.begin_nested():
+                    # 참조되는 파티션은 DETACH 후에 DROP 해야 한다 (defect 파티션이 먼저 지워짐)
+                    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                    await conn.execute(text(f"DROP TABLE {name}"))
+            except SQLAlchemyError as err:
+                logger.warning(f"Cannot drop partition {name}: {err}")
+                continue
+            dropped.append(name)
+    return dropped
+
+
+async def get_retention(session_factory: async_sessionmaker) -> timedelta:
+    """NG image retention period from the global settings, 365 days when unset or invalid."""
+    async with session_factory() as session:
+        row = await SettingsGlobalDAO(session).get(RETENTION_SETTING)
+    try:
+        return NGImageRetentionPeriod.model_validate(row.value if row else None).root
+    except ValidationError:
+        if row is not None:
+            logger.warning(f"Invalid {RETENTION_SETTING}: {row.value!r}")
+        return NGImageRetentionPeriod().root
+
+
+async def maintain_partitions(
+    session_factory: async_sessionmaker,
+    now: datetime | None = None,
+) -> tuple[list[str], list[str]]:
+    """
+    Creates the partitions up to `partition_months_ahead` and drops the expired ones.
+
+    :return: names of the created and dropped partitions.
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - await get_retention(session_factory)
+    async with session_factory() as session:
+        conn = await session.connection()
+        if not await conn.scalar(
+            text("SELECT pg_try_advisory_xact_lock(:key)"),
+            {"key": ADVISORY_LOCK_KEY},
+        ):
+            return [], []
+        created = await create_partitions(
+            conn,
+            month_start(now),
+            add_months(month_start(now), settings.partition_months_ahead),
+        )
+        dropped = await drop_expired_partitions(conn, cutoff)
+        for table in PARTITIONED_TABLES:
+            default = f"{table}_default"
+            if not await _exists(conn, default):
+                continue
+            if await conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {default})")):  # noqa: S608
+                logger.warning(f"{default} has rows outside the monthly partitions")
+        await session.commit()
+    return created, dropped
+
+
+async def run_partition_manager(session_factory: async_sessionmaker) -> None:  # pragma: no cover
+    """Runs `maintain_partitions` every `partition_maintenance_interval` seconds."""
+    while True:
+        try:
+            created, dropped = await maintain_partitions(session_factory)
+        except (SQLAlchemyError, OSError) as err:
+            logger.warning(f"Partition maintenance failed: {err}")
+        else:
+            if created or dropped:
+                logger.info(f"Partitions created: {created}, dropped: {dropped}")
+        await asyncio.sleep(settings.partition_maintenance_interval)
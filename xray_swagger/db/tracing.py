@@ -0,0 +1,195 @@
+"""
+Sampled tracing of the SQL statements executed by the engines of a worker.
+
+Tracing is off until a sample rate above 0 is set, the engine events are not even
+listened to before. A sampled statement is recorded in a ring buffer with
+
+- the fingerprint of the statement, which is the same for every parameter value,
+  literal and length of an `IN` or `VALUES` list;
+- the cursor execution time and the row count reported by the driver;
+- the first frame of this package that led to it, usually a DAO method.
+
+The buffer is per worker process. A sample rate set through `PUT /monitoring/queries`
+is published to every worker, which applies it in `QueryTracer.apply_message`.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sys
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from random import random
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import greenlet
+from sqlalchemy import Engine, event
+
+from xray_swagger.settings import settings
+
+if TYPE_CHECKING:
+    from types import FrameType
+
+    from sqlalchemy.engine import ExecutionContext
+    from sqlalchemy.engine.base import Connection
+    from sqlalchemy.engine.interfaces import DBAPICursor
+
+PACKAGE_DIR = str(Path(__file__).parents[1])
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\$\d+|%s|\?|(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+_IN_LISTS = re.compile(r"\bIN \(\?(?:, \?)*\)", re.IGNORECASE)
+_VALUES_ROWS = re.compile(r"\((\?(?:, \?)*)\)(?:, \(\1\))+")
+_SPACES = re.compile(r"\s+")
+
+
+class QueryTrace(NamedTuple):
+    fingerprint: str
+    statement: str
+    executed_at: datetime
+    duration_ms: float
+    # 드라이버가 알려주지 않으면 None
+    rows: int | None
+    caller: str | None
+
+
+class QueryStatement(NamedTuple):
+    fingerprint: str
+    statement: str
+    count: int
+    total_ms: float
+    max_ms: float
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(statement: str) -> tuple[str, str]:
+    """The fingerprint of a statement and the normalized statement it hashes."""
+    normalized = _SPACES.sub(" ", statement).strip()
+    normalized = _LITERALS.sub("?", normalized)
+    normalized = _IN_LISTS.sub("IN (...)", normalized)
+    normalized = _VALUES_ROWS.sub(r"(\1), ...", normalized)
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest(), normalized
+
+
+def _frame_caller(frame: FrameType | None) -> str | None:
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(PACKAGE_DIR) and path != __file__:
+            module = Path(path).relative_to(PACKAGE_DIR)
+            return f"{module}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def find_caller() -> str | None:
+    """
+    The innermost frame of this package executing the current statement.
+
+    AsyncSession runs the ORM in a child greenlet, whose stack ends where the awaiting
+    coroutine spawned it, so the stacks of the parent greenlets are searched as well.
+    """
+    caller = _frame_caller(sys._getframe(1))  # noqa: WPS437
+    current = greenlet.getcurrent().parent
+    while caller is None and current is not None:
+        caller = _frame_caller(current.gr_frame)
+        current = current.parent
+    return caller
+
+
+class QueryTracer:
+    def __init__(self, size: int) -> None:
+        self.sample_rate = 0.0
+        self._traces: deque[QueryTrace] = deque(maxlen=size)
+
+    @property
+    def size(self) -> int:
+        return self._traces.maxlen or 0
+
+    def set_sample_rate(self, sample_rate: float) -> None:
+        """Traces `sample_rate` of the statements from now on, 0 stops tracing."""
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"sample_rate must be in [0, 1], got {sample_rate}")
+        listening = event.contains(Engine, "before_cursor_execute", self._before)
+        if sample_rate > 0 and not listening:
+            event.listen(Engine, "before_cursor_execute", self._before)
+            event.listen(Engine, "after_cursor_execute", self._after)
+        elif sample_rate == 0 and listening:
+            event.remove(Engine, "before_cursor_execute", self._before)
+            event.remove(Engine, "after_cursor_execute", self._after)
+        self.sample_rate = sample_rate
+
+    def apply_message(self, data: bytes) -> None:
+        """Applies the `{"sample_rate": ...}` message published by any worker."""
+        self.set_sample_rate(json.loads(data)["sample_rate"])
+
+    def _before(
+        self,
+        conn: Connection,
+        cursor: DBAPICursor,
+        statement: str,
+        parameters: Any,
+        context: ExecutionContext | None,
+        executemany: bool,
+    ) -> None:
+        if context is not None and random() < self.sample_rate:
+            context._xray_trace_started = perf_counter()  # noqa: WPS437
+
+    def _after(
+        self,
+        conn: Connection,
+        cursor: DBAPICursor,
+        statement: str,
+        parameters: Any,
+        context: ExecutionContext | None,
+        executemany: bool,
+    ) -> None:
+        started = getattr(context, "_xray_trace_started", None)
+        if started is None:
+            return
+        duration = perf_counter() - started
+        # insertmanyvalues는 같은 context로 batch마다 실행된다
+        del context._xray_trace_started  # noqa: WPS420
+        digest, normalized = fingerprint(statement)
+        rowcount = cursor.rowcount
+        self._traces.append(
+            QueryTrace(
+                digest,
+                normalized,
+                datetime.now(),
+                duration * 1000,
+                rowcount if rowcount >= 0 else None,
+                find_caller(),
+            ),
+        )
+
+    def traces(self) -> list[QueryTrace]:
+        """The recorded statements, latest first."""
+        return list(reversed(self._traces.copy()))
+
+    def statements(self) -> list[QueryStatement]:
+        """The recorded statements grouped by fingerprint, longest total duration first."""
+        grouped: dict[str, list[QueryTrace]] = {}
+        for trace in self._traces.copy():
+            grouped.setdefault(trace.fingerprint, []).append(trace)
+        statements = [
+            QueryStatement(
+                digest,
+                traces[0].statement,
+                len(traces),
+                sum(trace.duration_ms for trace in traces),
+                max(trace.duration_ms for trace in traces),
+            )
+            for digest, traces in grouped.items()
+        ]
+        return sorted(statements, key=lambda statement: statement.total_ms, reverse=True)
+
+    def clear(self) -> None:
+        self._traces.clear()
+
+
+@lru_cache
+def get_query_tracer() -> QueryTracer:
+    return QueryTracer(settings.query_trace_size)
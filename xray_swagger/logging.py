@@ -1,10 +1,30 @@
 import logging
 import sys
-from typing import Union
+from typing import Any, Union
 
 from loguru import logger
 
-from xray_swagger.settings import settings
+from xray_swagger.settings import LogLevel, settings
+
+# loguru의 기본 sink는 DEBUG를 받는다. set_sink가 level에 맞춰 바꾼다
+_debug_enabled = True
+# opt()는 호출마다 Logger를 만든다. sink는 core를 공유하므로 미리 만들어 둔다
+_caller = logger.opt(depth=1)
+_lazy_caller = logger.opt(lazy=True, depth=1)
+
+
+def debug(message: str, *args: Any, lazy: bool = False, **kwargs: Any) -> None:
+    """
+    `logger.debug` that returns before anything is built when DEBUG is not logged.
+
+    Below DEBUG loguru still looks up the caller frame and the time before dropping
+    a message, and f-string arguments are always formatted, so hot paths pass the
+    values to format instead: `debug("{} = {}", user.authlevel, user.authlevel.value)`.
+    Values that are expensive to compute are passed as callables with `lazy=True`:
+    `debug("{}", lambda: pformat(request.scope), lazy=True)`.
+    """
+    if _debug_enabled:
+        (_lazy_caller if lazy else _caller).debug(message, *args, **kwargs)
 
 
 class InterceptHandler(logging.Handler):
@@ -41,6 +61,14 @@ class InterceptHandler(logging.Handler):
         )
 
 
+def set_sink(sink: Any, level: LogLevel) -> None:
+    """Replaces the loguru sinks with `sink`, logging messages from `level` up."""
+    global _debug_enabled  # noqa: WPS420
+    logger.remove()
+    logger.add(sink, level=level.value)
+    _debug_enabled = level in {LogLevel.NOTSET, LogLevel.DEBUG}
+
+
 def configure_logging() -> None:  # pragma: no cover
     """Configures logging."""
     intercept_handler = InterceptHandler()
@@ -56,8 +84,4 @@ def configure_logging() -> None:  # pragma: no cover
     logging.getLogger("uvicorn.access").handlers = [intercept_handler]
 
     # set logs output, level and format
-    logger.remove()
-    logger.add(
-        sys.stdout,
-        level=settings.log_level.value,
-    )
+    set_sink(sys.stdout, settings.log_level)
@@ -0,0 +1 @@
+"""Bearer token service."""
@@ -0,0 +1,101 @@
+"""
+Cost of decoding bearer tokens with and without the token cache, over 1 to N threads.
+
+Every thread authenticates `--requests` requests spread over `--clients` tokens,
+as HMI clients reusing their token, and the decodes per second are reported for
+`jwt.decode` alone and through a `TokenCache`.
+
+    python -m xray_swagger.services.auth.benchmark
+    python -m xray_swagger.services.auth.benchmark --clients 2000 --cache-size 1024 --workers 8
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any, Callable, NamedTuple
+
+import numpy as np
+from jose import jwt
+
+from xray_swagger.services.auth.tokens import TokenCache
+from xray_swagger.web.api.deps import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, SECRET_KEY
+
+
+class BenchmarkResult(NamedTuple):
+    workers: int
+    decoded_per_second: float
+    cached_per_second: float
+    hit_rate: float
+
+
+def _tokens(clients: int) -> list[str]:
+    issued_at = datetime.utcnow()
+    expire = issued_at + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    return [
+        jwt.encode(
+            {"sub": f"operator{client}", "exp": expire, "iat": issued_at},
+            SECRET_KEY,
+            algorithm=ALGORITHM,
+        )
+        for client in range(clients)
+    ]
+
+
+def _rate(decode: Callable[[str], Any], requests: list[list[str]]) -> float:
+    def authenticate(tokens: list[str]) -> None:
+        for token in tokens:
+            decode(token)
+
+    with ThreadPoolExecutor(len(requests)) as pool:
+        started = perf_counter()
+        list(pool.map(authenticate, requests))
+        seconds = perf_counter() - started
+    return sum(map(len, requests)) / seconds
+
+
+def benchmark(
+    tokens: list[str],
+    requests: int,
+    cache_size: int,
+    workers: list[int],
+) -> list[BenchmarkResult]:
+    """Decode rates of `requests` random tokens per thread, for each thread count."""
+    rng = np.random.default_rng(0)
+    results: list[BenchmarkResult] = []
+    for count in workers:
+        load = [
+            [tokens[index] for index in rng.integers(0, len(tokens), requests)]
+            for _ in range(count)
+        ]
+        decoded = _rate(lambda token: jwt.decode(token, SECRET_KEY, [ALGORITHM]), load)
+        cache = TokenCache(cache_size)
+        cached = _rate(lambda token: cache.decode(token, SECRET_KEY, [ALGORITHM]), load)
+        results.append(BenchmarkResult(count, decoded, cached, cache.stats()["hit_rate"]))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200, help="distinct tokens")
+    parser.add_argument("--requests", type=int, default=20000, help="decodes per thread")
+    parser.add_argument("--cache-size", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    tokens = _tokens(args.clients)
+    counts = sorted({1, *(2**power for power in range(args.workers.bit_length())), args.workers})
+
+    print(f"{args.clients} tokens, {args.requests} requests per thread")
+    print(f"{'workers':>8} {'decode/s':>10} {'cached/s':>10} {'speedup':>8} {'hit rate':>9}")
+    for result in benchmark(tokens, args.requests, args.cache_size, counts):
+        print(
+            f"{result.workers:>8} {result.decoded_per_second:>10.0f} "
+            f"{result.cached_per_second:>10.0f} "
+            f"{result.cached_per_second / result.decoded_per_second:>7.1f}x "
+            f"{result.hit_rate:>9.1%}",
+        )
+
+
+if __name__ == "__main__":
+    main()
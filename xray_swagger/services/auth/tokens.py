@@ -0,0 +1,91 @@
+"""
+Memo of verified bearer token claims.
+
+Clients reuse one access token until it expires, so `jwt.decode` would verify the same
+signature and parse the same JSON on every request. The claims of a verified token are
+kept in a bounded LRU keyed by the SHA-256 digest of the key, the algorithms and the token,
+and dropped at the token `exp`. Tokens without `exp` and tokens that fail to verify
+are never kept, so a cached decode fails exactly when `jwt.decode` would.
+"""
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from time import time
+from typing import Any
+
+from jose import jwt
+
+from xray_swagger.settings import settings
+
+
+class TokenCache:
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._claims: OrderedDict[bytes, tuple[float, dict[str, Any]]] = OrderedDict()
+        # sync dependency는 threadpool에서 실행될 수 있다
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(token: str, key: str, algorithms: list[str]) -> bytes:
+        return hashlib.sha256(f"{key}\0{','.join(algorithms)}\0{token}".encode()).digest()
+
+    def _get(self, digest: bytes) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._claims.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if expires_at <= time():
+                del self._claims[digest]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._claims.move_to_end(digest)
+            self.hits += 1
+            return claims
+
+    def _put(self, digest: bytes, claims: dict[str, Any]) -> None:
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)) or self.max_size <= 0:
+            return
+        with self._lock:
+            self._claims[digest] = (expires_at, claims)
+            self._claims.move_to_end(digest)
+            while len(self._claims) > self.max_size:
+                self._claims.popitem(last=False)
+                self.evictions += 1
+
+    def decode(self, token: str, key: str, algorithms: list[str]) -> dict[str, Any]:
+        """
+        Claims of `token`, verified by `jwt.decode` the first time it is seen.
+
+        :raises JWTError: the token is invalid or expired.
+        """
+        digest = self.key(token, key, algorithms)
+        claims = self._get(digest)
+        if claims is None:
+            claims = jwt.decode(token, key, algorithms=algorithms)
+            self._put(digest, claims)
+        return dict(claims)
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._claims),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+@lru_cache
+def get_token_cache() -> TokenCache:
+    return TokenCache(settings.token_cache_size)
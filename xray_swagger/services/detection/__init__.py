@@ -0,0 +1 @@
+"""Rule based contaminant detection service."""
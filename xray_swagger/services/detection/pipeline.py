@@ -0,0 +1,140 @@
+"""
+Rule detectors of a product run in `exec_order` on one frame.
+
+Detectors that smooth or high-pass the frame the same way share those images
+(see `FrameImages`), and the boxes they report are merged into one list of defects.
+"""
+from time import perf_counter
+from typing import Any, Callable, NamedTuple
+
+import numpy as np
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from xray_settings.routers.contaminant.rule import RuleDetectSettingTemplate
+
+from xray_swagger.services.detection.rules import (
+    DETECTORS,
+    Box,
+    FrameImages,
+    template_parameters,
+    union_find,
+)
+
+RULE_SETTING = "Inspection.Contaminant.RuleBased"
+
+_templates = TypeAdapter(list[RuleDetectSettingTemplate])
+
+
+class DetectionError(ValueError):
+    """The rule settings cannot be run."""
+
+
+class RuleDefect(NamedTuple):
+    inspection_module: str
+    coordinates: Box
+
+
+class DetectionStep(NamedTuple):
+    exec_order: int
+    algorithm_name: str
+    detector: Callable[[FrameImages, Any], list[Box]]
+    params: BaseModel
+
+
+def rule_templates(value: Any) -> list[RuleDetectSettingTemplate]:
+    """
+    Templates of a `Inspection.Contaminant.RuleBased` setting value.
+
+    The value is one template or a list of them.
+
+    :raises DetectionError: the value is not a rule setting.
+    """
+    try:
+        return _templates.validate_python(value if isinstance(value, list) else [value])
+    except ValidationError as err:
+        raise DetectionError(str(err)) from err
+
+
+def merge_defects(defects: list[RuleDefect]) -> list[RuleDefect]:
+    """
+    Merges the boxes sharing a pixel into their union, top first.
+
+    A merged defect is credited to the first detector in `defects` that found part of it.
+    """
+    if not defects:
+        return []
+    boxes = np.array([defect.coordinates for defect in defects])
+    left, top, right, bottom = boxes.T
+    # 왼쪽 변 순으로 훑어, 오른쪽 변보다 왼쪽에서 시작하는 뒤의 box만 후보로 삼는다
+    order = np.argsort(left, kind="stable")
+    first = np.arange(1, len(defects) + 1)
+    last = np.searchsorted(left[order], right[order], side="left")
+    counts = np.maximum(last - first, 0)
+    lower = order[np.repeat(np.arange(len(defects)), counts)]
+    upper = order[np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+    overlaps = (
+        (left[lower] < right[upper])
+        & (left[upper] < right[lower])
+        & (top[lower] < bottom[upper])
+        & (top[upper] < bottom[lower])
+    )
+    # 겹치는 box끼리 가장 작은 index로 수렴시킨다
+    labels = union_find(len(defects), lower[overlaps], upper[overlaps])
+
+    owners, labels = np.unique(labels, return_inverse=True)
+    union = np.empty((len(owners), 4), dtype=np.int64)
+    union[:, :2] = np.iinfo(np.int64).max
+    union[:, 2:] = 0
+    for column, reduce in enumerate((np.minimum, np.minimum, np.maximum, np.maximum)):
+        reduce.at(union[:, column], labels, boxes[:, column])
+    order = np.lexsort((union[:, 0], union[:, 1]))
+    return [
+        RuleDefect(defects[owners[index]].inspection_module, union[index].tolist())
+        for index in order
+    ]
+
+
+class DetectionPipeline:
+    """The rule detectors of a product, ready to run on frames."""
+
+    def __init__(self, templates: list[RuleDetectSettingTemplate]) -> None:
+        """
+        :raises DetectionError: two templates share an `exec_order`
+            or parameters do not fit their `algorithm_name`.
+        """
+        ordered = sorted(templates, key=lambda template: template.exec_order)
+        orders = [template.exec_order for template in ordered]
+        if len(set(orders)) != len(orders):
+            raise DetectionError(f"exec_order must be unique, got {orders}")
+
+        self.steps: list[DetectionStep] = []
+        for template in ordered:
+            try:
+                params = template_parameters(template)
+            except ValidationError as err:
+                raise DetectionError(
+                    f"exec_order {template.exec_order} {template.algorithm_name}: {err}",
+                ) from err
+            _, detector = DETECTORS[template.algorithm_name]
+            self.steps.append(
+                DetectionStep(template.exec_order, template.algorithm_name, detector, params),
+            )
+
+    def run(
+        self,
+        frame: np.ndarray,
+        timings: list[tuple[str, float]] | None = None,
+    ) -> list[RuleDefect]:
+        """
+        Merged defects of every detector.
+
+        :param timings: gets the `(algorithm_name, seconds)` of every detector appended.
+        """
+        images = FrameImages(frame)
+        defects: list[RuleDefect] = []
+        for step in self.steps:
+            started = perf_counter()
+            boxes = step.detector(images, step.params)
+            defects.extend(RuleDefect(step.algorithm_name, box) for box in boxes)
+            if timings is not None:
+                timings.append((step.algorithm_name, perf_counter() - started))
+        return merge_defects(defects)
@@ -0,0 +1,314 @@
+"""
+Replays candidate rule settings against the stored inspection sessions of a product.
+
+The images of the sessions started in a time range are streamed through the candidate
+detectors on a process pool and compared with the `defect` rows of every session.
+A box matches a stored defect when they share a pixel.
+The report has one JSON line per session whose defects changed and per skipped session,
+and the verdict flips are summed up at the end.
+
+    python -m xray_swagger.services.detection.replay 3 candidate.json \\
+        --since 2023-08-01 --until 2023-09-01 --out replay.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, NamedTuple, TextIO
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from xray_settings.routers.contaminant.rule import RuleDetectSettingTemplate
+
+from xray_swagger.db.dao.mmap_session_dao import MmapSessionDAO
+from xray_swagger.db.dao.products_dao import DefectDAO, InspectionSessionDAO
+from xray_swagger.db.models.defect import Defect, DefectCategory
+from xray_swagger.services.detection.pipeline import (
+    DetectionError,
+    DetectionPipeline,
+    RuleDefect,
+    rule_templates,
+)
+from xray_swagger.services.detection.rules import Box
+from xray_swagger.services.imaging.preview import decode_scan_lines
+from xray_swagger.services.mmap.reader import (
+    FrameRangeError,
+    FrameSpan,
+    InvalidImageKey,
+    MmapFrameReader,
+    get_frame_reader,
+)
+from xray_swagger.services.mmap.sessions import BrokenSessionChain, isp_sess_spans
+from xray_swagger.settings import settings
+
+
+class ReplayItem(NamedTuple):
+    isp_sess_id: int
+    session_started_at: datetime
+    spans: list[FrameSpan]
+    stored: list[RuleDefect]
+
+
+class SessionDiff(NamedTuple):
+    isp_sess_id: int
+    session_started_at: datetime
+    stored: int
+    replayed: int
+    # 저장된 defect와 겹치지 않는 새 box / 새 box와 겹치지 않는 저장된 defect
+    gained: list[RuleDefect]
+    lost: list[RuleDefect]
+
+    @property
+    def was_ng(self) -> bool:
+        return self.stored > 0
+
+    @property
+    def is_ng(self) -> bool:
+        return self.replayed > 0
+
+
+def match_boxes(left: list[Box], right: list[Box]) -> tuple[np.ndarray, np.ndarray]:
+    """Whether every box of `left` shares a pixel with a box of `right`, and vice versa."""
+    if not left or not right:
+        return np.zeros(len(left), dtype=bool), np.zeros(len(right), dtype=bool)
+    a, b = np.array(left).T, np.array(right).T
+    overlaps = (
+        (a[0][:, None] < b[2])
+        & (b[0] < a[2][:, None])
+        & (a[1][:, None] < b[3])
+        & (b[1] < a[3][:, None])
+    )
+    return overlaps.any(axis=1), overlaps.any(axis=0)
+
+
+def diff_session(item: ReplayItem, replayed: list[RuleDefect]) -> SessionDiff:
+    found, kept = match_boxes(
+        [defect.coordinates for defect in replayed],
+        [defect.coordinates for defect in item.stored],
+    )
+    return SessionDiff(
+        item.isp_sess_id,
+        item.session_started_at,
+        len(item.stored),
+        len(replayed),
+        [defect for defect, matched in zip(replayed, found) if not matched],
+        [defect for defect, matched in zip(item.stored, kept) if not matched],
+    )
+
+
+_worker: tuple[DetectionPipeline, MmapFrameReader, int, int] | None = None
+
+
+def _init_worker(
+    templates: list[dict],
+    reader: MmapFrameReader,
+    width: int,
+    bytes_per_pixel: int,
+) -> None:
+    global _worker  # noqa: WPS420
+    _worker = (DetectionPipeline(rule_templates(templates)), reader, width, bytes_per_pixel)
+
+
+def _detect_session(spans: list[FrameSpan]) -> list[RuleDefect]:
+    pipeline, reader, width, bytes_per_pixel = _worker
+    frame = decode_scan_lines(b"".join(reader.iter_bytes(spans)), width, bytes_per_pixel)
+    return pipeline.run(frame)
+
+
+async def replay_sessions(
+    templates: list[RuleDetectSettingTemplate],
+    items: AsyncIterator[ReplayItem],
+    reader: MmapFrameReader,
+    workers: int,
+) -> AsyncIterator[SessionDiff]:
+    """
+    Diffs of the sessions in the order of `items`.
+
+    Each worker process compiles the detectors once and reads the frames itself.
+    At most two frames per worker are in flight, so `items` is consumed as the workers
+    catch up and memory does not grow with the time range.
+
+    :raises DetectionError: the templates cannot be run.
+    """
+    DetectionPipeline(templates)
+    loop = asyncio.get_running_loop()
+    initargs = (
+        [template.model_dump() for template in templates],
+        reader,
+        settings.mmap_line_width,
+        settings.mmap_bytes_per_pixel,
+    )
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+        pending: deque[tuple[ReplayItem, asyncio.Future]] = deque()
+        async for item in items:
+            pending.append((item, loop.run_in_executor(pool, _detect_session, item.spans)))
+            if len(pending) >= 2 * workers:
+                done, future = pending.popleft()
+                yield diff_session(done, await future)
+        while pending:
+            done, future = pending.popleft()
+            yield diff_session(done, await future)
+
+
+class ReplayReport:
+    """Writes the changed and skipped sessions as JSON lines and counts verdict flips."""
+
+    def __init__(self, out: TextIO) -> None:
+        self.out = out
+        self.counts = dict.fromkeys(
+            (
+                "sessions",
+                "skipped",
+                "ng_before",
+                "ng_after",
+                "ok_to_ng",
+                "ng_to_ok",
+                "gained_defects",
+                "lost_defects",
+            ),
+            0,
+        )
+
+    def _write(self, line: dict) -> None:
+        self.out.write(json.dumps(line) + "\n")
+
+    def skip(self, isp_sess_id: int, reason: str) -> None:
+        self.counts["skipped"] += 1
+        self._write({"isp_sess_id": isp_sess_id, "skipped": reason})
+
+    def add(self, diff: SessionDiff) -> None:
+        self.counts["sessions"] += 1
+        self.counts["ng_before"] += diff.was_ng
+        self.counts["ng_after"] += diff.is_ng
+        self.counts["ok_to_ng"] += diff.is_ng and not diff.was_ng
+        self.counts["ng_to_ok"] += diff.was_ng and not diff.is_ng
+        self.counts["gained_defects"] += len(diff.gained)
+        self.counts["lost_defects"] += len(diff.lost)
+        if diff.gained or diff.lost:
+            verdict = f"{'NG' if diff.was_ng else 'OK'}->{'NG' if diff.is_ng else 'OK'}"
+            self._write(
+                {
+                    "isp_sess_id": diff.isp_sess_id,
+                    "session_started_at": diff.session_started_at.isoformat(),
+                    "verdict": verdict,
+                    "gained": [defect._asdict() for defect in diff.gained],
+                    "lost": [defect._asdict() for defect in diff.lost],
+                },
+            )
+
+
+def _stored_defect(defect: Defect, modules: set[str] | None) -> RuleDefect | None:
+    if defect.defect_category != DefectCategory.CONTAMINANT:
+        return None
+    if modules is not None and defect.inspection_module not in modules:
+        return None
+    coordinates = defect.coordinates
+    if not isinstance(coordinates, list) or len(coordinates) != 4:
+        return None
+    return RuleDefect(defect.inspection_module, [int(value) for value in coordinates])
+
+
+async def stored_sessions(
+    session: AsyncSession,
+    reader: MmapFrameReader,
+    product_id: int,
+    since: datetime,
+    until: datetime,
+    report: ReplayReport,
+    modules: set[str] | None = None,
+    batch_size: int = 100,
+) -> AsyncIterator[ReplayItem]:
+    """
+    The sessions of a product with their stored contaminant defects, oldest first.
+
+    Sessions whose image cannot be read are reported as skipped.
+    `modules` limits the stored defects to those inspection modules.
+    """
+    isp_sess_dao = InspectionSessionDAO(session)
+    mmap_sess_dao = MmapSessionDAO(session)
+    defect_dao = DefectDAO(session)
+    batches = isp_sess_dao.iter_with_mmap_sessions(product_id, since, until, batch_size)
+    async for batch in batches:
+        defects = await defect_dao.filter_by_sessions(product_id, [row[0] for row in batch])
+        for isp_sess, start, end in batch:
+            try:
+                spans = await isp_sess_spans(isp_sess, start, end, mmap_sess_dao, reader)
+            except (BrokenSessionChain, FileNotFoundError, InvalidImageKey, FrameRangeError) as err:
+                report.skip(isp_sess.id, str(err))
+                continue
+            if not sum(span.size for span in spans):
+                report.skip(isp_sess.id, "Empty image")
+                continue
+            stored = [_stored_defect(defect, modules) for defect in defects.get(isp_sess.id, [])]
+            yield ReplayItem(
+                isp_sess.id,
+                isp_sess.session_started_at,
+                spans,
+                [defect for defect in stored if defect is not None],
+            )
+        # 긴 작업 동안 하나의 read snapshot을 잡고 있지 않도록 batch마다 트랜잭션을 끝낸다
+        await session.commit()
+
+
+async def _replay(args: argparse.Namespace, templates: list[RuleDetectSettingTemplate]) -> dict:
+    engine = create_async_engine(str(settings.db_url), echo=settings.db_echo)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    reader = get_frame_reader()
+    try:
+        with open(args.out, "w") as out:
+            report = ReplayReport(out)
+            async with session_factory() as session:
+                items = stored_sessions(
+                    session,
+                    reader,
+                    args.product_id,
+                    args.since,
+                    args.until,
+                    report,
+                    set(args.modules) if args.modules else None,
+                    args.batch_size,
+                )
+                async for diff in replay_sessions(templates, items, reader, args.workers):
+                    report.add(diff)
+        return report.counts
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("product_id", type=int)
+    parser.add_argument(
+        "settings",
+        type=Path,
+        help="candidate RuleDetectSettingTemplate JSON, one template or a list",
+    )
+    parser.add_argument("--since", type=datetime.fromisoformat, required=True)
+    parser.add_argument("--until", type=datetime.fromisoformat, required=True)
+    parser.add_argument("--out", type=Path, default=Path("replay.jsonl"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument(
+        "--modules",
+        nargs="+",
+        help="compare only stored defects of these inspection modules",
+    )
+    args = parser.parse_args()
+
+    try:
+        templates = rule_templates(json.loads(args.settings.read_text()))
+        DetectionPipeline(templates)
+    except DetectionError as err:
+        parser.error(str(err))
+
+    counts = asyncio.run(_replay(args, templates))
+    for name, count in counts.items():
+        print(f"{name:>15} {count:>8}")
+
+
+if __name__ == "__main__":
+    main()
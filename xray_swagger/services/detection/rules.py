@@ -0,0 +1,326 @@
+"""
+NumPy reference implementations of the `xray_settings.routers.contaminant.rule` detectors.
+
+The machine runs the detectors; these follow the parameter descriptions closely enough
+to replay a tuning change against stored images on the server.
+Frames are single channel 8-bit or 16-bit and brightness-like parameters are 8-bit levels,
+so every detector works on the frame scaled to 0-255 (`to_gray`).
+Smoothing and high-pass only average object pixels, darker than the `AIR_LEVEL` background.
+X-ray images are dark where dense: the product is darker than the background
+and a contaminant is darker than the product around it.
+
+Every detector finds the product (`ReduceValue` density), takes a high-pass of the smoothed
+image (local mean - pixel, positive where darker than the neighbourhood),
+thresholds it against the sensitivity, drops the `MaskValue` margins and reports connected
+regions of at least `DetectionArea` pixels as `[left, top, right, bottom]` boxes,
+right and bottom exclusive, like `DefectCreateDTO.coordinates`.
+"""
+from typing import Any, Callable
+
+import numpy as np
+from pydantic import BaseModel
+from xray_settings.routers.contaminant.rule import (
+    Al003e,
+    AlatHP,
+    Aldong1,
+    RuleDetectSettingTemplate,
+)
+
+Box = list[int]
+
+# 이 레벨 이상은 투과한 물체가 없는 배경(공기)으로 보고 필터 평균에서 뺀다
+AIR_LEVEL = 250
+
+
+def to_gray(frame: np.ndarray) -> np.ndarray:
+    """Frame as float32 8-bit levels."""
+    gray = frame.astype(np.float32)
+    if frame.dtype.itemsize > 1:
+        gray *= 255 / np.iinfo(frame.dtype).max
+    return gray
+
+
+def box_sum(image: np.ndarray, dim: int) -> np.ndarray:
+    """
+    Sum over the `dim` x `dim` window of every pixel, from a summed-area table.
+
+    The cost does not depend on `dim`. Even windows are anchored like OpenCV,
+    one more pixel before the centre than after it.
+    Borders are reflected without repeating the edge pixel (`BORDER_REFLECT_101`).
+    """
+    before, after = dim // 2, dim - 1 - dim // 2
+    padded = np.pad(image, ((before, after), (before, after)), mode="reflect")
+    table = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1))
+    np.cumsum(padded, axis=0, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    height, width = image.shape
+    total = table[dim:, dim:] - table[:height, dim:] - table[dim:, :width] + table[:height, :width]
+    return total.astype(np.float32)
+
+
+def box_mean(image: np.ndarray, dim: int) -> np.ndarray:
+    """`cv2.blur` with a `dim` x `dim` window."""
+    if dim <= 1:
+        return image
+    mean = box_sum(image, dim)
+    mean /= dim * dim
+    return mean
+
+
+def object_mask(gray: np.ndarray) -> np.ndarray:
+    """Pixels the beam went through something, anything darker than `AIR_LEVEL`."""
+    return gray < AIR_LEVEL
+
+
+def masked_mean(image: np.ndarray, dim: int, mask: np.ndarray) -> np.ndarray:
+    """
+    Mean of the `mask` pixels in the `dim` x `dim` window of every `mask` pixel.
+
+    Pixels outside `mask` keep their value and never leak into the mean, so the bright air
+    around an object does not make its outline look darker than its surroundings.
+    """
+    weights = mask.astype(np.float32)
+    count = box_sum(weights, dim)
+    mean = box_sum(image * weights, dim)
+    np.divide(mean, count, out=mean, where=count > 0)
+    np.copyto(mean, image, where=~mask)
+    return mean
+
+
+def smooth(gray: np.ndarray, dim: int, objects: np.ndarray) -> np.ndarray:
+    """The `SmoothingDim` image."""
+    if dim <= 1:
+        return gray
+    return masked_mean(gray, dim, objects)
+
+
+def hipass(smoothed: np.ndarray, dim: int, objects: np.ndarray) -> np.ndarray:
+    """How much darker than the objects in its `dim` x `dim` window every pixel is."""
+    response = masked_mean(smoothed, dim, objects)
+    response -= smoothed
+    response[~objects] = 0
+    return response
+
+
+def margin_mask(shape: tuple[int, int], mask_value: list[float]) -> np.ndarray:
+    """Pixels left after removing the `MaskValue` top, bottom, left and right fractions."""
+    height, width = shape
+    top, bottom, left, right = mask_value
+    mask = np.zeros(shape, dtype=bool)
+    mask[
+        round(top * height) : height - round(bottom * height),
+        round(left * width) : width - round(right * width),
+    ] = True
+    return mask
+
+
+def erode(mask: np.ndarray, dim: int, threshold: int) -> np.ndarray:
+    """Keeps the pixels with fewer than `threshold` pixels outside `mask` in their window."""
+    outside = box_sum((~mask).astype(np.float32), dim)
+    return mask & (outside < threshold - 0.5)
+
+
+def dilate(mask: np.ndarray, dim: int) -> np.ndarray:
+    """`cv2.dilate` with a `dim` x `dim` rectangle."""
+    if dim <= 1:
+        return mask
+    return box_sum(mask.astype(np.float32), dim) > 0.5
+
+
+def _runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rows, first and past-the-end columns of the horizontal runs of `mask`, row-major."""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    rows, cols = np.nonzero(np.diff(padded, axis=1))
+    return rows[0::2], cols[0::2], cols[1::2]
+
+
+def _components(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray, width: int) -> np.ndarray:
+    """Component of every run, runs touching the run above them (8-connected) joined."""
+    stride = width + 2
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    above = (rows - 1) * stride
+    # 윗 행에서 [start, end]와 겹치거나 대각선으로 닿는 run 범위
+    first = np.searchsorted(end_keys, above + starts, side="left")
+    last = np.searchsorted(start_keys, above + ends, side="right")
+    counts = np.maximum(last - first, 0)
+    lower = np.repeat(np.arange(len(rows)), counts)
+    upper = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return union_find(len(rows), lower, upper)
+
+
+def union_find(count: int, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """Smallest index of the component of each item, the pairs `lower[i], upper[i]` joined."""
+    labels = np.arange(count)
+    while True:
+        roots_lower, roots_upper = labels[lower], labels[upper]
+        if np.array_equal(roots_lower, roots_upper):
+            return labels
+        np.minimum.at(labels, roots_lower, roots_upper)
+        np.minimum.at(labels, roots_upper, roots_lower)
+        # pointer jumping으로 모든 item이 root를 가리키게 한다
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+
+def label_boxes(mask: np.ndarray, min_area: int) -> list[Box]:
+    """Boxes of the 8-connected regions of `mask` with at least `min_area` pixels, top first."""
+    rows, starts, ends = _runs(mask)
+    if not len(rows):
+        return []
+    _, labels = np.unique(_components(rows, starts, ends, mask.shape[1]), return_inverse=True)
+    count = labels.max() + 1
+    area = np.bincount(labels, weights=ends - starts, minlength=count)
+    boxes = np.empty((count, 4), dtype=np.int64)
+    boxes[:, :2] = np.iinfo(np.int64).max
+    boxes[:, 2:] = 0
+    np.minimum.at(boxes[:, 0], labels, starts)
+    np.minimum.at(boxes[:, 1], labels, rows)
+    np.maximum.at(boxes[:, 2], labels, ends)
+    np.maximum.at(boxes[:, 3], labels, rows + 1)
+    boxes = boxes[area >= min_area]
+    return boxes[np.lexsort((boxes[:, 0], boxes[:, 1]))].tolist()
+
+
+def _sensitive(response: np.ndarray, sensitivity: int, detection_threshold: int) -> np.ndarray:
+    """
+    Pixels whose response passes the detection threshold once scaled by the sensitivity.
+
+    The sensitivity parameters read "smaller is more sensitive" over 1-255,
+    so the response is stretched by `255 / sensitivity` before `DetectionThreshold`.
+    """
+    return response * (255 / sensitivity) >= detection_threshold
+
+
+class FrameImages:
+    """
+    Intermediate images of one frame, each computed once for every detector that needs it.
+
+    Detectors share the smoothed image of the same `SmoothingDim` and the high-pass
+    of the same `SmoothingDim` and `HipassFilterDim`. The images are read-only.
+    """
+
+    def __init__(self, frame: np.ndarray) -> None:
+        self.shape = frame.shape
+        self.gray = to_gray(frame)
+        self.objects = object_mask(self.gray)
+        self._images: dict[tuple, np.ndarray] = {}
+        # 실제로 계산한 중간 이미지의 key, 계산한 순서대로
+        self.computed: list[tuple] = []
+
+    @classmethod
+    def of(cls, frame: "np.ndarray | FrameImages") -> "FrameImages":
+        return frame if isinstance(frame, cls) else cls(frame)
+
+    def _get(self, key: tuple, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        image = self._images.get(key)
+        if image is None:
+            image = self._images[key] = compute()
+            self.computed.append(key)
+        return image
+
+    def smoothed(self, smoothing_dim: int) -> np.ndarray:
+        return self._get(
+            ("smoothed", smoothing_dim),
+            lambda: smooth(self.gray, smoothing_dim, self.objects),
+        )
+
+    def hipass(self, smoothing_dim: int, hipass_dim: int) -> np.ndarray:
+        return self._get(
+            ("hipass", smoothing_dim, hipass_dim),
+            lambda: hipass(self.smoothed(smoothing_dim), hipass_dim, self.objects),
+        )
+
+    def product(self, smoothing_dim: int, reduce_value: int) -> np.ndarray:
+        """Pixels of at least `reduce_value` density once smoothed."""
+        return self._get(
+            ("product", smoothing_dim, reduce_value),
+            lambda: self.smoothed(smoothing_dim) <= 255 - reduce_value,
+        )
+
+    def margins(self, mask_value: list[float]) -> np.ndarray:
+        return self._get(
+            ("margins", *mask_value),
+            lambda: margin_mask(self.shape, mask_value),
+        )
+
+
+def detect_alathp(frame: np.ndarray | FrameImages, params: AlatHP) -> list[Box]:
+    """
+    AlatHP: smoothed high-pass over the whole product.
+
+    `SmoothingDim` smooths the image, `HipassFilterDim` sizes the high-pass,
+    `SmthDim` smooths the high-pass and `SmThThreshold` is the sensitivity.
+    """
+    images = FrameImages.of(frame)
+    response = box_mean(images.hipass(params.SmoothingDim, params.HipassFilterDim), params.SmthDim)
+    found = _sensitive(response, params.SmThThreshold, params.DetectionThreshold)
+    found &= images.product(params.SmoothingDim, params.ReduceValue)
+    found &= images.margins(params.MaskValue)
+    return label_boxes(found, params.DetectionArea)
+
+
+def detect_al003e(frame: np.ndarray | FrameImages, params: Al003e) -> list[Box]:
+    """
+    Al003e: high-pass inside the eroded product, for fine metal in thin regions.
+
+    The product edge is eroded by `ErodeDim` (a pixel stays with fewer than `ErodeThreshold`
+    background pixels around it), `BinaryThreshold` is the sensitivity and `DilateDim`
+    thickens the marks before they are measured.
+    """
+    images = FrameImages.of(frame)
+    response = images.hipass(params.SmoothingDim, params.HipassFilterDim)
+    found = _sensitive(response, params.BinaryThreshold, params.DetectionThreshold)
+    found &= erode(
+        images.product(params.SmoothingDim, params.Reduction1Threshold),
+        params.ErodeDim,
+        params.ErodeThreshold,
+    )
+    found &= images.margins(params.MaskValue)
+    return label_boxes(dilate(found, params.DilateDim), params.DetectionArea)
+
+
+def detect_aldong1(frame: np.ndarray | FrameImages, params: Aldong1) -> list[Box]:
+    """
+    Aldong1: amplified high-pass without isolated pixels, for needles in even products.
+
+    The high-pass is multiplied by `MultiplyValue`, `BinaryThreshold` is the sensitivity
+    and a pixel needs `OZFThreshold` detected pixels in its 3x3 window, itself included.
+    """
+    images = FrameImages.of(frame)
+    response = images.hipass(params.SmoothingDim, params.HipassFilterDim) * params.MultiplyValue
+    found = _sensitive(response, params.BinaryThreshold, params.DetectionThreshold)
+    found &= images.product(params.SmoothingDim, params.ReduceValue)
+    found &= images.margins(params.MaskValue)
+    found &= box_sum(found.astype(np.float32), 3) > params.OZFThreshold - 0.5
+    return label_boxes(found, params.DetectionArea)
+
+
+DETECTORS: dict[str, tuple[type[BaseModel], Callable[[FrameImages, Any], list[Box]]]] = {
+    "AlatHP": (AlatHP, detect_alathp),
+    "Al003e": (Al003e, detect_al003e),
+    "Aldong1": (Aldong1, detect_aldong1),
+}
+
+
+def template_parameters(template: RuleDetectSettingTemplate) -> BaseModel:
+    """
+    `parameters` validated as the model of `algorithm_name`.
+
+    The template validates its parameters against the union, which keeps the first model
+    that fits: Aldong1 parameters left at their defaults come back as AlatHP.
+
+    :raises ValidationError: the parameters do not fit `algorithm_name`.
+    """
+    model, _ = DETECTORS[template.algorithm_name]
+    return model.model_validate(template.parameters.model_dump(exclude_unset=True))
+
+
+def detect(frame: np.ndarray | FrameImages, template: RuleDetectSettingTemplate) -> list[Box]:
+    """Runs the detector of a rule setting on a frame."""
+    _, detector = DETECTORS[template.algorithm_name]
+    return detector(frame, template_parameters(template))
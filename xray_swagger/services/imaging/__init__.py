@@ -0,0 +1 @@
+"""Image encoding service."""
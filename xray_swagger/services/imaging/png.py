@@ -0,0 +1,78 @@
+"""
+Streaming grayscale PNG encoder.
+
+Scan lines are compressed as they arrive, so an image is never held in memory
+as a whole. The acquisition buffers store little-endian pixels, PNG wants them big-endian.
+"""
+import struct
+import zlib
+from array import array
+from typing import Iterable, Iterator
+
+SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# filter type 0 (None) 를 각 scan line 앞에 붙인다
+FILTER_NONE = b"\x00"
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + kind
+        + data
+        + struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)))
+    )
+
+
+def _to_big_endian(data: bytes) -> bytes:
+    # 바이트 순서만 뒤집으므로 host byte order와 무관하다
+    pixels = array("H")
+    pixels.frombytes(data)
+    pixels.byteswap()
+    return pixels.tobytes()
+
+
+def encode_png(
+    lines: Iterable[bytes],
+    width: int,
+    height: int,
+    bytes_per_pixel: int,
+    level: int = 6,
+) -> Iterator[bytes]:
+    """
+    PNG of `height` scan lines of `width` pixels.
+
+    :param lines: raw pixels, each chunk holding whole scan lines.
+    :param bytes_per_pixel: 1 for 8-bit or 2 for 16-bit grayscale.
+    """
+    if bytes_per_pixel not in (1, 2):
+        raise ValueError(f"Unsupported bytes per pixel: {bytes_per_pixel}")
+    # 검증은 스트리밍 시작 전에 끝낸다
+    return _encode(lines, width, height, bytes_per_pixel, level)
+
+
+def _encode(
+    lines: Iterable[bytes],
+    width: int,
+    height: int,
+    bytes_per_pixel: int,
+    level: int,
+) -> Iterator[bytes]:
+    line_bytes = width * bytes_per_pixel
+
+    yield SIGNATURE
+    # width, height, bit depth, color type 0 (grayscale), compression, filter, interlace
+    yield _chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bytes_per_pixel * 8, 0, 0, 0, 0))
+
+    compressor = zlib.compressobj(level)
+    for data in lines:
+        if bytes_per_pixel == 2:
+            data = _to_big_endian(data)
+        filtered = b"".join(
+            FILTER_NONE + data[offset : offset + line_bytes]
+            for offset in range(0, len(data), line_bytes)
+        )
+        compressed = compressor.compress(filtered)
+        if compressed:
+            yield _chunk(b"IDAT", compressed)
+    yield _chunk(b"IDAT", compressor.flush())
+    yield _chunk(b"IEND", b"")
@@ -0,0 +1,99 @@
+"""
+NG image previews for the operator tablets.
+
+The adjustments of `ImageInspectionPreviewPostprocessing` are all integers, 0 meaning untouched:
+
+- `gamma`: exponent `2 ** (-gamma / 100)`, positive values brighten the dark range.
+- `contrast`: percent of slope change around mid gray, clipped to [-100, 100].
+- `inversion`: anything but 0 inverts.
+- `sharpening`: percent of unsharp mask amount over a 3x3 box blur.
+
+Gamma, contrast and inversion are pointwise, so they are folded with the window
+into one lookup table over every input level and applied in a single indexing pass.
+Only sharpening looks at neighbouring pixels.
+"""
+import math
+
+import numpy as np
+from xray_settings.routers.image import ImageInspectionPreviewPostprocessing
+
+from xray_swagger.services.imaging.png import encode_png
+
+PREVIEW_SETTING = "Image.InspectionPreviewPostprocessing"
+
+
+def decode_scan_lines(raw: bytes, width: int, bytes_per_pixel: int) -> np.ndarray:
+    """Read-only 2-D view of little-endian raw scan lines, in native byte order."""
+    if bytes_per_pixel == 1:
+        return np.frombuffer(raw, dtype=np.uint8).reshape(-1, width)
+    pixels = np.frombuffer(raw, dtype="<u2").astype(np.uint16, copy=False)
+    return pixels.reshape(-1, width)
+
+
+def _downscale(image: np.ndarray, max_width: int) -> np.ndarray:
+    """Block mean by the integer factor that fits `max_width`."""
+    factor = math.ceil(image.shape[1] / max_width)
+    if factor <= 1:
+        return image
+    height = image.shape[0] // factor * factor
+    width = image.shape[1] // factor * factor
+    blocks = image[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    return blocks.mean(axis=(1, 3), dtype=np.float32).round().astype(image.dtype)
+
+
+def build_lut(
+    params: ImageInspectionPreviewPostprocessing,
+    levels: int,
+    low: int = 0,
+    high: int | None = None,
+) -> np.ndarray:
+    """8-bit output level of every input level, windowed to [low, high]."""
+    high = levels - 1 if high is None else high
+    x = np.arange(levels, dtype=np.float32)
+    x = np.clip((x - low) / max(high - low, 1), 0, 1)
+    if params.contrast:
+        slope = 1 + max(-100, min(100, params.contrast)) / 100
+        x = np.clip((x - 0.5) * slope + 0.5, 0, 1)
+    if params.gamma:
+        x = x ** np.float32(2 ** (-params.gamma / 100))
+    if params.inversion:
+        x = 1 - x
+    return (x * 255).round().astype(np.uint8)
+
+
+def _sharpen(image: np.ndarray, amount: float) -> np.ndarray:
+    padded = np.pad(image.astype(np.float32), 1, mode="edge")
+    height, width = image.shape
+    blur = sum(
+        padded[row : row + height, col : col + width] for row in range(3) for col in range(3)
+    )
+    blur /= 9
+    sharpened = image + amount * (image - blur)
+    return np.clip(sharpened, 0, 255).round().astype(np.uint8)
+
+
+def render_preview(
+    raw: bytes,
+    width: int,
+    bytes_per_pixel: int,
+    params: ImageInspectionPreviewPostprocessing,
+    max_width: int,
+) -> np.ndarray:
+    """
+    8-bit preview of raw scan lines, at most `max_width` pixels wide.
+
+    The window is stretched over the levels present in the image.
+    """
+    image = _downscale(decode_scan_lines(raw, width, bytes_per_pixel), max_width)
+    if not image.size:
+        return image.astype(np.uint8)
+    lut = build_lut(params, 1 << (8 * bytes_per_pixel), int(image.min()), int(image.max()))
+    preview = lut[image]
+    if params.sharpening > 0:
+        preview = _sharpen(preview, params.sharpening / 100)
+    return preview
+
+
+def preview_png(preview: np.ndarray) -> bytes:
+    height, width = preview.shape
+    return b"".join(encode_png([preview.tobytes()], width, height, 1))
@@ -0,0 +1,105 @@
+"""
+On-disk LRU cache of rendered previews.
+
+Entries are files named by the hash of their key, and the access time is kept
+in the file mtime, so the cache survives restarts and is shared by the workers.
+Files are written to a temporary name and renamed, readers never see a partial file.
+Hits are read into memory, so a concurrent eviction cannot break a response.
+
+Each worker tracks the bytes it added since its last scan of the directory, and
+only scans and evicts when that estimate exceeds `max_bytes` or every
+`scan_interval` puts, which catches up with the entries written by other workers.
+The methods do blocking file IO, call them through `run_in_threadpool`.
+"""
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+
+from xray_swagger.settings import settings
+
+SUFFIX = ".png"
+
+
+class ThumbnailCache:
+    def __init__(self, root: Path, max_bytes: int, scan_interval: int = 64) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.scan_interval = scan_interval
+        self.hits = 0
+        self.misses = 0
+        # 마지막 scan 이후의 추정치, scan 전에는 None
+        self._bytes: int | None = None
+        self._puts = 0
+        self._lock = Lock()
+
+    @staticmethod
+    def key(*parts: object) -> str:
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}{SUFFIX}"
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        try:
+            os.utime(path)
+            data = path.read_bytes()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._puts += 1
+            if self._bytes is not None:
+                self._bytes += len(data)
+            over_budget = self._bytes is None or self._bytes > self.max_bytes
+            if not over_budget and self._puts % self.scan_interval:
+                return
+        self.evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.glob(f"*{SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # 다른 worker가 먼저 지웠다
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> None:
+        """Removes the least recently used entries beyond `max_bytes`."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        with self._lock:
+            self._bytes = total
+
+    def stats(self) -> dict[str, int]:
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+
+@lru_cache
+def get_thumbnail_cache() -> ThumbnailCache:
+    return ThumbnailCache(settings.preview_cache_dir, settings.preview_cache_max_bytes)
@@ -0,0 +1 @@
+"""Logging service."""
@@ -0,0 +1,155 @@
+"""
+Per-request cost of the debug logging of a supervisor request, eager and deferred.
+
+Replays the debug calls of `PermissionsDependency([IsAuthenticated, IsSupervisor])`
+and of the user list view, once with f-strings and `pformat` passed to `logger.debug`
+as they were, and once through `xray_swagger.logging.debug`, with the log level
+at INFO and at DEBUG into a sink that drops the messages.
+
+    python -m xray_swagger.services.logging.benchmark
+    python -m xray_swagger.services.logging.benchmark --requests 10000
+"""
+import argparse
+from datetime import datetime
+from pprint import pformat
+from time import perf_counter
+from typing import Callable, NamedTuple
+
+from loguru import logger
+from starlette.requests import Request
+
+from xray_swagger.db.models.user import AuthLevel
+from xray_swagger.logging import debug, set_sink
+from xray_swagger.settings import LogLevel
+from xray_swagger.web.api.users.schema import UserModelDTO
+
+
+class BenchmarkResult(NamedTuple):
+    level: LogLevel
+    eager_us: float
+    deferred_us: float
+
+
+def _request() -> Request:
+    headers = {
+        "host": "xray_swagger:8000",
+        "user-agent": "HMI/2.3",
+        "accept": "application/json",
+        "accept-encoding": "gzip, deflate",
+        "authorization": f"Bearer {'x' * 160}",
+        "connection": "keep-alive",
+    }
+    return Request(
+        {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/api/users/",
+            "raw_path": b"/api/users/",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(key.encode(), value.encode()) for key, value in headers.items()],
+            "client": ("10.0.0.21", 52114),
+            "server": ("10.0.0.2", 8000),
+            "state": {},
+        },
+    )
+
+
+def _user() -> UserModelDTO:
+    return UserModelDTO(
+        username="supervisor",
+        password="hashed",
+        fullname="Kim",
+        joined_at=datetime(2023, 8, 1),
+        authlevel=AuthLevel.SUPERVISOR,
+    )
+
+
+def eager(request: Request, user: UserModelDTO) -> None:
+    logger.debug("Permission deps resolving".center(100, "#"))
+    logger.debug("=== Is Authenticated?")
+    logger.debug(user)
+    logger.debug(user.authlevel)
+    logger.debug(type(request))
+    logger.debug(request.state.__dict__)
+    logger.debug("=== Is Supervisor?")
+    logger.debug(user)
+    logger.debug(f"{user.authlevel} = {user.authlevel.value}")
+    logger.debug(f"{AuthLevel.SUPERVISOR} = {AuthLevel.SUPERVISOR.value}")
+    logger.debug(f"{user.authlevel.value >= AuthLevel.SUPERVISOR.value=}")
+    logger.debug(request)
+    logger.debug(pformat(request.scope))
+    logger.debug(pformat(request.headers.__dict__))
+    logger.debug(pformat(request.state.__dict__))
+
+
+def deferred(request: Request, user: UserModelDTO) -> None:
+    debug("{:#^100}", "Permission deps resolving")
+    debug("=== Is Authenticated?")
+    debug("{}", user)
+    debug("{}", user.authlevel)
+    debug("{}", type(request))
+    debug("{}", request.state.__dict__)
+    debug("=== Is Supervisor?")
+    debug("{}", user)
+    debug("{} = {}", user.authlevel, user.authlevel.value)
+    debug("{} = {}", AuthLevel.SUPERVISOR, AuthLevel.SUPERVISOR.value)
+    debug(
+        "user.authlevel.value >= AuthLevel.SUPERVISOR.value={}",
+        user.authlevel.value >= AuthLevel.SUPERVISOR.value,
+    )
+    debug("{}", request)
+    debug("{}", lambda: pformat(request.scope), lazy=True)
+    debug("{}", lambda: pformat(request.headers.__dict__), lazy=True)
+    debug("{}", lambda: pformat(request.state.__dict__), lazy=True)
+
+
+def _per_request(
+    log: Callable[[Request, UserModelDTO], None],
+    requests: int,
+    repeat: int,
+) -> float:
+    request, user = _request(), _user()
+    best = float("inf")
+    for _ in range(repeat):
+        started = perf_counter()
+        for _request_no in range(requests):
+            log(request, user)
+        best = min(best, perf_counter() - started)
+    return best / requests * 1e6
+
+
+def benchmark(requests: int, repeat: int = 3) -> list[BenchmarkResult]:
+    """Best of `repeat` microseconds per request, at INFO and at DEBUG."""
+    results = []
+    for level in (LogLevel.INFO, LogLevel.DEBUG):
+        set_sink(lambda message: None, level)
+        results.append(
+            BenchmarkResult(
+                level,
+                _per_request(eager, requests, repeat),
+                _per_request(deferred, requests, repeat),
+            ),
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = benchmark(args.requests, args.repeat)
+    print(f"{'level':>8} {'eager us':>9} {'deferred us':>12} {'saved us':>9}")
+    for result in results:
+        print(
+            f"{result.level.value:>8} {result.eager_us:>9.1f} {result.deferred_us:>12.1f} "
+            f"{result.eager_us - result.deferred_us:>9.1f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
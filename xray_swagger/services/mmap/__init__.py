@@ -0,0 +1 @@
+"""Memory-mapped acquisition buffer service."""
@@ -0,0 +1,117 @@
+"""
+Reads scan lines back from the memory-mapped acquisition buffers.
+
+A buffer file holds fixed size scan lines, `MmapSession.image_s3_key` names it
+relative to `mmap_storage_dir`, and the `*_mmap_session_ptr` columns are scan line indexes.
+Bytes are sliced from the mapping through a `memoryview`, so only the chunk
+handed to the response is copied.
+"""
+import mmap
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from xray_swagger.settings import settings
+
+
+class InvalidImageKey(ValueError):
+    """The image key points outside of the storage directory."""
+
+
+class FrameRangeError(ValueError):
+    """The requested scan lines are not in the buffer."""
+
+
+class FrameSpan(NamedTuple):
+    path: Path
+    # byte offsets, stop exclusive
+    start: int
+    stop: int
+
+    @property
+    def size(self) -> int:
+        return self.stop - self.start
+
+
+class MmapFrameReader:
+    def __init__(self, root: Path, line_bytes: int, chunk_size: int) -> None:
+        self.root = root.resolve()
+        self.line_bytes = line_bytes
+        # 청크가 scan line 경계에서 끊기도록 맞춘다
+        self.chunk_size = max(line_bytes, chunk_size - chunk_size % line_bytes)
+
+    def path_of(self, image_s3_key: str) -> Path:
+        path = (self.root / image_s3_key).resolve()
+        if not path.is_relative_to(self.root):
+            raise InvalidImageKey(image_s3_key)
+        return path
+
+    def line_count(self, image_s3_key: str) -> int:
+        """
+        Number of complete scan lines of the buffer.
+
+        :raises FileNotFoundError: when the buffer file does not exist.
+        """
+        return self.path_of(image_s3_key).stat().st_size // self.line_bytes
+
+    def span(self, image_s3_key: str, start: int = 0, stop: int | None = None) -> FrameSpan:
+        """Byte span of the scan lines [start, stop) of a buffer, `stop` defaults to the end."""
+        lines = self.line_count(image_s3_key)
+        stop = lines if stop is None else stop
+        if not 0 <= start <= stop <= lines:
+            raise FrameRangeError(f"Lines [{start}, {stop}) out of [0, {lines}) in {image_s3_key}")
+        return FrameSpan(
+            self.path_of(image_s3_key),
+            start * self.line_bytes,
+            stop * self.line_bytes,
+        )
+
+    def spans(self, image_s3_keys: list[str], start: int, stop: int | None) -> list[FrameSpan]:
+        """
+        Spans from line `start` of the first buffer through line `stop` of the last one.
+
+        The buffers in between are taken whole.
+        """
+        last = len(image_s3_keys) - 1
+        return [
+            self.span(key, start if index == 0 else 0, stop if index == last else None)
+            for index, key in enumerate(image_s3_keys)
+        ]
+
+    def read_lines(self, spans: list[FrameSpan], start: int, stop: int) -> bytes:
+        """Scan lines [start, stop) of the concatenated `spans`."""
+        chunks = []
+        begin, end = start * self.line_bytes, stop * self.line_bytes
+        offset = 0
+        for span in spans:
+            lo, hi = max(begin - offset, 0), min(end - offset, span.size)
+            offset += span.size
+            if lo >= hi:
+                continue
+            with open(span.path, "rb") as fd:
+                with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    chunks.append(mapped[span.start + lo : span.start + hi])
+        return b"".join(chunks)
+
+    def iter_bytes(self, spans: Iterable[FrameSpan]) -> Iterator[bytes]:
+        """Concatenated bytes of `spans` in chunks of at most `chunk_size`."""
+        for span in spans:
+            if not span.size:
+                continue
+            with open(span.path, "rb") as fd:
+                with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for offset in range(span.start, span.stop, self.chunk_size):
+                            yield bytes(view[offset : min(offset + self.chunk_size, span.stop)])
+                    finally:
+                        view.release()
+
+
+@lru_cache
+def get_frame_reader() -> MmapFrameReader:
+    return MmapFrameReader(
+        settings.mmap_storage_dir,
+        settings.mmap_line_width * settings.mmap_bytes_per_pixel,
+        settings.mmap_stream_chunk_size,
+    )
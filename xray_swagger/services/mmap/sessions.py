@@ -0,0 +1,37 @@
+"""Scan line spans of the inspection session images."""
+from xray_swagger.db.dao.mmap_session_dao import MmapSessionDAO
+from xray_swagger.db.models.mmap_session import MmapSession
+from xray_swagger.db.models.product import InspectionSession
+from xray_swagger.services.mmap.reader import FrameSpan, MmapFrameReader
+
+
+class BrokenSessionChain(ValueError):
+    """The end mmap session of an inspection session does not follow its start."""
+
+
+async def isp_sess_spans(
+    isp_sess: InspectionSession,
+    start: MmapSession,
+    end: MmapSession | None,
+    mmap_sess_dao: MmapSessionDAO,
+    reader: MmapFrameReader,
+) -> list[FrameSpan]:
+    """
+    Byte spans of the session scan lines, from the start ptr through the end ptr.
+
+    :raises BrokenSessionChain: no chain of mmap sessions leads from `start` to `end`.
+    :raises FileNotFoundError, InvalidImageKey: a buffer is not in the storage directory.
+    :raises FrameRangeError: the ptrs are outside of the buffers.
+    """
+    keys = [start.image_s3_key]
+    stop = None
+    if end is not None:
+        stop = isp_sess.end_mmap_session_ptr
+        if end.uuid != start.uuid:
+            # 중간에 낀 mmap session은 통째로 포함된다
+            keys = [chain.image_s3_key for chain in await mmap_sess_dao.get_chain(start, end)]
+            if not keys:
+                raise BrokenSessionChain(
+                    f"InspectionSession <id: {isp_sess.id}> ends before it starts",
+                )
+    return reader.spans(keys, isp_sess.start_mmap_session_ptr, stop)
@@ -0,0 +1 @@
+"""Preprocessor cascade execution service."""
@@ -0,0 +1,112 @@
+"""
+Throughput scaling of a preprocessor cascade over 1 to N tile worker threads.
+
+Runs the cascade in tiled mode on a synthetic 16-bit strip, or on a raw scan line file,
+and reports megapixels per second and the speedup over a single worker.
+
+    python -m xray_swagger.services.preprocessor.benchmark                    # default cascade
+    python -m xray_swagger.services.preprocessor.benchmark cascade.json --workers 8
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter
+from typing import NamedTuple
+
+import numpy as np
+from xray_settings.routers.preprocessor import PreprocessorCascadingFunctionSetting
+
+from xray_swagger.services.preprocessor.pipeline import Pipeline, compile_cascade
+from xray_swagger.settings import settings
+
+DEFAULT_CASCADE = {
+    "functions": [
+        {"filter_name": "convert_scale", "params": {"alpha": 1.2, "beta": 10}},
+        {"filter_name": "adjust_gamma", "params": {"gamma": 1.4}},
+        {"filter_name": "gaussian_blur", "params": {"kernel_size": 5}},
+        {"filter_name": "apply_unsharp_mask", "params": {}},
+        {"filter_name": "apply_sharpening_filter", "params": {"kernel_type": 2}},
+    ],
+}
+
+
+class BenchmarkResult(NamedTuple):
+    workers: int
+    seconds: float
+    megapixels_per_second: float
+    speedup: float
+
+
+def benchmark(
+    pipeline: Pipeline,
+    frame: np.ndarray,
+    tile_rows: int,
+    workers: list[int],
+    repeat: int = 3,
+) -> list[BenchmarkResult]:
+    """Best of `repeat` tiled runs per worker count."""
+    results: list[BenchmarkResult] = []
+    for count in workers:
+        best = float("inf")
+        # 공유 pool 대신 worker 수만큼의 thread로 잰다
+        with ThreadPoolExecutor(count, thread_name_prefix="benchmark") as executor:
+            for _ in range(repeat):
+                started = perf_counter()
+                for _tile in pipeline.run_tiled(
+                    lambda start, stop: frame[start:stop],
+                    frame.shape,
+                    tile_rows,
+                    count,
+                    executor,
+                ):
+                    pass
+                best = min(best, perf_counter() - started)
+        baseline = results[0].seconds if results else best
+        results.append(BenchmarkResult(count, best, frame.size / best / 1e6, baseline / best))
+    return results
+
+
+def _frame(args: argparse.Namespace) -> np.ndarray:
+    if args.frame:
+        raw = np.fromfile(args.frame, dtype="<u2").astype(np.uint16, copy=False)
+        return raw[: raw.size // args.width * args.width].reshape(-1, args.width)
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 1 << 16, (args.height, args.width), dtype=np.uint16)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "cascade",
+        nargs="?",
+        type=Path,
+        help="PreprocessorCascadingFunctionSetting JSON",
+    )
+    parser.add_argument("--frame", type=Path, help="raw 16-bit little-endian scan lines")
+    parser.add_argument("--height", type=int, default=8192)
+    parser.add_argument("--width", type=int, default=settings.mmap_line_width)
+    parser.add_argument("--tile-rows", type=int, default=settings.preprocessor_tile_rows)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cascade = json.loads(args.cascade.read_text()) if args.cascade else DEFAULT_CASCADE
+    setting = PreprocessorCascadingFunctionSetting.model_validate(cascade)
+    pipeline = compile_cascade(setting.functions)
+    frame = _frame(args)
+    counts = sorted({1, *(2**power for power in range(args.workers.bit_length())), args.workers})
+
+    print(f"{frame.shape[1]}x{frame.shape[0]} frame, {args.tile_rows} rows per tile")
+    print(" -> ".join(f"{kind}[{'+'.join(names)}]" for kind, names in pipeline.plan()))
+    print(f"{'workers':>8} {'seconds':>9} {'MPix/s':>9} {'speedup':>8}")
+    for result in benchmark(pipeline, frame, args.tile_rows, counts, args.repeat):
+        print(
+            f"{result.workers:>8} {result.seconds:>9.3f} "
+            f"{result.megapixels_per_second:>9.1f} {result.speedup:>7.2f}x",
+        )
+
+
+if __name__ == "__main__":
+    main()
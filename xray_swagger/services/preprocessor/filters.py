@@ -0,0 +1,782 @@
+"""
+NumPy implementations of the `PreprocessorCascadingFunctionSet` filters.
+
+The parameters and defaults follow the field descriptions of `xray_settings.routers.preprocessor`,
+and the filters follow the OpenCV functions they were written against.
+Frames are single channel 8-bit or 16-bit. Every stage saturates back to the frame depth,
+the same way each OpenCV call does.
+Brightness-like parameters (`beta`, `threshold`, `target_brightness`, ...) are 8-bit levels
+and are scaled to the frame depth.
+
+Borders are reflected without repeating the edge pixel (OpenCV `BORDER_REFLECT_101`).
+"""
+import math
+from abc import ABC, abstractmethod
+from typing import Callable, NamedTuple
+
+import numpy as np
+from pydantic import BaseModel
+from xray_settings.routers.preprocessor import ESharpeningFilterKernelType
+
+
+class PreprocessorError(ValueError):
+    """The cascade cannot be compiled."""
+
+
+class Workspace:
+    """Scratch buffers reused across frames of the same shape."""
+
+    def __init__(self) -> None:
+        self._buffers: dict[str, np.ndarray] = {}
+
+    def get(self, name: str, shape: tuple[int, ...], dtype: type = np.float32) -> np.ndarray:
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self._buffers[name] = np.empty(shape, dtype)
+        return buffer
+
+
+class Stage(ABC):
+    """One filter of a cascade, reading `src` and writing every pixel of `dst`."""
+
+    name: str
+    # 출력 한 행을 계산하는 데 필요한 위/아래 이웃 행 수
+    halo = 0
+
+    def __init__(self, levels: int) -> None:
+        self.levels = levels
+        self.maximum = levels - 1
+        # 8-bit 기준 파라미터를 frame depth로 변환
+        self.scale = self.maximum / 255
+
+    @abstractmethod
+    def apply(self, src: np.ndarray, dst: np.ndarray, ws: Workspace) -> None:
+        """Filters the whole of `src` into `dst`."""
+
+    def apply_at(self, src: np.ndarray, dst: np.ndarray, ws: Workspace, y0: int) -> None:
+        """`apply` to the rows of a tile starting at image row `y0`."""
+        self.apply(src, dst, ws)
+
+    def __repr__(self) -> str:
+        return self.name
+
+
+class GlobalStats(ABC):
+    """
+    Mixin of the stages that need statistics of the whole input to be applied.
+
+    A tiled run collects the statistics tile by tile and applies the bound stage.
+    """
+
+    @abstractmethod
+    def begin(self, shape: tuple[int, int]):
+        """Empty statistics of an input frame of `shape`."""
+
+    @abstractmethod
+    def observe(self, stats, rows: np.ndarray, y0: int) -> None:
+        """Adds the input rows starting at image row `y0`, every row exactly once."""
+
+    @abstractmethod
+    def bind(self, stats) -> Stage:
+        """A stage without global statistics applying the collected statistics."""
+
+
+def _or(value, default):
+    return default if value is None else value
+
+
+def _store(values: np.ndarray, dst: np.ndarray, maximum: int) -> None:
+    """Rounds and saturates float `values` (clobbered) into `dst`."""
+    np.rint(values, out=values)
+    np.clip(values, 0, maximum, out=values)
+    np.copyto(dst, values, casting="unsafe")
+
+
+def _as_float(src: np.ndarray, ws: Workspace, name: str = "src") -> np.ndarray:
+    values = ws.get(name, src.shape)
+    np.copyto(values, src, casting="unsafe")
+    return values
+
+
+#################################################
+# Pointwise
+
+
+class PointwiseStage(Stage):
+    """A map of intensity levels, applied as a lookup table."""
+
+    # table()가 입력 이미지의 histogram을 필요로 하는지
+    uses_histogram = False
+    # histogram이 필요 없으면 table은 frame과 무관하므로 처음 apply할 때 한 번만 만든다
+    _static: np.ndarray | None = None
+
+    @abstractmethod
+    def table(self, hist: np.ndarray | None) -> np.ndarray:
+        """Output level of every input level, `hist` is the input histogram when used."""
+
+    def _saturate(self, values: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(values), 0, self.maximum).astype(_dtype(self.levels))
+
+    def _levels(self) -> np.ndarray:
+        return np.arange(self.levels, dtype=np.float64)
+
+    def apply(self, src: np.ndarray, dst: np.ndarray, ws: Workspace) -> None:
+        if self.uses_histogram:
+            table = self.table(np.bincount(src.ravel(), minlength=self.levels))
+        else:
+            table = self._static
+            if table is None:
+                table = self._static = self.table(None)
+        np.take(table, src, out=dst)
+
+
+class HistogramStage(GlobalStats, PointwiseStage):
+    """A pointwise stage whose table depends on the histogram of the whole input."""
+
+    uses_histogram = True
+
+    def begin(self, shape):
+        return np.zeros(self.levels, dtype=np.int64)
+
+    def observe(self, stats, rows, y0):
+        stats += np.bincount(rows.ravel(), minlength=self.levels)
+
+    def bind(self, stats):
+        return StaticLut(self.levels, self.name, self.table(stats))
+
+
+class StaticLut(PointwiseStage):
+    def __init__(self, levels: int, name: str, table: np.ndarray) -> None:
+        super().__init__(levels)
+        self.name = name
+        self._table = table
+
+    def table(self, hist):
+        return self._table
+
+
+def _dtype(levels: int) -> type:
+    return np.uint8 if levels <= 256 else np.uint16
+
+
+def _mean(hist: np.ndarray, table: np.ndarray) -> float:
+    total = hist.sum()
+    return float(hist @ table / total) if total else 0.0
+
+
+class ConvertScale(PointwiseStage):
+    name = "convert_scale"
+
+    def __init__(self, levels: int, alpha: float, beta: float) -> None:
+        super().__init__(levels)
+        self.alpha = alpha
+        self.beta = beta * self.scale
+
+    def table(self, hist):
+        return self._saturate(self._levels() * self.alpha + self.beta)
+
+
+class AdjustGamma(PointwiseStage):
+    name = "adjust_gamma"
+
+    def __init__(self, levels: int, gamma: float) -> None:
+        super().__init__(levels)
+        if gamma <= 0:
+            raise PreprocessorError(f"adjust_gamma: gamma must be positive, got {gamma}")
+        self.gamma = gamma
+
+    def table(self, hist):
+        return self._saturate((self._levels() / self.maximum) ** (1 / self.gamma) * self.maximum)
+
+
+class ColorInversion(PointwiseStage):
+    name = "color_inversion"
+
+    def table(self, hist):
+        return self._saturate(self.maximum - self._levels())
+
+
+class FilterDarkPixels(PointwiseStage):
+    name = "filter_dark_pixels"
+
+    def __init__(self, levels: int, threshold: int) -> None:
+        super().__init__(levels)
+        self.threshold = threshold * self.scale
+
+    def table(self, hist):
+        x = self._levels()
+        return self._saturate(np.where(x < self.threshold, 0, x))
+
+
+class SetTargetBrightness(HistogramStage):
+    """Scales the levels so the mean becomes `target_brightness`."""
+
+    name = "set_target_brightness"
+
+    def __init__(self, levels: int, target_brightness: int) -> None:
+        super().__init__(levels)
+        self.target = target_brightness * self.scale
+
+    def table(self, hist):
+        x = self._levels()
+        mean = _mean(hist, x)
+        return self._saturate(x * (self.target / mean) if mean else x)
+
+
+class AutoAdjustGamma(HistogramStage):
+    """Bisects the gamma in [1 / target_gamma, target_gamma] towards the target mean brightness."""
+
+    name = "auto_adjust_gamma"
+
+    def __init__(
+        self,
+        levels: int,
+        target_brightness: int,
+        target_gamma: float,
+        max_iterations: int,
+    ) -> None:
+        super().__init__(levels)
+        if target_gamma <= 0:
+            raise PreprocessorError("auto_adjust_gamma: target_gamma must be positive")
+        self.target = target_brightness * self.scale
+        self.bound = abs(math.log(target_gamma))
+        self.max_iterations = max_iterations
+
+    def _gamma_table(self, gamma: float) -> np.ndarray:
+        return self._saturate((self._levels() / self.maximum) ** (1 / gamma) * self.maximum)
+
+    def table(self, hist):
+        # gamma가 클수록 밝아진다 (단조)
+        low, high = -self.bound, self.bound
+        log_gamma = 0.0
+        for _ in range(self.max_iterations):
+            log_gamma = (low + high) / 2
+            if _mean(hist, self._gamma_table(math.exp(log_gamma))) < self.target:
+                low = log_gamma
+            else:
+                high = log_gamma
+        return self._gamma_table(math.exp(log_gamma))
+
+
+class StretchHistogram(HistogramStage):
+    name = "stretch_histogram"
+
+    def table(self, hist):
+        present = np.flatnonzero(hist)
+        x = self._levels()
+        if len(present) < 2:
+            return self._saturate(x)
+        low, high = present[0], present[-1]
+        return self._saturate((x - low) * (self.maximum / (high - low)))
+
+
+class Equalize(HistogramStage):
+    """Histogram equalization (`cv2.equalizeHist`)."""
+
+    name = "equalize"
+
+    def table(self, hist):
+        cdf = np.cumsum(hist)
+        total = cdf[-1]
+        first = cdf[np.flatnonzero(hist)[0]] if total else 0
+        if total == first:
+            return self._saturate(self._levels())
+        return self._saturate((cdf - first) * (self.maximum / (total - first)))
+
+
+class RemoveBackground(HistogramStage):
+    """
+    Whitens the background.
+
+    Air is the bright side of a transmission image, the levels above
+    the Otsu threshold are set to the maximum.
+    """
+
+    name = "remove_background"
+
+    def table(self, hist):
+        x = self._levels()
+        weights = hist.astype(np.float64)
+        w0 = np.cumsum(weights)
+        w1 = w0[-1] - w0
+        m0 = np.cumsum(weights * x)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            between = (m0[-1] * w0 - m0 * w0[-1]) ** 2 / (w0 * w1)
+        threshold = int(np.nanargmax(np.nan_to_num(between, nan=-1))) if w0[-1] else self.maximum
+        return self._saturate(np.where(x > threshold, self.maximum, x))
+
+
+class Identity(PointwiseStage):
+    name = "identity"
+
+    def __init__(self, levels: int, name: str) -> None:
+        super().__init__(levels)
+        self.name = name
+
+    def table(self, hist):
+        return self._saturate(self._levels())
+
+
+class FusedLut(PointwiseStage):
+    """
+    Consecutive pointwise stages composed into one table, applied in a single pass.
+
+    The composition is exact: every stage maps integer levels to saturated integer levels.
+    A stage that reads the histogram gets the input histogram pushed through
+    the tables before it, so the frame is counted once for the whole group.
+    """
+
+    def __init__(self, levels: int, stages: list[PointwiseStage]) -> None:
+        super().__init__(levels)
+        self.stages = stages
+        self.name = "+".join(stage.name for stage in stages)
+
+    def table(self, hist):
+        table = np.arange(self.levels, dtype=_dtype(self.levels))
+        for stage in self.stages:
+            stage_hist = None
+            if stage.uses_histogram:
+                stage_hist = np.bincount(table, weights=hist, minlength=self.levels)
+            table = stage.table(stage_hist)[table]
+        return table
+
+
+class FusedHistogramLut(HistogramStage, FusedLut):
+    """A `FusedLut` of which at least one stage reads the histogram."""
+
+
+#################################################
+# Spatial
+
+
+def _correlate_rows(src: np.ndarray, kernel: np.ndarray, out: np.ndarray, ws: Workspace) -> None:
+    radius = len(kernel) // 2
+    padded = np.pad(src, ((radius, radius), (0, 0)), mode="reflect")
+    term = ws.get("term", src.shape)
+    out.fill(0)
+    for index, weight in enumerate(kernel):
+        np.multiply(padded[index : index + src.shape[0]], weight, out=term)
+        out += term
+
+
+def _correlate_cols(src: np.ndarray, kernel: np.ndarray, out: np.ndarray, ws: Workspace) -> None:
+    radius = len(kernel) // 2
+    padded = np.pad(src, ((0, 0), (radius, radius)), mode="reflect")
+    term = ws.get("term", src.shape)
+    out.fill(0)
+    for index, weight in enumerate(kernel):
+        np.multiply(padded[:, index : index + src.shape[1]], weight, out=term)
+        out += term
+
+
+def _correlate2d(src: np.ndarray, kernel: np.ndarray, out: np.ndarray, ws: Workspace) -> None:
+    radius_y, radius_x = kernel.shape[0] // 2, kernel.shape[1] // 2
+    padded = np.pad(src, ((radius_y, radius_y), (radius_x, radius_x)), mode="reflect")
+    height, width = src.shape
+    term = ws.get("term", src.shape)
+    out.fill(0)
+    for (row, col), weight in np.ndenumerate(kernel):
+        if weight:
+            np.multiply(padded[row : row + height, col : col + width], weight, out=term)
+            out += term
+
+
+def gaussian_kernel(ksize: int, sigma: float, levels: int) -> np.ndarray:
+    """`cv2.getGaussianKernel`, deriving the size from sigma or sigma from the size when <= 0."""
+    if ksize <= 0:
+        ksize = int(round(sigma * (3 if levels <= 256 else 4) * 2 + 1)) | 1
+    if ksize % 2 == 0:
+        raise PreprocessorError(f"Gaussian kernel size must be odd, got {ksize}")
+    if sigma <= 0:
+        sigma = 0.3 * ((ksize - 1) * 0.5 - 1) + 0.8
+    x = np.arange(ksize) - ksize // 2
+    kernel = np.exp(-(x**2) / (2 * sigma**2))
+    return kernel / kernel.sum()
+
+
+class GaussianStage(Stage):
+    """A stage built on one separable Gaussian blur of its input."""
+
+    def __init__(self, levels: int, ksize: int, sigma: float) -> None:
+        super().__init__(levels)
+        self.kernel = gaussian_kernel(ksize, sigma, levels)
+        self.halo = len(self.kernel) // 2
+
+    def _blur(self, values: np.ndarray, ws: Workspace) -> np.ndarray:
+        rows = ws.get("rows", values.shape)
+        blurred = ws.get("blurred", values.shape)
+        _correlate_rows(values, self.kernel, rows, ws)
+        _correlate_cols(rows, self.kernel, blurred, ws)
+        return blurred
+
+    def combine(self, values: np.ndarray, blurred: np.ndarray) -> np.ndarray:
+        """Output from the input and its blur, may reuse either buffer."""
+        return blurred
+
+    def apply(self, src, dst, ws):
+        values = _as_float(src, ws)
+        _store(self.combine(values, self._blur(values, ws)), dst, self.maximum)
+
+
+class GaussianBlur(GaussianStage):
+    name = "gaussian_blur"
+
+
+class AddWeighted(GaussianStage):
+    """`alpha * src + beta * blurred + gamma`, the form of the unsharp and text filters."""
+
+    def __init__(
+        self,
+        levels: int,
+        name: str,
+        ksize: int,
+        sigma: float,
+        alpha: float,
+        beta: float,
+        gamma: float = 0,
+    ) -> None:
+        super().__init__(levels, ksize, sigma)
+        self.name = name
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma * self.scale
+
+    def combine(self, values, blurred):
+        blurred *= self.beta
+        values *= self.alpha
+        values += blurred
+        values += self.gamma
+        return values
+
+
+class EnhanceGray(GaussianStage):
+    """Unsharp mask `alpha * src + beta * blurred` mixed in by `sharpen_strength`, then brightened."""
+
+    name = "enhance_gray"
+
+    def __init__(
+        self,
+        levels: int,
+        alpha: float,
+        beta: float,
+        blur_amount: int,
+        brightness: int,
+        blur_sigma: float,
+        sharpen_strength: float,
+    ) -> None:
+        super().__init__(levels, blur_amount | 1, blur_sigma)
+        self.alpha = alpha
+        self.beta = beta
+        self.brightness = brightness * self.scale
+        self.strength = sharpen_strength
+
+    def combine(self, values, blurred):
+        # src + strength * (alpha * src + beta * blurred - src)
+        blurred *= self.beta * self.strength
+        values *= 1 + self.strength * (self.alpha - 1)
+        values += blurred
+        values += self.brightness
+        return values
+
+
+class Correlate(Stage):
+    """A 3x3 (or larger) kernel correlation, `cv2.filter2D`."""
+
+    def __init__(self, levels: int, name: str, kernel: np.ndarray) -> None:
+        super().__init__(levels)
+        self.name = name
+        self.kernel = kernel.astype(np.float32)
+        self.halo = kernel.shape[0] // 2
+
+    def apply(self, src, dst, ws):
+        values = _as_float(src, ws)
+        out = ws.get("correlated", src.shape)
+        _correlate2d(values, self.kernel, out, ws)
+        _store(out, dst, self.maximum)
+
+
+def _binomial(order: int) -> np.ndarray:
+    kernel = np.ones(1)
+    for _ in range(order):
+        kernel = np.convolve(kernel, [1, 1])
+    return kernel
+
+
+def laplacian_kernel(ksize: int) -> np.ndarray:
+    """The kernel of `cv2.Laplacian`: the sum of the Sobel second derivatives."""
+    if ksize == 1:
+        return np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]], dtype=np.float64)
+    if ksize % 2 == 0 or ksize > 31:
+        raise PreprocessorError(f"apply_laplacian: kernel_size must be odd and <= 31, got {ksize}")
+    smooth = _binomial(ksize - 1)
+    second = np.convolve(_binomial(ksize - 3), [1, -2, 1])
+    return np.outer(second, smooth) + np.outer(smooth, second)
+
+
+SHARPENING_KERNELS = {
+    ESharpeningFilterKernelType.UNSHARP_MASK: [[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]],
+    ESharpeningFilterKernelType.LAPLACIAN: [[0, -1, 0], [-1, 5, -1], [0, -1, 0]],
+    ESharpeningFilterKernelType.MEAN: [[1 / 9] * 3] * 3,
+    ESharpeningFilterKernelType.GAUSSIAN: np.outer([1, 2, 1], [1, 2, 1]) / 16,
+    ESharpeningFilterKernelType.SOBEL_X: [[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]],
+    ESharpeningFilterKernelType.SOBEL_Y: [[-1, -2, -1], [0, 0, 0], [1, 2, 1]],
+    ESharpeningFilterKernelType.EMBOSSING: [[-2, -1, 0], [-1, 1, 1], [0, 1, 2]],
+}
+
+
+class Denoize(Stage):
+    """
+    3x3 median filter.
+
+    Stands in for `cv2.fastNlMeansDenoising`, which is far too slow for the preview.
+    """
+
+    name = "denoize"
+    halo = 1
+
+    def apply(self, src, dst, ws):
+        padded = np.pad(src, 1, mode="reflect")
+        height, width = src.shape
+        window = ws.get("window", (9, height, width), src.dtype)
+        for index in range(9):
+            row, col = divmod(index, 3)
+            window[index] = padded[row : row + height, col : col + width]
+        window.sort(axis=0)
+        dst[...] = window[4]
+
+
+class ClaheStats(NamedTuple):
+    shape: tuple[int, int]
+    # (grid_y * grid_x, levels)
+    hist: np.ndarray
+    # padding된 행마다 원본 행 번호
+    source_rows: np.ndarray
+
+
+class Clahe(GlobalStats, Stage):
+    """
+    Contrast limited adaptive histogram equalization (`cv2.createCLAHE`).
+
+    The image is cut into `tile_grid_size` (columns, rows) tiles, each tile gets the
+    equalization table of its clipped histogram, and every pixel blends the tables of
+    the four nearest tile centers.
+    The tiles are sized from the whole frame, so the histograms are global statistics.
+    """
+
+    name = "apply_clahe"
+
+    def __init__(self, levels: int, clip_limit: float, tile_grid_size: tuple[int, int]) -> None:
+        super().__init__(levels)
+        self.clip_limit = clip_limit
+        self.grid_x, self.grid_y = tile_grid_size
+        if self.grid_x < 1 or self.grid_y < 1:
+            raise PreprocessorError(f"apply_clahe: invalid tile_grid_size {tile_grid_size}")
+
+    def tile_size(self, shape: tuple[int, int]) -> tuple[int, int]:
+        return -(-shape[0] // self.grid_y), -(-shape[1] // self.grid_x)
+
+    def begin(self, shape):
+        tile_h, _ = self.tile_size(shape)
+        # 타일 크기의 배수가 되도록 reflect padding (OpenCV와 동일)
+        source_rows = np.pad(np.arange(shape[0]), (0, tile_h * self.grid_y - shape[0]), "reflect")
+        hist = np.zeros((self.grid_y * self.grid_x, self.levels), dtype=np.int64)
+        return ClaheStats(shape, hist, source_rows)
+
+    def observe(self, stats, rows, y0):
+        tile_h, tile_w = self.tile_size(stats.shape)
+        padded_rows = np.flatnonzero(
+            (stats.source_rows >= y0) & (stats.source_rows < y0 + rows.shape[0]),
+        )
+        if not len(padded_rows):
+            return
+        padded = np.pad(rows, ((0, 0), (0, tile_w * self.grid_x - rows.shape[1])), "reflect")
+        values = padded[stats.source_rows[padded_rows] - y0].reshape(-1, self.grid_x, tile_w)
+        cells = (padded_rows // tile_h)[:, None] * self.grid_x + np.arange(self.grid_x)
+        # 이 행들이 닿는 타일의 histogram 구간만 센다
+        first = int(cells.min()) * self.levels
+        index = cells[:, :, None] * self.levels + values - first
+        counts = np.bincount(index.ravel(), minlength=(int(cells.max()) + 1) * self.levels - first)
+        flat = stats.hist.reshape(-1)
+        flat[first : first + len(counts)] += counts
+
+    def tables(self, stats: ClaheStats) -> np.ndarray:
+        """Float tables of shape (grid_y * grid_x, levels)."""
+        tile_h, tile_w = self.tile_size(stats.shape)
+        hist = stats.hist.copy()
+        area = tile_h * tile_w
+        if self.clip_limit > 0:
+            clip = max(int(self.clip_limit * area / self.levels), 1)
+            excess = np.maximum(hist - clip, 0).sum(axis=1)
+            np.minimum(hist, clip, out=hist)
+            batch = excess // self.levels
+            hist += batch[:, None]
+            residual = excess - batch * self.levels
+            for tile, rest in enumerate(residual):
+                if rest:
+                    step = max(self.levels // rest, 1)
+                    hist[tile, ::step][:rest] += 1
+        tables = np.cumsum(hist, axis=1, dtype=np.float64) * (self.maximum / area)
+        return np.clip(np.rint(tables), 0, self.maximum).astype(np.float32)
+
+    def bind(self, stats):
+        return BoundClahe(self, self.tables(stats), stats.shape)
+
+    def apply(self, src, dst, ws):
+        stats = self.begin(src.shape)
+        self.observe(stats, src, 0)
+        self.bind(stats).apply(src, dst, ws)
+
+
+class BoundClahe(Stage):
+    """CLAHE with its tables computed, blending them per pixel position."""
+
+    def __init__(self, clahe: Clahe, tables: np.ndarray, shape: tuple[int, int]) -> None:
+        super().__init__(clahe.levels)
+        self.name = clahe.name
+        self.clahe = clahe
+        self.tables = tables
+        self.shape = shape
+        self.tile_h, self.tile_w = clahe.tile_size(shape)
+
+    def _weights(self, positions: np.ndarray, tile: int, grid: int):
+        scaled = positions / tile - 0.5
+        first = np.floor(scaled).astype(np.int64)
+        weight = (scaled - first).astype(np.float32)
+        return np.clip(first, 0, grid - 1), np.clip(first + 1, 0, grid - 1), weight
+
+    def apply_at(self, src, dst, ws, y0):
+        grid_x, levels = self.clahe.grid_x, self.levels
+        y1, y2, wy = self._weights(np.arange(y0, y0 + src.shape[0]), self.tile_h, self.clahe.grid_y)
+        x1, x2, wx = self._weights(np.arange(src.shape[1]), self.tile_w, grid_x)
+        flat = self.tables.ravel()
+        values = src.astype(np.int64)
+
+        def lookup(ty: np.ndarray, tx: np.ndarray) -> np.ndarray:
+            return flat[(ty[:, None] * grid_x + tx[None, :]) * levels + values]
+
+        top = ws.get("top", src.shape)
+        bottom = ws.get("bottom", src.shape)
+        top[...] = lookup(y1, x1) * (1 - wx) + lookup(y1, x2) * wx
+        bottom[...] = lookup(y2, x1) * (1 - wx) + lookup(y2, x2) * wx
+        top *= (1 - wy)[:, None]
+        bottom *= wy[:, None]
+        top += bottom
+        _store(top, dst, self.maximum)
+
+    def apply(self, src, dst, ws):
+        self.apply_at(src, dst, ws, 0)
+
+
+#################################################
+# Builders: filter_name -> (params, levels) -> Stage
+
+
+def _convert_scale(params, levels):
+    return ConvertScale(levels, _or(params.alpha, 1.5), _or(params.beta, 30))
+
+
+def _text_filter(params, levels):
+    return AddWeighted(
+        levels,
+        "text_filter",
+        _or(params.kernel_size, 5),
+        _or(params.blur_amount, 0),
+        _or(params.alpha, 1.5),
+        _or(params.beta, -0.5),
+        _or(params.gamma, 0),
+    )
+
+
+def _apply_unsharp_mask(params, levels):
+    return AddWeighted(levels, "apply_unsharp_mask", 0, _or(params.blur_amount, 2.5), 1.5, -0.5)
+
+
+def _apply_unsharp_mask2(params, levels):
+    strength = _or(params.sharpen_strength, 1.5)
+    return AddWeighted(
+        levels,
+        "apply_unsharp_mask2",
+        0,
+        _or(params.blur_sigma, 1.0),
+        1 + strength,
+        -strength,
+    )
+
+
+def _enhance_gray(params, levels):
+    return EnhanceGray(
+        levels,
+        _or(params.alpha, 1.5),
+        _or(params.beta, -0.5),
+        _or(params.blur_amount, 3),
+        _or(params.brightness, 0),
+        _or(params.blur_sigma, 3.2),
+        _or(params.sharpen_strength, 1.0),
+    )
+
+
+def _gaussian_blur(params, levels):
+    ksize = _or(params.kernel_size, 0)
+    sigma = _or(params.blur_amount, 3)
+    if ksize <= 0 and sigma <= 0:
+        raise PreprocessorError("gaussian_blur: kernel_size or blur_amount must be positive")
+    return GaussianBlur(levels, ksize, sigma)
+
+
+def _apply_clahe(params, levels):
+    grid = _or(params.tile_grid_size, (8, 8))
+    return Clahe(levels, _or(params.clip_limit, 1.0), (int(grid[0]), int(grid[1])))
+
+
+def _apply_laplacian(params, levels):
+    return Correlate(levels, "apply_laplacian", laplacian_kernel(_or(params.kernel_size, 1)))
+
+
+def _apply_sharpening_filter(params, levels):
+    kernel = np.array(SHARPENING_KERNELS[params.kernel_type], dtype=np.float64)
+    if params.new_kernel is not None:
+        new_kernel = np.array(params.new_kernel, dtype=np.float64)
+        kernel = kernel + new_kernel if params.append_kernel else new_kernel
+    elif params.append_kernel:
+        raise PreprocessorError("apply_sharpening_filter: append_kernel requires new_kernel")
+    if params.divide:
+        kernel = kernel / params.divide
+    return Correlate(levels, "apply_sharpening_filter", kernel)
+
+
+def _cvt_color(params, levels):
+    # 단일 채널 frame은 이미 gray이므로 gray로의 변환만 의미가 있다
+    if not params.mode.name.endswith("GRAY"):
+        raise PreprocessorError(f"cvtColor: {params.mode.name} needs a color frame")
+    return Identity(levels, "cvtColor")
+
+
+FILTERS: dict[str, Callable[[BaseModel, int], Stage]] = {
+    "apply_clahe": _apply_clahe,
+    "apply_unsharp_mask": _apply_unsharp_mask,
+    "apply_unsharp_mask2": _apply_unsharp_mask2,
+    "stretch_histogram": lambda params, levels: StretchHistogram(levels),
+    "denoize": lambda params, levels: Denoize(levels),
+    "enhance_gray": _enhance_gray,
+    "gaussian_blur": _gaussian_blur,
+    "equalize": lambda params, levels: Equalize(levels),
+    "convert_scale": _convert_scale,
+    "adjust_gamma": lambda params, levels: AdjustGamma(levels, params.gamma),
+    "auto_adjust_gamma": lambda params, levels: AutoAdjustGamma(
+        levels,
+        _or(params.target_brightness, 128),
+        _or(params.target_gamma, 2.5),
+        _or(params.max_iterations, 10),
+    ),
+    "set_target_brightness": lambda params, levels: SetTargetBrightness(
+        levels,
+        params.target_brightness,
+    ),
+    "text_filter": _text_filter,
+    "remove_background": lambda params, levels: RemoveBackground(levels),
+    "color_inversion": lambda params, levels: ColorInversion(levels),
+    "filter_dark_pixels": lambda params, levels: FilterDarkPixels(levels, params.threshold),
+    "cvtColor": _cvt_color,
+    "apply_laplacian": _apply_laplacian,
+    "apply_sharpening_filter": _apply_sharpening_filter,
+}
@@ -0,0 +1,246 @@
+"""
+Compiles a validated preprocessor cascade into a reusable pipeline.
+
+A `Pipeline` keeps its intermediate frames and float scratch buffers in a `Workspace`,
+so running it on frames of the same shape allocates nothing but the output.
+
+Runs of pointwise stages (`convert_scale`, `adjust_gamma`, `color_inversion`, ...) are fused
+into one lookup table, so they cost one sweep over the frame instead of one each.
+Spatial stages stay separate passes.
+
+`Pipeline.run_tiled` streams a tall strip in fixed-height tiles. Each tile is read with
+the halo rows the spatial stages need (the sum of their kernel radii), so the output
+equals `Pipeline.run` while only a tile and its halo are in memory.
+Stages that need statistics of their whole input (histogram tables and the CLAHE tile
+histograms) cost one extra pass over the strip each to collect them. A pass keeps no
+intermediate strip, so it reads the input again and re-runs every stage before the one
+it collects for: with k such stages the input is read k + 1 times, and a stage followed
+by j of them runs j + 1 times.
+Tiles are independent apart from their halo, so they can be processed by a thread pool:
+NumPy releases the GIL in the array loops. Every thread has its own workspace.
+The pool is shared by every tiled run of the worker process (`get_tile_executor`).
+"""
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import lru_cache
+from time import perf_counter
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+from xray_settings.routers.preprocessor import PreprocCascadingFunctionItem
+
+from xray_swagger.services.preprocessor.filters import (
+    FILTERS,
+    FusedHistogramLut,
+    FusedLut,
+    GlobalStats,
+    PointwiseStage,
+    PreprocessorError,
+    Stage,
+    Workspace,
+    _dtype,
+)
+from xray_swagger.settings import settings
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage], levels: int) -> None:
+        self.stages = stages
+        self.levels = levels
+        self.dtype = np.dtype(_dtype(levels))
+        self._local = threading.local()
+
+    @property
+    def workspace(self) -> Workspace:
+        """Scratch buffers of the calling thread."""
+        ws = getattr(self._local, "workspace", None)
+        if ws is None:
+            ws = self._local.workspace = Workspace()
+        return ws
+
+    def plan(self) -> list[tuple[str, list[str]]]:
+        """Passes over the frame: ("lut" or "spatial", names of the filters in the pass)."""
+        return [
+            (
+                "lut" if isinstance(stage, PointwiseStage) else "spatial",
+                [member.name for member in getattr(stage, "stages", [stage])],
+            )
+            for stage in self.stages
+        ]
+
+    def run(
+        self,
+        image: np.ndarray,
+        out: np.ndarray | None = None,
+        timings: list[tuple[str, float]] | None = None,
+    ) -> np.ndarray:
+        """
+        Runs every stage on a 2-D frame.
+
+        :param out: output frame, allocated when None. It may be `image` itself.
+        :param timings: receives (stage name, seconds) per stage.
+        """
+        if image.dtype != self.dtype or image.ndim != 2:
+            raise PreprocessorError(f"Expected a 2-D {self.dtype} frame, got {image.dtype}")
+        if out is None:
+            out = np.empty_like(image)
+        if not self.stages:
+            np.copyto(out, image)
+            return out
+
+        ws = self.workspace
+        buffers = (ws.get("ping", image.shape, self.dtype), ws.get("pong", image.shape, self.dtype))
+        src = image
+        for index, stage in enumerate(self.stages):
+            last = index == len(self.stages) - 1
+            dst = out if last and out is not src else buffers[index % 2]
+            started = perf_counter()
+            stage.apply(src, dst, ws)
+            if timings is not None:
+                timings.append((stage.name, perf_counter() - started))
+            src = dst
+        if src is not out:
+            np.copyto(out, src)
+        return out
+
+    def _tile(
+        self,
+        stages: list[Stage],
+        read_rows: Callable[[int, int], np.ndarray],
+        height: int,
+        halo: int,
+        top: int,
+        bottom: int,
+    ) -> np.ndarray:
+        start, stop = max(0, top - halo), min(height, bottom + halo)
+        src = read_rows(start, stop)
+        ws = self.workspace
+        for index, stage in enumerate(stages):
+            # halo 안쪽 행은 이웃 stage의 border 처리로 오염되지만 잘라낼 행보다 적다
+            dst = ws.get(f"tile{index % 2}", src.shape, self.dtype)
+            stage.apply_at(src, dst, ws, start)
+            src = dst
+        return src[top - start : bottom - start].copy()
+
+    def _tiles(
+        self,
+        stages: list[Stage],
+        read_rows: Callable[[int, int], np.ndarray],
+        height: int,
+        tile_rows: int,
+        workers: int,
+        executor: Executor | None,
+    ) -> Iterator[tuple[int, np.ndarray]]:
+        """(first row, output rows) per tile, in order."""
+        halo = sum(stage.halo for stage in stages)
+        tops = range(0, height, tile_rows)
+        if workers <= 1:
+            for top in tops:
+                bottom = min(top + tile_rows, height)
+                yield top, self._tile(stages, read_rows, height, halo, top, bottom)
+            return
+        executor = executor or get_tile_executor()
+        pending: deque[tuple[int, Future]] = deque()
+        for top in tops:
+            # 메모리가 bounded 되도록 앞서 나가는 타일 수를 제한
+            if len(pending) >= 2 * workers:
+                first, future = pending.popleft()
+                yield first, future.result()
+            future = executor.submit(
+                self._tile,
+                stages,
+                read_rows,
+                height,
+                halo,
+                top,
+                min(top + tile_rows, height),
+            )
+            pending.append((top, future))
+        while pending:
+            first, future = pending.popleft()
+            yield first, future.result()
+
+    def run_tiled(
+        self,
+        read_rows: Callable[[int, int], np.ndarray],
+        shape: tuple[int, int],
+        tile_rows: int,
+        workers: int = 1,
+        executor: Executor | None = None,
+    ) -> Iterator[np.ndarray]:
+        """
+        Output of `run` in tiles of `tile_rows` rows, top to bottom.
+
+        Reads the input once per `GlobalStats` stage plus once for the output,
+        re-running the stages before each of those stages on every read.
+
+        :param read_rows: rows [start, stop) of the input frame of `shape`, thread-safe.
+        :param workers: tiles processed concurrently.
+        :param executor: threads processing the tiles, `get_tile_executor()` when None.
+        """
+        if tile_rows < 1:
+            raise PreprocessorError(f"tile_rows must be positive, got {tile_rows}")
+        height = shape[0]
+        bound: list[Stage] = []
+        pending: list[Stage] = []
+        for stage in self.stages:
+            if not isinstance(stage, GlobalStats):
+                pending.append(stage)
+                continue
+            stats = stage.begin(shape)
+            tiles = self._tiles(bound + pending, read_rows, height, tile_rows, workers, executor)
+            for top, rows in tiles:
+                stage.observe(stats, rows, top)
+            bound += [*pending, stage.bind(stats)]
+            pending = []
+        tiles = self._tiles(bound + pending, read_rows, height, tile_rows, workers, executor)
+        for _, rows in tiles:
+            yield rows
+
+
+@lru_cache
+def get_tile_executor() -> ThreadPoolExecutor:
+    """Threads of the tiled runs, `preprocessor_thread_count` per worker process."""
+    return ThreadPoolExecutor(settings.preprocessor_thread_count, thread_name_prefix="preprocessor")
+
+
+def fuse(stages: list[Stage], levels: int) -> list[Stage]:
+    """Replaces every run of two or more pointwise stages by one `FusedLut`."""
+    fused: list[Stage] = []
+    run: list[PointwiseStage] = []
+    for stage in [*stages, None]:
+        if isinstance(stage, PointwiseStage):
+            run.append(stage)
+            continue
+        if len(run) > 1:
+            fuse_class = FusedLut
+            if any(stage.uses_histogram for stage in run):
+                fuse_class = FusedHistogramLut
+            fused.append(fuse_class(levels, run))
+        else:
+            fused.extend(run)
+        run = []
+        if stage is not None:
+            fused.append(stage)
+    return fused
+
+
+def compile_cascade(
+    functions: Iterable[PreprocCascadingFunctionItem],
+    levels: int = 1 << 16,
+    fused: bool = True,
+) -> Pipeline:
+    """
+    Builds the stages of a validated cascade for frames of `levels` intensity levels.
+
+    :param fused: fuses consecutive pointwise stages into one lookup table.
+    :raises PreprocessorError: when a filter or its parameters cannot run.
+    """
+    stages = []
+    for function in functions:
+        builder = FILTERS.get(function.filter_name)
+        if builder is None:
+            raise PreprocessorError(f"Unknown filter {function.filter_name}")
+        stages.append(builder(function.params, levels))
+    return Pipeline(fuse(stages, levels) if fused else stages, levels)
@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from redis.asyncio import ConnectionPool
 
+from xray_swagger.db.tracing import get_query_tracer
+from xray_swagger.services.redis.pubsub import QUERY_TRACING_CHANNEL, SettingsChangeHub
 from xray_swagger.settings import settings
 
 
@@ -22,3 +24,25 @@ async def shutdown_redis(app: FastAPI) -> None:  # pragma: no cover
     :param app: current FastAPI app.
     """
     await app.state.redis_pool.disconnect()
+
+
+def init_settings_hub(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Starts fan-out of settings change events for WebSocket clients.
+
+    The hub also applies the query tracing sample rate published by any worker.
+
+    :param app: current fastapi application.
+    """
+    app.state.settings_hub = SettingsChangeHub(app.state.redis_pool)
+    app.state.settings_hub.handle(QUERY_TRACING_CHANNEL, get_query_tracer().apply_message)
+    app.state.settings_hub.start()
+
+
+async def shutdown_settings_hub(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Stops fan-out of settings change events.
+
+    :param app: current FastAPI app.
+    """
+    await app.state.settings_hub.stop()
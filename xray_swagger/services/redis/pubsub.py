@@ -0,0 +1,105 @@
+import asyncio
+from typing import Callable
+
+from fastapi.param_functions import Depends
+from loguru import logger
+from pydantic import BaseModel
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError
+
+from xray_swagger.services.redis.dependency import get_redis_pool
+
+SETTINGS_CHANNEL = "xray:settings:changes"
+# 모든 worker에 적용할 monitoring 설정 (WebSocket client에는 전달하지 않는다)
+QUERY_TRACING_CHANNEL = "xray:monitoring:query-tracing"
+
+
+class SettingsChangePublisher:
+    """Publishes settings change events on `SETTINGS_CHANNEL`, or on another channel."""
+
+    def __init__(self, redis_pool: ConnectionPool = Depends(get_redis_pool)) -> None:
+        self.redis_pool = redis_pool
+
+    async def publish(self, event: BaseModel, channel: str = SETTINGS_CHANNEL) -> None:
+        try:
+            async with Redis(connection_pool=self.redis_pool) as redis:
+                await redis.publish(channel, event.model_dump_json())
+        except RedisError as err:
+            logger.warning(f"Settings change publish failed: {err}")
+
+
+class SettingsChangeHub:
+    """
+    Fans out the events of one Redis subscription to local subscribers.
+
+    Each worker holds a single subscription to `SETTINGS_CHANNEL`
+    no matter how many WebSocket clients are connected.
+    A slow subscriber loses its oldest events instead of blocking the others.
+    The messages of the channels registered with `handle` go to their handler instead.
+    """
+
+    queue_size = 64
+    reconnect_delay = 1.0
+
+    def __init__(self, redis_pool: ConnectionPool) -> None:
+        self.redis_pool = redis_pool
+        self._queues: set[asyncio.Queue[bytes]] = set()
+        self._task: asyncio.Task[None] | None = None
+        self._handlers: dict[str, Callable[[bytes], None]] = {}
+
+    def subscribe(self) -> "asyncio.Queue[bytes]":
+        queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=self.queue_size)
+        self._queues.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: "asyncio.Queue[bytes]") -> None:
+        self._queues.discard(queue)
+
+    def handle(self, channel: str, handler: Callable[[bytes], None]) -> None:
+        """Calls `handler` with the data of every message on `channel`. Call before `start`."""
+        self._handlers[channel] = handler
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass  # noqa: WPS420
+
+    def _broadcast(self, data: bytes) -> None:
+        for queue in list(self._queues):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    def _dispatch(self, message: dict) -> None:
+        if message["type"] != "message":
+            return
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        try:
+            self._handlers.get(channel, self._broadcast)(message["data"])
+        except Exception:
+            # 한 event의 실패로 구독이 끝나지 않도록 한다
+            logger.exception(f"Settings change event dropped: {message['data']!r}")
+
+    async def _run(self) -> None:
+        # 어떤 오류에도 다시 구독한다. CancelledError는 Exception이 아니므로 stop()은 동작한다.
+        while True:
+            try:
+                async with Redis(connection_pool=self.redis_pool) as redis:
+                    async with redis.pubsub() as pubsub:
+                        await pubsub.subscribe(SETTINGS_CHANNEL, *self._handlers)
+                        async for message in pubsub.listen():
+                            self._dispatch(message)
+            except RedisError as err:
+                logger.warning(f"Settings change subscription lost: {err}")
+            except Exception:
+                logger.exception("Settings change subscription failed")
+            await asyncio.sleep(self.reconnect_delay)
@@ -0,0 +1,126 @@
+from typing import NamedTuple
+
+from fastapi.param_functions import Depends
+from loguru import logger
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError, WatchError
+
+from xray_swagger.services.redis.dependency import get_redis_pool
+from xray_swagger.settings import settings
+
+KEY_PREFIX = "xray:settings:product"
+
+
+def _version_key(product_id: int) -> str:
+    return f"{KEY_PREFIX}:{product_id}:version"
+
+
+def _generation_key(product_id: int) -> str:
+    return f"{KEY_PREFIX}:{product_id}:generation"
+
+
+def _bundle_key(product_id: int, version: int) -> str:
+    return f"{KEY_PREFIX}:{product_id}:v{version}"
+
+
+class CachedBundle(NamedTuple):
+    etag: str
+    bundle: bytes
+
+
+class ProductSettingsCache:
+    """
+    Read-through cache of the settings bundle of each product.
+
+    A bundle is the pre-serialized JSON of every setting of a product.
+    It is stored under the product id plus the maximum setting `version`,
+    and `{product_id}:version` points to the current bundle and holds its ETag,
+    so conditional requests are answered without reading the bundle.
+
+    Every invalidation increments `{product_id}:generation`. A bundle is only stored
+    if the generation read before its rows were read from the DB is still current,
+    so a request that read the rows before a concurrent update cannot store them after
+    the update invalidated the cache.
+
+    Redis failures are logged and treated as cache misses.
+    """
+
+    def __init__(self, redis_pool: ConnectionPool = Depends(get_redis_pool)) -> None:
+        self.redis_pool = redis_pool
+
+    async def _get_pointer(self, redis: Redis, product_id: int) -> tuple[int, str] | None:
+        pointer = await redis.get(_version_key(product_id))
+        if pointer is None:
+            return None
+        version, etag = pointer.decode().split(" ", 1)
+        return int(version), etag
+
+    async def get_etag(self, product_id: int) -> str | None:
+        try:
+            async with Redis(connection_pool=self.redis_pool) as redis:
+                pointer = await self._get_pointer(redis, product_id)
+        except RedisError as err:
+            logger.warning(f"Settings cache read failed: {err}")
+            return None
+        return pointer[1] if pointer else None
+
+    async def get(self, product_id: int) -> CachedBundle | None:
+        try:
+            async with Redis(connection_pool=self.redis_pool) as redis:
+                pointer = await self._get_pointer(redis, product_id)
+                if pointer is None:
+                    return None
+                bundle = await redis.get(_bundle_key(product_id, pointer[0]))
+        except RedisError as err:
+            logger.warning(f"Settings cache read failed: {err}")
+            return None
+        return CachedBundle(pointer[1], bundle) if bundle is not None else None
+
+    async def generation(self, product_id: int) -> int | None:
+        """The generation to pass to `set`, read before reading the settings from the DB."""
+        try:
+            async with Redis(connection_pool=self.redis_pool) as redis:
+                generation = await redis.get(_generation_key(product_id))
+        except RedisError as err:
+            logger.warning(f"Settings cache read failed: {err}")
+            return None
+        return int(generation or 0)
+
+    async def set(
+        self,
+        product_id: int,
+        generation: int | None,
+        max_version: int,
+        etag: str,
+        bundle: bytes,
+    ) -> None:
+        if generation is None:
+            return
+        ttl = settings.product_settings_cache_ttl
+        try:
+            async with Redis(connection_pool=self.redis_pool) as redis:
+                async with redis.pipeline(transaction=True) as pipe:
+                    await pipe.watch(_generation_key(product_id))
+                    current = await pipe.get(_generation_key(product_id))
+                    if int(current or 0) != generation:
+                        return
+                    pipe.multi()
+                    pipe.set(_bundle_key(product_id, max_version), bundle, ex=ttl)
+                    pipe.set(_version_key(product_id), f"{max_version} {etag}", ex=ttl)
+                    await pipe.execute()
+        except WatchError:
+            # set 도중에 무효화되었다
+            return
+        except RedisError as err:
+            logger.warning(f"Settings cache write failed: {err}")
+
+    async def invalidate(self, product_id: int) -> None:
+        try:
+            async with Redis(connection_pool=self.redis_pool) as redis:
+                await redis.incr(_generation_key(product_id))
+                pointer = await redis.getdel(_version_key(product_id))
+                if pointer is not None:
+                    version = int(pointer.decode().split(" ", 1)[0])
+                    await redis.delete(_bundle_key(product_id, version))
+        except RedisError as err:
+            logger.warning(f"Settings cache invalidation failed: {err}")
@@ -0,0 +1,197 @@
+"""
+Cache of the users behind bearer tokens, so authenticating a request reads no database.
+
+Users are keyed by username plus the `iat` of the token, in two tiers:
+
+- an in-process TTL + LRU of `user_cache_local_size` entries living `user_cache_local_ttl`
+  seconds, which answers the repeated requests of a worker without a round trip;
+- a Redis hash `xray:users:{username}` with one field per `iat`, shared by the workers
+  and expiring `user_cache_ttl` seconds after it was last filled.
+
+Updating or deleting a user through the API bumps the generation of the username and drops
+the Redis hash and the local entries of the worker, the local entries of the other workers
+expire within `user_cache_local_ttl`. A user read from the database is only written to Redis
+while the generation read before the lookup is unchanged, so a row read before the commit
+of an update cannot refill the hash after the invalidation.
+Only active users are cached, and their passwords are masked in Redis.
+Redis failures are logged and treated as cache misses.
+"""
+from __future__ import annotations
+
+import typing
+from collections import OrderedDict
+from functools import lru_cache
+from time import monotonic
+
+from loguru import logger
+from pydantic import ValidationError
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError, WatchError
+
+from xray_swagger.db.models.user import User
+from xray_swagger.settings import settings
+
+if typing.TYPE_CHECKING:
+    from xray_swagger.web.api.users.schema import CurrentUserDTO
+
+KEY_PREFIX = "xray:users"
+
+
+def _user_key(username: str) -> str:
+    return f"{KEY_PREFIX}:{username}"
+
+
+def _generation_key(username: str) -> str:
+    return f"{KEY_PREFIX}:{username}:generation"
+
+
+class UserCache:
+    def __init__(
+        self,
+        model: type[CurrentUserDTO],
+        ttl: int,
+        local_ttl: float,
+        local_size: int,
+    ) -> None:
+        self.model = model
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self._local: OrderedDict[tuple[str, int], tuple[float, CurrentUserDTO]] = OrderedDict()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _get_local(self, key: tuple[str, int]) -> CurrentUserDTO | None:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return user
+
+    def _put_local(self, key: tuple[str, int], user: CurrentUserDTO) -> None:
+        if self.local_ttl <= 0:
+            return
+        self._local[key] = (monotonic() + self.local_ttl, user)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+            self.evictions += 1
+
+    async def get(
+        self,
+        redis_pool: ConnectionPool,
+        username: str,
+        iat: int,
+    ) -> CurrentUserDTO | None:
+        key = (username, iat)
+        user = self._get_local(key)
+        if user is not None:
+            self.local_hits += 1
+            return user
+
+        try:
+            async with Redis(connection_pool=redis_pool) as redis:
+                raw = await redis.hget(_user_key(username), str(iat))
+        except RedisError as err:
+            logger.warning(f"User cache read failed: {err}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        try:
+            user = self.model.model_validate_json(raw)
+        except ValidationError:
+            # 스키마가 바뀌기 전에 저장된 항목
+            self.misses += 1
+            return None
+        self.shared_hits += 1
+        self._put_local(key, user)
+        return user
+
+    async def generation(self, redis_pool: ConnectionPool, username: str) -> int | None:
+        """The generation to pass to `set`, read before reading the user from the DB."""
+        try:
+            async with Redis(connection_pool=redis_pool) as redis:
+                generation = await redis.get(_generation_key(username))
+        except RedisError as err:
+            logger.warning(f"User cache read failed: {err}")
+            return None
+        return int(generation or 0)
+
+    async def set(
+        self,
+        redis_pool: ConnectionPool,
+        iat: int,
+        db_user: User,
+        generation: int | None,
+    ) -> CurrentUserDTO:
+        """
+        Caches `db_user` for the token issued at `iat`, unless it was deleted.
+
+        Redis is only filled while the generation of the username is still `generation`.
+        """
+        user = self.model.model_validate(db_user)
+        if user.deleted_at is not None:
+            return user
+        self._put_local((user.username, iat), user)
+        if generation is None:
+            return user
+        try:
+            async with Redis(connection_pool=redis_pool) as redis:
+                async with redis.pipeline(transaction=True) as pipe:
+                    await pipe.watch(_generation_key(user.username))
+                    current = await pipe.get(_generation_key(user.username))
+                    if int(current or 0) != generation:
+                        return user
+                    pipe.multi()
+                    pipe.hset(_user_key(user.username), str(iat), user.model_dump_json())
+                    pipe.expire(_user_key(user.username), self.ttl)
+                    await pipe.execute()
+        except WatchError:
+            # set 도중에 무효화되었다
+            return user
+        except RedisError as err:
+            logger.warning(f"User cache write failed: {err}")
+        return user
+
+    async def invalidate(self, redis_pool: ConnectionPool, username: str) -> None:
+        """Drops every token of `username`."""
+        for key in [key for key in self._local if key[0] == username]:
+            del self._local[key]
+        self.invalidations += 1
+        try:
+            async with Redis(connection_pool=redis_pool) as redis:
+                await redis.incr(_generation_key(username))
+                await redis.delete(_user_key(username))
+        except RedisError as err:
+            logger.warning(f"User cache invalidation failed: {err}")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._local),
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+@lru_cache
+def get_user_cache() -> UserCache:
+    # users 패키지는 deps를 import하므로 모듈 수준에서 import하면 순환된다
+    from xray_swagger.web.api.users.schema import CurrentUserDTO  # noqa: WPS433
+
+    return UserCache(
+        CurrentUserDTO,
+        settings.user_cache_ttl,
+        settings.user_cache_local_ttl,
+        settings.user_cache_local_size,
+    )
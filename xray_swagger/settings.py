@@ -1,4 +1,5 @@
 import enum
+import os
 from pathlib import Path
 from tempfile import gettempdir
 from typing import Optional
@@ -47,6 +48,10 @@ class Settings(BaseSettings):
     db_pass: str = "xray_swagger"
     db_base: str = "xray_swagger"
     db_echo: bool = False
+    # Fraction of SQL statements to trace (0 disables, see /api/monitoring/queries)
+    query_trace_sample_rate: float = 0.0
+    # Statements kept by the query tracer of each worker
+    query_trace_size: int = 1000
 
     # Variables for Redis
     redis_host: str = "xray_swagger-redis"
@@ -54,6 +59,43 @@ class Settings(BaseSettings):
     redis_user: Optional[str] = None
     redis_pass: Optional[str] = None
     redis_base: Optional[int] = None
+    # Seconds to keep cached product settings bundles
+    product_settings_cache_ttl: int = 600
+    # Seconds to keep the users of bearer tokens in Redis, and in each worker (0 disables)
+    user_cache_ttl: int = 300
+    user_cache_local_ttl: float = 5.0
+    user_cache_local_size: int = 1024
+    # Verified bearer tokens to keep decoded in each worker (0 disables)
+    token_cache_size: int = 4096
+
+    # Maximum rows and body size accepted by one request of the batch endpoints
+    batch_max_rows: int = 10000
+    batch_max_bytes: int = 16 << 20
+
+    # Monthly partitions of inspection_session / defect to create ahead
+    partition_months_ahead: int = 3
+    # Seconds between partition maintenance runs (0 disables the manager)
+    partition_maintenance_interval: int = 3600
+
+    # Directory of the memory-mapped acquisition buffers (MmapSession.image_s3_key)
+    mmap_storage_dir: Path = TEMP_DIR / "xray_mmap"
+    # Pixels per scan line and bytes per pixel of the acquisition buffers
+    mmap_line_width: int = 1024
+    mmap_bytes_per_pixel: int = 2
+    # Bytes per chunk of the frame streaming responses
+    mmap_stream_chunk_size: int = 1 << 20
+    # Rendered NG image previews
+    preview_cache_dir: Path = TEMP_DIR / "xray_previews"
+    preview_cache_max_bytes: int = 256 << 20
+    preview_max_width: int = 512
+    # Scan lines per tile of the streamed preprocessor previews
+    preprocessor_tile_rows: int = 256
+    # Threads processing preprocessor tiles, 0 for one per CPU
+    preprocessor_workers: int = 0
+
+    @property
+    def preprocessor_thread_count(self) -> int:
+        return self.preprocessor_workers or os.cpu_count() or 1
 
     @property
     def db_url(self) -> URL:
@@ -0,0 +1,246 @@
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from xray_swagger.db.dao.products_dao import DefectDAO
+from xray_swagger.db.models.mmap_session import MmapSession
+from xray_swagger.db.models.product import InspectionSession, Product
+from xray_swagger.web.api.batch import read_batch
+from xray_swagger.web.api.products.schema import InspectionSessionCreateDTO
+
+
+def _row(key: str) -> bytes:
+    return json.dumps({"image_s3_key": key, "session_started_at": "2023-08-21T09:10:00"}).encode()
+
+
+def _request(body: bytes, content_type: str, chunk_size: int | None = None) -> Request:
+    chunk_size = chunk_size or max(len(body), 1)
+    chunks = [body[start : start + chunk_size] for start in range(0, len(body), chunk_size)]
+
+    async def receive() -> dict:
+        chunk = chunks.pop(0) if chunks else b""
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "headers": [(b"content-type", content_type.encode())],
+    }
+    return Request(scope, receive)
+
+
+@pytest.mark.anyio
+async def test_read_json_array() -> None:
+    """Tests a JSON array batch body."""
+    body = b"[" + _row("a") + b", " + _row("b") + b"]"
+
+    rows = await read_batch(_request(body, "application/json"), InspectionSessionCreateDTO, 10, 1024)
+
+    assert [row.image_s3_key for row in rows] == ["a", "b"]
+
+
+@pytest.mark.anyio
+async def test_read_ndjson_reports_row_index() -> None:
+    """Tests that NDJSON errors point to the offending line."""
+    body = _row("a") + b'\n\n{"system_error": "x"}\n'
+
+    with pytest.raises(RequestValidationError) as exc_info:
+        await read_batch(_request(body, "application/x-ndjson"), InspectionSessionCreateDTO, 10, 1024)
+
+    assert exc_info.value.errors()[0]["loc"] == ("body", 1, "image_s3_key")
+
+
+@pytest.mark.anyio
+async def test_read_batch_requires_session_started_at() -> None:
+    """Tests that rows without session_started_at are refused instead of stamped."""
+    body = b'[{"image_s3_key": "a"}]'
+
+    with pytest.raises(RequestValidationError) as exc_info:
+        await read_batch(_request(body, "application/json"), InspectionSessionCreateDTO, 10, 1024)
+
+    assert exc_info.value.errors()[0]["loc"] == ("body", 0, "session_started_at")
+
+
+@pytest.mark.anyio
+async def test_read_batch_limit() -> None:
+    """Tests the row limit of a batch."""
+    body = _row("a") + b"\n" + _row("b")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await read_batch(
+            _request(body, "application/x-ndjson"),
+            InspectionSessionCreateDTO,
+            1,
+            1024,
+        )
+
+    assert exc_info.value.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+@pytest.mark.anyio
+async def test_read_batch_stops_at_row_limit() -> None:
+    """Tests that the NDJSON rows after the limit are not parsed."""
+    body = _row("a") + b"\n" + _row("b") + b'\n{"system_error": "x"}'
+
+    with pytest.raises(HTTPException) as exc_info:
+        await read_batch(
+            _request(body, "application/x-ndjson"),
+            InspectionSessionCreateDTO,
+            1,
+            1024,
+        )
+
+    assert exc_info.value.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+@pytest.mark.anyio
+async def test_read_batch_byte_limit() -> None:
+    """Tests that oversized bodies are refused by Content-Length or while streaming."""
+    body = b"[" + _row("a") + b", " + _row("b") + b"]"
+
+    declared = _request(body, "application/json")
+    declared.scope["headers"].append((b"content-length", str(len(body)).encode()))
+
+    async def unread() -> dict:
+        raise AssertionError("The body must not be read")
+
+    declared._receive = unread  # noqa: WPS437
+    with pytest.raises(HTTPException) as exc_info:
+        await read_batch(declared, InspectionSessionCreateDTO, 10, 16)
+    assert exc_info.value.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    chunked = _request(body, "application/json", chunk_size=8)
+    with pytest.raises(HTTPException) as exc_info:
+        await read_batch(chunked, InspectionSessionCreateDTO, 10, 16)
+    assert exc_info.value.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+@pytest.mark.anyio
+async def test_inspection_sessions_batch(
+    fastapi_app: FastAPI,
+    client: AsyncClient,
+    seeded_product: tuple[Product, MmapSession],
+) -> None:
+    """Tests ids and conflicts of a batch of inspection sessions."""
+    product, mmap_session = seeded_product
+
+    def row(key: str, started_at: str = "2023-08-21T09:10:00") -> dict:
+        return {
+            "image_s3_key": key,
+            "session_started_at": started_at,
+            "start_mmap_session_uuid": str(mmap_session.uuid),
+            "start_mmap_session_ptr": 0,
+        }
+
+    url = fastapi_app.url_path_for("create_inspection_sessions_batch", product_id=product.id)
+    await client.post(url, json=[row("exists")])
+    response = await client.post(
+        url,
+        json=[
+            row("a"),
+            row("exists"),
+            row("b"),
+            row("a"),
+            # 같은 key라도 시작 시각이 다르면 다른 session
+            row("exists", "2023-08-21T10:10:00"),
+            # offset이 다른 같은 시각
+            row("b", "2023-08-21T18:10:00+09:00"),
+        ],
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    result = response.json()
+    assert [row_id is None for row_id in result["ids"]] == [False, True, False, True, False, True]
+    assert [
+        (c["index"], c["image_s3_key"], c["session_started_at"], c["reason"])
+        for c in result["conflicts"]
+    ] == [
+        (1, "exists", "2023-08-21T09:10:00", "exists"),
+        (3, "a", "2023-08-21T09:10:00", "duplicate"),
+        (5, "b", "2023-08-21T09:10:00", "duplicate"),
+    ]
+
+
+@pytest.mark.anyio
+async def test_inspection_sessions_batch_replay(
+    fastapi_app: FastAPI,
+    client: AsyncClient,
+    seeded_product: tuple[Product, MmapSession],
+) -> None:
+    """Tests that replaying the same batch creates no new sessions."""
+    product, mmap_session = seeded_product
+    batch = [
+        {
+            "image_s3_key": key,
+            "session_started_at": "2023-08-21T09:10:00",
+            "start_mmap_session_uuid": str(mmap_session.uuid),
+            "start_mmap_session_ptr": 0,
+        }
+        for key in ("a", "b")
+    ]
+
+    url = fastapi_app.url_path_for("create_inspection_sessions_batch", product_id=product.id)
+    first = await client.post(url, json=batch)
+    replay = await client.post(url, json=batch)
+
+    assert first.status_code == replay.status_code == status.HTTP_201_CREATED
+    assert None not in first.json()["ids"]
+    assert replay.json()["ids"] == [None, None]
+    assert [(c["index"], c["reason"]) for c in replay.json()["conflicts"]] == [
+        (0, "exists"),
+        (1, "exists"),
+    ]
+
+
+@pytest.mark.anyio
+async def test_session_defects_batch(
+    fastapi_app: FastAPI,
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    seeded_product: tuple[Product, MmapSession],
+) -> None:
+    """Tests that defects are created in order and bound to the session of the product."""
+    product, mmap_session = seeded_product
+    isp_sess = InspectionSession(
+        product_id=product.id,
+        image_s3_key=uuid.uuid4().hex,
+        session_started_at=datetime.utcnow(),
+        start_mmap_session_uuid=mmap_session.uuid,
+        start_mmap_session_ptr=0,
+    )
+    dbsession.add(isp_sess)
+    await dbsession.flush()
+    defects = [
+        {"defect_category": 1, "inspection_module": "AlatHP", "coordinates": [0, 0, 4, 4]},
+        {"defect_category": 2, "inspection_module": "Al003e", "coordinates": [1, 1, 5, 5]},
+    ]
+
+    url = fastapi_app.url_path_for(
+        "create_session_defects_batch",
+        product_id=product.id,
+        isp_sess_id=isp_sess.id,
+    )
+    response = await client.post(url, json=defects)
+    missing = await client.post(
+        fastapi_app.url_path_for(
+            "create_session_defects_batch",
+            product_id=product.id + 1,
+            isp_sess_id=isp_sess.id,
+        ),
+        json=defects,
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    ids = response.json()
+    assert len(ids) == 2
+    page = await DefectDAO(dbsession).filter(product.id, isp_sess.id)
+    modules = {row.id: row.inspection_module for row in page.items}
+    assert modules == dict(zip(ids, ["AlatHP", "Al003e"]))
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from starlette import status
+
+from xray_swagger.db.models.mmap_session import MmapSession
+from xray_swagger.db.models.product import Product
+from xray_swagger.db.models.rollup import RollupGranularity
+from xray_swagger.web.api.products.schema import InspectionSessionCreateDTO
+
+
+def test_bucket_truncation() -> None:
+    """Tests the bucket start of each granularity."""
+    ts = datetime(2023, 8, 21, 18, 46, 13, 26246)
+
+    assert RollupGranularity.HOUR.truncate(ts) == datetime(2023, 8, 21, 18)
+    assert RollupGranularity.DAY.truncate(ts) == datetime(2023, 8, 21)
+
+
+def test_session_started_at_is_stored_in_utc() -> None:
+    """Tests that an offset timestamp is stored and bucketed in UTC."""
+    payload = InspectionSessionCreateDTO(
+        image_s3_key="kst",
+        session_started_at=datetime(2023, 8, 22, 0, 30, tzinfo=timezone(timedelta(hours=9))),
+    )
+
+    assert payload.model_dump()["session_started_at"] == datetime(2023, 8, 21, 15, 30)
+
+
+@pytest.mark.anyio
+async def test_defect_rate(
+    fastapi_app: FastAPI,
+    client: AsyncClient,
+    seeded_product: tuple[Product, MmapSession],
+) -> None:
+    """Tests that ingested sessions and defects are counted in the rollups."""
+    product, mmap_session = seeded_product
+    sessions = [
+        {
+            "image_s3_key": f"{product.id}-{n}",
+            "session_started_at": f"2023-08-21T{hour}:10:00",
+            "start_mmap_session_uuid": str(mmap_session.uuid),
+            "start_mmap_session_ptr": n,
+        }
+        for n, hour in enumerate(["09", "09", "09", "10"])
+    ]
+    response = await client.post(
+        fastapi_app.url_path_for("create_inspection_sessions_batch", product_id=product.id),
+        json=sessions,
+    )
+    ng_id = response.json()["ids"][0]
+    url = fastapi_app.url_path_for(
+        "create_session_defects_batch",
+        product_id=product.id,
+        isp_sess_id=ng_id,
+    )
+    defect = {"defect_category": 1, "inspection_module": "AlatHP", "coordinates": [0, 0, 4, 4]}
+    await client.post(url, json=[defect, defect])
+    await client.post(url, json=[{**defect, "defect_category": 2}])
+
+    response = await client.get(
+        fastapi_app.url_path_for("get_defect_rate", product_id=product.id),
+        params={"from": "2023-08-21T09:30:00", "to": "2023-08-22T00:00:00"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    rate = response.json()
+    assert (rate["session_count"], rate["ng_session_count"]) == (4, 1)
+    assert [bucket["session_count"] for bucket in rate["buckets"]] == [3, 1]
+    assert rate["buckets"][0]["defect_rate"] == pytest.approx(1 / 3)
+    assert sorted(
+        (c["defect_category"], c["defect_count"], c["ng_session_count"])
+        for c in rate["categories"]
+    ) == [(1, 2, 1), (2, 1, 1)]
@@ -0,0 +1,94 @@
+import io
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator
+
+import numpy as np
+import pytest
+from xray_settings.routers.contaminant.rule import RuleDetectSettingTemplate
+
+from xray_swagger.services.detection.pipeline import RuleDefect
+from xray_swagger.services.detection.replay import (
+    ReplayItem,
+    ReplayReport,
+    match_boxes,
+    replay_sessions,
+)
+from xray_swagger.services.mmap.reader import MmapFrameReader
+from xray_swagger.settings import settings
+
+WIDTH = settings.mmap_line_width
+STARTED = datetime(2023, 8, 29)
+
+
+def _frame(contaminants: list[tuple[int, int]]) -> np.ndarray:
+    frame = np.full((64, WIDTH), 65000, dtype="<u2")
+    frame[8:56, 16:-16] = 30000
+    for row, col in contaminants:
+        frame[row : row + 4, col : col + 4] = 18000
+    return frame
+
+
+@pytest.fixture
+def reader(tmp_path: Path) -> MmapFrameReader:
+    for name, contaminants in {"a": [(20, 100)], "b": [], "c": [(30, 500), (40, 800)]}.items():
+        (tmp_path / f"{name}.bin").write_bytes(_frame(contaminants).tobytes())
+    return MmapFrameReader(tmp_path, WIDTH * settings.mmap_bytes_per_pixel, 1 << 16)
+
+
+def test_match_boxes() -> None:
+    """Tests that boxes match when they share a pixel, not when they only touch."""
+    found, kept = match_boxes([[0, 0, 4, 4], [10, 10, 12, 12]], [[3, 3, 8, 8], [12, 0, 20, 10]])
+
+    assert found.tolist() == [True, False]
+    assert kept.tolist() == [True, False]
+    assert match_boxes([], [[0, 0, 1, 1]])[1].tolist() == [False]
+
+
+@pytest.mark.anyio
+async def test_replay_sessions(reader: MmapFrameReader) -> None:
+    """Tests the verdict flips and the gained and lost defects of a process pool replay."""
+    templates = [
+        RuleDetectSettingTemplate(
+            exec_order=1,
+            algorithm_name="AlatHP",
+            parameters={"DetectionArea": 4, "MaskValue": [0.0, 0.0, 0.0, 0.0]},
+        ),
+    ]
+    stored = {
+        "a": [RuleDefect("AlatHP", [98, 18, 106, 26])],
+        "b": [RuleDefect("RULE", [10, 10, 20, 20])],
+        "c": [RuleDefect("RULE", [798, 38, 806, 46]), RuleDefect("RULE", [0, 0, 4, 4])],
+    }
+    consumed: list[int] = []
+
+    async def items() -> AsyncIterator[ReplayItem]:
+        for isp_sess_id, name in enumerate(stored, start=1):
+            consumed.append(isp_sess_id)
+            spans = reader.spans([f"{name}.bin"], 0, None)
+            yield ReplayItem(isp_sess_id, STARTED, spans, stored[name])
+
+    out = io.StringIO()
+    report = ReplayReport(out)
+    async for diff in replay_sessions(templates, items(), reader, workers=2):
+        report.add(diff)
+
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert consumed == [1, 2, 3]
+    assert report.counts == {
+        "sessions": 3,
+        "skipped": 0,
+        "ng_before": 3,
+        "ng_after": 2,
+        "ok_to_ng": 0,
+        "ng_to_ok": 1,
+        "gained_defects": 1,
+        "lost_defects": 2,
+    }
+    assert [(line["isp_sess_id"], line["verdict"]) for line in lines] == [
+        (2, "NG->OK"),
+        (3, "NG->NG"),
+    ]
+    assert lines[1]["gained"][0]["inspection_module"] == "AlatHP"
+    assert lines[1]["lost"] == [{"inspection_module": "RULE", "coordinates": [0, 0, 4, 4]}]
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from starlette.requests import Request
+
+from xray_swagger.web.api.etag import digest_etag, is_not_modified, timestamp_etag
+
+
+def _request(if_none_match: str | None = None) -> Request:
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request({"type": "http", "headers": headers})
+
+
+def test_if_none_match() -> None:
+    """Tests matching of `If-None-Match` against an entity tag."""
+    etag = timestamp_etag("p", 1, modified_at=[datetime(2023, 8, 29)])
+
+    assert not is_not_modified(_request(), etag)
+    assert is_not_modified(_request(etag), etag)
+    assert is_not_modified(_request(f'"other", W/{etag}'), etag)
+    assert is_not_modified(_request("*"), etag)
+    assert not is_not_modified(_request('"other"'), etag)
+
+
+def test_digest_etag_changes_with_any_version() -> None:
+    """Tests that bumping a version below the maximum still changes the entity tag."""
+    before = digest_etag("ps", 1, versions=[("Contour", 5), ("Conveyor.Velocity", 1)])
+    after = digest_etag("ps", 1, versions=[("Contour", 5), ("Conveyor.Velocity", 2)])
+
+    assert before != after
+    assert before == digest_etag("ps", 1, versions=[("Conveyor.Velocity", 1), ("Contour", 5)])
@@ -0,0 +1,36 @@
+import sys
+from typing import Iterator
+
+import pytest
+
+from xray_swagger.logging import debug, set_sink
+from xray_swagger.settings import LogLevel
+
+
+@pytest.fixture
+def messages() -> Iterator[list]:
+    records: list = []
+    yield records
+    set_sink(sys.stderr, LogLevel.DEBUG)
+
+
+def test_debug_is_deferred(messages: list) -> None:
+    """Tests that nothing is built below DEBUG and the caller is recorded at DEBUG."""
+    built: list[str] = []
+
+    def expensive() -> str:
+        built.append("scope")
+        return "scope"
+
+    set_sink(lambda message: messages.append(message.record), LogLevel.INFO)
+    debug("{} = {}", "authlevel", 2)
+    debug("{}", expensive, lazy=True)
+    assert messages == []
+    assert built == []
+
+    set_sink(lambda message: messages.append(message.record), LogLevel.DEBUG)
+    debug("{} = {}", "authlevel", 2)
+    debug("{}", expensive, lazy=True)
+    assert [record["message"] for record in messages] == ["authlevel = 2", "scope"]
+    assert {record["function"] for record in messages} == {"test_debug_is_deferred"}
+    assert built == ["scope"]
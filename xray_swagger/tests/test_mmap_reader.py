@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pytest
+
+from xray_swagger.services.mmap.reader import (
+    FrameRangeError,
+    InvalidImageKey,
+    MmapFrameReader,
+)
+
+
+@pytest.fixture
+def reader(tmp_path: Path) -> MmapFrameReader:
+    (tmp_path / "a.bin").write_bytes(bytes(range(40)))
+    (tmp_path / "b.bin").write_bytes(bytes(range(100, 120)))
+    return MmapFrameReader(tmp_path, line_bytes=4, chunk_size=10)
+
+
+def test_chunks_are_line_aligned(reader: MmapFrameReader) -> None:
+    """Tests that chunks end on scan line boundaries and spans concatenate."""
+    spans = reader.spans(["a.bin", "b.bin"], 7, 2)
+    chunks = list(reader.iter_bytes(spans))
+
+    assert reader.line_count("a.bin") == 10
+    assert [len(chunk) for chunk in chunks] == [8, 4, 8]
+    assert b"".join(chunks) == bytes(range(28, 40)) + bytes(range(100, 108))
+    assert reader.read_lines(spans, 2, 4) == bytes(range(36, 40)) + bytes(range(100, 104))
+
+
+def test_span_errors(reader: MmapFrameReader) -> None:
+    """Tests out of range lines, path traversal and missing buffers."""
+    with pytest.raises(FrameRangeError):
+        reader.span("a.bin", 3, 11)
+    with pytest.raises(InvalidImageKey):
+        reader.span("../a.bin")
+    with pytest.raises(FileNotFoundError):
+        reader.span("c.bin")
+    assert list(reader.iter_bytes([reader.span("a.bin", 5, 5)])) == []
@@ -0,0 +1,85 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from xray_swagger.db.dao._keyset import InvalidCursor, _decode, _encode
+from xray_swagger.db.models.mmap_session import MmapSession
+from xray_swagger.db.models.product import InspectionSession, Product
+from xray_swagger.web.api.pagination import NEXT_CURSOR_HEADER, PREV_CURSOR_HEADER
+
+
+def test_cursor_round_trip() -> None:
+    """Tests that a cursor restores the typed key of the boundary row."""
+    key = [datetime(2023, 8, 21, 18, 46, 13, 26246), 42]
+    keys = [InspectionSession.session_started_at, InspectionSession.id]
+
+    assert _decode(_encode("n", key), keys) == ("n", key)
+    with pytest.raises(InvalidCursor):
+        _decode(_encode("n", [42]), keys)
+    with pytest.raises(InvalidCursor):
+        _decode("not a cursor", keys)
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        ["2023-08-21T18:46:13", "42"],
+        ["2023-08-21T18:46:13", True],
+        ["2023-08-21T18:46:13", 1 << 31],
+        ["2023-08-21T18:46:13", 4.2],
+        ["2023-08-21T18:46:13+09:00", 42],
+        [20230821, 42],
+        [None, 42],
+    ],
+)
+def test_cursor_value_types(key: list) -> None:
+    """Tests that cursor values not matching the key columns are invalid cursors."""
+    keys = [InspectionSession.session_started_at, InspectionSession.id]
+
+    with pytest.raises(InvalidCursor):
+        _decode(_encode("n", key), keys)
+
+
+@pytest.mark.anyio
+async def test_inspection_session_pages(
+    fastapi_app: FastAPI,
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    seeded_product: tuple[Product, MmapSession],
+) -> None:
+    """Tests walking the inspection sessions forward and back with cursors."""
+    product, mmap_session = seeded_product
+    started_at = datetime(2023, 8, 21)
+    dbsession.add_all(
+        InspectionSession(
+            product_id=product.id,
+            image_s3_key=uuid.uuid4().hex,
+            # 같은 시각의 session도 id로 구분된다
+            session_started_at=started_at + timedelta(minutes=n // 2),
+            start_mmap_session_uuid=mmap_session.uuid,
+            start_mmap_session_ptr=n,
+        )
+        for n in range(5)
+    )
+    await dbsession.flush()
+    url = fastapi_app.url_path_for("get_inspection_sessions", product_id=product.id)
+
+    first = await client.get(url, params={"size": 2})
+    second = await client.get(url, params={"size": 2, "cursor": first.headers[NEXT_CURSOR_HEADER]})
+    last = await client.get(url, params={"size": 2, "cursor": second.headers[NEXT_CURSOR_HEADER]})
+    back = await client.get(url, params={"size": 2, "cursor": second.headers[PREV_CURSOR_HEADER]})
+    invalid = await client.get(url, params={"cursor": "not a cursor"})
+
+    pages = [[row["id"] for row in response.json()] for response in (first, second, last)]
+    ids = sum(pages, [])
+    assert len(ids) == len(set(ids)) == 5
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert PREV_CURSOR_HEADER not in first.headers
+    assert NEXT_CURSOR_HEADER not in last.headers
+    assert [row["id"] for row in back.json()] == pages[0]
+    assert invalid.status_code == status.HTTP_400_BAD_REQUEST
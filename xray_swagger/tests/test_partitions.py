@@ -0,0 +1,40 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from xray_swagger.db.partitions import (
+    add_months,
+    create_partitions,
+    drop_expired_partitions,
+    partition_name,
+)
+
+
+def test_month_arithmetic() -> None:
+    """Tests month stepping across years and the partition names."""
+    assert add_months(date(2023, 11, 1), 3) == date(2024, 2, 1)
+    assert add_months(date(2023, 1, 1), -1) == date(2022, 12, 1)
+    assert partition_name("defect", date(2023, 8, 1)) == "defect_y2023m08"
+
+
+@pytest.mark.anyio
+async def test_create_and_drop_partitions(dbsession: AsyncSession) -> None:
+    """Tests that expired months are dropped, referencing defects first."""
+    conn = await dbsession.connection()
+
+    created = await create_partitions(conn, date(2099, 1, 1), date(2099, 2, 1))
+    again = await create_partitions(conn, date(2099, 1, 1), date(2099, 2, 1))
+    dropped = await drop_expired_partitions(conn, datetime(2099, 2, 1))
+
+    assert created == [
+        "inspection_session_y2099m01",
+        "defect_y2099m01",
+        "inspection_session_y2099m02",
+        "defect_y2099m02",
+    ]
+    assert again == []
+    assert dropped == ["defect_y2099m01", "inspection_session_y2099m01"]
+    remaining = await conn.scalar(text("SELECT to_regclass('defect_y2099m02')"))
+    assert remaining is not None
@@ -0,0 +1,43 @@
+import struct
+import zlib
+
+import pytest
+
+from xray_swagger.services.imaging.png import SIGNATURE, encode_png
+
+
+def _chunks(png: bytes) -> list[tuple[bytes, bytes]]:
+    assert png.startswith(SIGNATURE)
+    chunks = []
+    offset = len(SIGNATURE)
+    while offset < len(png):
+        (length,) = struct.unpack(">I", png[offset : offset + 4])
+        kind = png[offset + 4 : offset + 8]
+        data = png[offset + 8 : offset + 8 + length]
+        (crc,) = struct.unpack(">I", png[offset + 8 + length : offset + 12 + length])
+        assert crc == zlib.crc32(kind + data)
+        chunks.append((kind, data))
+        offset += 12 + length
+    return chunks
+
+
+def test_encode_16bit_png() -> None:
+    """Tests the header and the big-endian, filtered scan lines of a 16-bit image."""
+    # 2x3 pixels, little-endian, fed in uneven line-aligned chunks
+    pixels = [1, 2, 0x0102, 0x0304, 0xFFFF, 0]
+    raw = struct.pack("<6H", *pixels)
+    png = b"".join(encode_png([raw[:4], raw[4:]], width=2, height=3, bytes_per_pixel=2))
+
+    chunks = _chunks(png)
+    assert chunks[0] == (b"IHDR", struct.pack(">IIBBBBB", 2, 3, 16, 0, 0, 0, 0))
+    assert chunks[-1] == (b"IEND", b"")
+    idat = zlib.decompress(b"".join(data for kind, data in chunks if kind == b"IDAT"))
+    assert idat == b"".join(
+        b"\x00" + struct.pack(">2H", *pixels[row * 2 : row * 2 + 2]) for row in range(3)
+    )
+
+
+def test_unsupported_depth() -> None:
+    """Tests that an unsupported pixel size fails before streaming."""
+    with pytest.raises(ValueError):
+        encode_png([], width=1, height=1, bytes_per_pixel=3)
@@ -0,0 +1,195 @@
+import threading
+
+import numpy as np
+import pytest
+from xray_settings.routers.preprocessor import PreprocessorCascadingFunctionSetting
+
+from xray_swagger.services.preprocessor.benchmark import benchmark
+from xray_swagger.services.preprocessor.filters import PreprocessorError, laplacian_kernel
+from xray_swagger.services.preprocessor.pipeline import compile_cascade
+from xray_swagger.settings import settings
+
+ALL_FILTERS = [
+    {"filter_name": "apply_clahe", "params": {"clip_limit": 2.0}},
+    {"filter_name": "apply_unsharp_mask", "params": {}},
+    {"filter_name": "apply_unsharp_mask2", "params": {}},
+    {"filter_name": "stretch_histogram", "params": None},
+    {"filter_name": "denoize", "params": None},
+    {"filter_name": "enhance_gray", "params": {}},
+    {"filter_name": "gaussian_blur", "params": {"kernel_size": 5}},
+    {"filter_name": "equalize", "params": None},
+    {"filter_name": "convert_scale", "params": {"alpha": 1.1, "beta": 3}},
+    {"filter_name": "adjust_gamma", "params": {"gamma": 1.2}},
+    {"filter_name": "auto_adjust_gamma", "params": {}},
+    {"filter_name": "set_target_brightness", "params": {"target_brightness": 120}},
+    {"filter_name": "text_filter", "params": {}},
+    {"filter_name": "remove_background", "params": None},
+    {"filter_name": "color_inversion", "params": None},
+    {"filter_name": "filter_dark_pixels", "params": {"threshold": 10}},
+    {"filter_name": "cvtColor", "params": {"mode": 6}},
+    {"filter_name": "apply_laplacian", "params": {"kernel_size": 3}},
+    {"filter_name": "apply_sharpening_filter", "params": {"kernel_type": 2}},
+]
+
+
+def _cascade(*functions: dict):
+    return PreprocessorCascadingFunctionSetting(functions=list(functions)).functions
+
+
+@pytest.mark.parametrize("levels", [256, 1 << 16])
+def test_every_filter_runs(levels: int) -> None:
+    """Tests that every filter keeps the frame shape and depth, and is timed."""
+    dtype = np.uint8 if levels == 256 else np.uint16
+    frame = np.random.default_rng(0).integers(0, levels, (64, 48)).astype(dtype)
+    for start in range(0, len(ALL_FILTERS), 10):
+        functions = _cascade(*ALL_FILTERS[start : start + 10])
+        pipeline = compile_cascade(functions, levels, fused=False)
+        timings: list[tuple[str, float]] = []
+
+        out = pipeline.run(frame, timings=timings)
+
+        assert out.shape == frame.shape
+        assert out.dtype == dtype
+        assert [name for name, _ in timings] == [
+            function["filter_name"] for function in ALL_FILTERS[start : start + 10]
+        ]
+
+
+def test_pointwise_values() -> None:
+    """Tests the saturation of the pointwise filters and the 8-bit parameter scaling."""
+    frame = np.array([[0, 100, 250]], dtype=np.uint8)
+    pipeline = compile_cascade(
+        _cascade(
+            {"filter_name": "convert_scale", "params": {"alpha": 1.0, "beta": 10}},
+            {"filter_name": "color_inversion", "params": None},
+        ),
+        256,
+    )
+    assert pipeline.run(frame).tolist() == [[245, 145, 0]]
+
+    wide = compile_cascade(
+        _cascade({"filter_name": "convert_scale", "params": {"alpha": 1.0, "beta": 1}}),
+        1 << 16,
+    )
+    assert wide.run(np.array([[0]], dtype=np.uint16)).tolist() == [[257]]
+
+
+def test_static_lut_is_built_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that a table independent of the frame is not rebuilt per frame."""
+    pipeline = compile_cascade(
+        _cascade({"filter_name": "convert_scale", "params": {"alpha": 1.0, "beta": 10}}),
+        256,
+    )
+    stage = pipeline.stages[0]
+    builds = []
+    table = stage.table
+    monkeypatch.setattr(stage, "table", lambda hist: builds.append(hist) or table(hist))
+
+    for value in (0, 100):
+        assert pipeline.run(np.array([[value]], dtype=np.uint8)).tolist() == [[value + 10]]
+
+    assert builds == [None]
+
+
+def test_spatial_filters() -> None:
+    """Tests blurs keep flat frames flat and the Laplacian kernels of OpenCV."""
+    flat = np.full((20, 30), 77, dtype=np.uint8)
+    pipeline = compile_cascade(
+        _cascade(
+            {"filter_name": "gaussian_blur", "params": {"kernel_size": 7}},
+            {"filter_name": "apply_unsharp_mask", "params": {}},
+            {"filter_name": "denoize", "params": None},
+        ),
+        256,
+    )
+    assert np.array_equal(pipeline.run(flat, out=flat), np.full((20, 30), 77))
+    assert laplacian_kernel(3).tolist() == [[2, 0, 2], [0, -8, 0], [2, 0, 2]]
+
+
+def test_invalid_cascades() -> None:
+    """Tests that filters which cannot run are rejected when compiling."""
+    with pytest.raises(PreprocessorError):
+        compile_cascade(_cascade({"filter_name": "cvtColor", "params": {"mode": 8}}))
+    with pytest.raises(PreprocessorError):
+        compile_cascade(_cascade({"filter_name": "adjust_gamma", "params": {"gamma": 0}}))
+    with pytest.raises(PreprocessorError):
+        compile_cascade(_cascade({"filter_name": "gaussian_blur", "params": {"kernel_size": 4}}))
+
+
+@pytest.mark.parametrize("levels", [256, 1 << 16])
+def test_fused_luts_match_stage_by_stage(levels: int) -> None:
+    """Tests that fusing pointwise runs, histogram stages included, changes no pixel."""
+    dtype = np.uint8 if levels == 256 else np.uint16
+    frame = np.random.default_rng(1).integers(0, levels, (40, 30)).astype(dtype)
+    functions = _cascade(
+        {"filter_name": "convert_scale", "params": {"alpha": 1.3, "beta": -20}},
+        {"filter_name": "adjust_gamma", "params": {"gamma": 0.8}},
+        {"filter_name": "equalize", "params": None},
+        {"filter_name": "set_target_brightness", "params": {"target_brightness": 90}},
+        {"filter_name": "gaussian_blur", "params": {"kernel_size": 3}},
+        {"filter_name": "color_inversion", "params": None},
+        {"filter_name": "filter_dark_pixels", "params": {"threshold": 40}},
+    )
+
+    fused = compile_cascade(functions, levels)
+    separate = compile_cascade(functions, levels, fused=False)
+
+    assert fused.plan() == [
+        ("lut", ["convert_scale", "adjust_gamma", "equalize", "set_target_brightness"]),
+        ("spatial", ["gaussian_blur"]),
+        ("lut", ["color_inversion", "filter_dark_pixels"]),
+    ]
+    assert len(separate.plan()) == 7
+    assert np.array_equal(fused.run(frame), separate.run(frame))
+
+
+@pytest.mark.parametrize("tile_rows", [1, 7, 64, 500])
+def test_tiled_matches_whole_frame(tile_rows: int) -> None:
+    """Tests that halos and the statistics passes make tiles match the whole frame."""
+    frame = np.random.default_rng(2).integers(0, 1 << 16, (130, 40)).astype(np.uint16)
+    pipeline = compile_cascade(
+        _cascade(
+            {"filter_name": "gaussian_blur", "params": {"kernel_size": 7}},
+            {"filter_name": "equalize", "params": None},
+            {"filter_name": "apply_clahe", "params": {"tile_grid_size": [4, 3]}},
+            {"filter_name": "apply_laplacian", "params": {"kernel_size": 5}},
+            {"filter_name": "denoize", "params": None},
+        ),
+    )
+    reads: list[int] = []
+
+    def read_rows(start: int, stop: int) -> np.ndarray:
+        reads.append(stop - start)
+        return frame[start:stop]
+
+    tiles = list(pipeline.run_tiled(read_rows, frame.shape, tile_rows))
+
+    assert np.array_equal(np.vstack(tiles), pipeline.run(frame))
+    assert max(reads) <= tile_rows + 2 * (3 + 2 + 1)
+
+
+def test_parallel_tiles() -> None:
+    """Tests that tiles processed by a thread pool come back in order and unchanged."""
+    frame = np.random.default_rng(3).integers(0, 256, (90, 20)).astype(np.uint8)
+    pipeline = compile_cascade(
+        _cascade(
+            {"filter_name": "gaussian_blur", "params": {"kernel_size": 5}},
+            {"filter_name": "stretch_histogram", "params": None},
+            {"filter_name": "apply_sharpening_filter", "params": {"kernel_type": 1}},
+        ),
+        256,
+    )
+
+    runs = [
+        list(pipeline.run_tiled(lambda start, stop: frame[start:stop], frame.shape, 8, 4))
+        for _ in range(2)
+    ]
+    results = benchmark(pipeline, frame, 8, [1, 2], repeat=1)
+
+    for tiles in runs:
+        assert np.array_equal(np.vstack(tiles), pipeline.run(frame))
+    # 호출마다 pool을 만들지 않고 공유한다
+    threads = [thread for thread in threading.enumerate() if thread.name.startswith("preprocessor")]
+    assert 0 < len(threads) <= settings.preprocessor_thread_count
+    assert [result.workers for result in results] == [1, 2]
+    assert results[0].speedup == 1
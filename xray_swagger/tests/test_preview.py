@@ -0,0 +1,85 @@
+import os
+from pathlib import Path
+
+import numpy as np
+from xray_settings.routers.image import ImageInspectionPreviewPostprocessing
+
+from xray_swagger.services.imaging.preview import build_lut, render_preview
+from xray_swagger.services.imaging.thumbnails import ThumbnailCache
+
+
+def test_lut_adjustments() -> None:
+    """Tests the window, gamma, contrast and inversion of the lookup table."""
+    identity = build_lut(ImageInspectionPreviewPostprocessing(), 256)
+    assert np.array_equal(identity, np.arange(256, dtype=np.uint8))
+
+    windowed = build_lut(ImageInspectionPreviewPostprocessing(), 1 << 16, 1000, 2000)
+    assert (windowed[0], windowed[1000], windowed[2000], windowed[-1]) == (0, 0, 255, 255)
+
+    brighter = build_lut(ImageInspectionPreviewPostprocessing(gamma=100), 256)
+    assert brighter[64] > identity[64]
+    steeper = build_lut(ImageInspectionPreviewPostprocessing(contrast=50), 256)
+    assert steeper[64] < identity[64] and steeper[192] > identity[192]
+    inverted = build_lut(ImageInspectionPreviewPostprocessing(inversion=1), 256)
+    assert np.array_equal(inverted, identity[::-1])
+
+
+def test_render_preview() -> None:
+    """Tests the downscale, window stretch and sharpening of a 16-bit strip."""
+    image = np.tile(np.arange(8, dtype="<u2") * 100, (6, 1))
+    params = ImageInspectionPreviewPostprocessing()
+
+    preview = render_preview(image.tobytes(), 8, 2, params, max_width=4)
+
+    assert preview.shape == (3, 4)
+    assert preview.dtype == np.uint8
+    assert (preview[:, 0].max(), preview[:, -1].min()) == (0, 255)
+
+    sharpened = render_preview(
+        image.tobytes(),
+        8,
+        2,
+        params.model_copy(update={"sharpening": 100}),
+        max_width=8,
+    )
+    assert sharpened.shape == (6, 8)
+
+
+def test_thumbnail_cache_lru(tmp_path: Path) -> None:
+    """Tests that the least recently read entries are evicted first."""
+    cache = ThumbnailCache(tmp_path, max_bytes=20)
+    cache.put("a", b"a" * 10)
+    cache.put("b", b"b" * 10)
+    os.utime(tmp_path / "a.png", (0, 0))
+    os.utime(tmp_path / "b.png", (1, 1))
+    assert cache.get("a") == b"a" * 10
+
+    cache.put("c", b"c" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == b"c" * 10
+    assert cache.stats() == {"hits": 2, "misses": 1, "entries": 2, "bytes": 20}
+
+
+def test_thumbnail_cache_scans_when_over_budget(tmp_path: Path) -> None:
+    """Tests that the directory is only scanned when over budget or every `scan_interval` puts."""
+    scans = []
+
+    class CountingCache(ThumbnailCache):
+        def evict(self) -> None:
+            scans.append(len(scans))
+            super().evict()
+
+    cache = CountingCache(tmp_path, max_bytes=35, scan_interval=4)
+    for key in "abc":
+        cache.put(key, b"x" * 10)
+    # 첫 put은 현재 크기를 알기 위해 scan한다
+    assert len(scans) == 1
+
+    cache.put("d", b"x" * 10)
+    assert len(scans) == 2
+    assert cache.stats()["bytes"] == 30
+
+    cache.put("e", b"x" * 10)
+    assert len(scans) == 3
+    assert cache.stats()["bytes"] == 30
@@ -0,0 +1,183 @@
+"""
+Regression tests of the DAO query plans.
+
+Each DAO query is captured as executed, then explained with sequential scans
+disabled. A plan that still holds a Seq Scan has no usable index.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from xray_swagger.db.dao.mmap_session_dao import MmapSessionDAO
+from xray_swagger.db.dao.products_dao import DefectDAO, InspectionSessionDAO
+from xray_swagger.db.dao.rollup_dao import DefectRateRollupDAO
+from xray_swagger.db.models.defect import Defect, DefectCategory
+from xray_swagger.db.models.mmap_session import MmapSession
+from xray_swagger.db.models.product import InspectionSession, Product
+from xray_swagger.db.models.rollup import RollupGranularity
+
+
+@pytest.fixture
+async def seeded_sessions(
+    dbsession: AsyncSession,
+    seeded_product: tuple[Product, MmapSession],
+) -> list[InspectionSession]:
+    """Inspection sessions with a defect on every third, analyzed for the planner."""
+    product, mmap_session = seeded_product
+    started_at = datetime(2023, 8, 21)
+    sessions = [
+        InspectionSession(
+            product_id=product.id,
+            image_s3_key=uuid.uuid4().hex,
+            session_started_at=started_at + timedelta(minutes=n),
+            start_mmap_session_uuid=mmap_session.uuid,
+            start_mmap_session_ptr=n,
+        )
+        for n in range(200)
+    ]
+    dbsession.add_all(sessions)
+    await dbsession.flush()
+    dbsession.add_all(
+        Defect(
+            defect_category=DefectCategory.CONTAMINANT,
+            inspection_module="AlatHP",
+            coordinates=[0, 0, 4, 4],
+            product_id=product.id,
+            inspection_session_id=isp_sess.id,
+            session_started_at=isp_sess.session_started_at,
+        )
+        for isp_sess in sessions[::3]
+    )
+    await dbsession.flush()
+    for table in ("inspection_session", "defect", "mmap_session"):
+        await dbsession.execute(text(f"ANALYZE {table}"))
+    return sessions
+
+
+def _nodes(plan: dict) -> list[dict]:
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(_nodes(child))
+    return nodes
+
+
+async def _seq_scans(dbsession: AsyncSession, query: Callable[[], Awaitable[Any]]) -> list[str]:
+    """Runs `query`, then explains every SELECT it executed."""
+    connection = await dbsession.connection()
+    captured: list[tuple[str, Any]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany) -> None:  # noqa: WPS211
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(connection.sync_connection, "before_cursor_execute", capture)
+    try:
+        await query()
+    finally:
+        event.remove(connection.sync_connection, "before_cursor_execute", capture)
+
+    assert captured, "The query did not run any SELECT."
+    await connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    scans = []
+    for statement, parameters in captured:
+        raw = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = raw.scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        scans.extend(
+            node["Relation Name"]
+            for node in _nodes(plan[0]["Plan"])
+            if node["Node Type"] == "Seq Scan"
+        )
+    await connection.exec_driver_sql("SET LOCAL enable_seqscan = on")
+    return scans
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {},
+        {"isp_sess_id": True},
+        {"defect_category": DefectCategory.CONTAMINANT},
+        {"isp_sess_id": True, "defect_category": DefectCategory.CONTAMINANT},
+    ],
+)
+async def test_defect_filter_plan(
+    dbsession: AsyncSession,
+    seeded_sessions: list[InspectionSession],
+    filters: dict,
+) -> None:
+    """Tests that every DefectDAO.filter combination is served by an index."""
+    isp_sess = seeded_sessions[0]
+    if filters.get("isp_sess_id"):
+        filters = {**filters, "isp_sess_id": isp_sess.id}
+    dao = DefectDAO(dbsession)
+
+    assert await _seq_scans(dbsession, lambda: dao.filter(isp_sess.product_id, **filters)) == []
+
+
+@pytest.mark.anyio
+async def test_inspection_session_plans(
+    dbsession: AsyncSession,
+    seeded_sessions: list[InspectionSession],
+) -> None:
+    """Tests the InspectionSessionDAO queries."""
+    isp_sess = seeded_sessions[0]
+    product_id = isp_sess.product_id
+    dao = InspectionSessionDAO(dbsession)
+    page = await dao.get_all(product_id)
+
+    assert await _seq_scans(dbsession, lambda: dao.get_all(product_id)) == []
+    assert await _seq_scans(dbsession, lambda: dao.get_all(product_id, page.next_cursor)) == []
+    assert await _seq_scans(dbsession, lambda: dao.get_by_id(product_id, isp_sess.id)) == []
+    assert await _seq_scans(dbsession, lambda: dao.filter(product_id)) == []
+
+
+@pytest.mark.anyio
+async def test_rollup_plans(
+    dbsession: AsyncSession,
+    seeded_sessions: list[InspectionSession],
+) -> None:
+    """Tests the rollup reads and the defect category lookup of a session."""
+    isp_sess = seeded_sessions[1]
+    dao = DefectRateRollupDAO(dbsession)
+
+    assert (
+        await _seq_scans(
+            dbsession,
+            lambda: dao.record_defects(
+                isp_sess.product_id,
+                isp_sess.id,
+                [DefectCategory.METAL],
+            ),
+        )
+        == []
+    )
+    assert (
+        await _seq_scans(
+            dbsession,
+            lambda: dao.get_buckets(
+                isp_sess.product_id,
+                RollupGranularity.HOUR,
+                datetime(2023, 8, 21),
+                datetime(2023, 8, 22),
+            ),
+        )
+        == []
+    )
+
+
+@pytest.mark.anyio
+async def test_mmap_session_plan(
+    dbsession: AsyncSession,
+    seeded_sessions: list[InspectionSession],
+) -> None:
+    """Tests that preserved mmap sessions are read through the partial index."""
+    dao = MmapSessionDAO(dbsession)
+
+    assert await _seq_scans(dbsession, dao.filter) == []
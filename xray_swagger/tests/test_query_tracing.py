@@ -0,0 +1,65 @@
+from typing import Iterator
+
+import pytest
+from sqlalchemy import Engine, create_engine, event, text
+
+from xray_swagger.db.tracing import QueryTracer, fingerprint
+
+
+@pytest.fixture
+def tracer() -> Iterator[QueryTracer]:
+    tracer = QueryTracer(3)
+    yield tracer
+    tracer.set_sample_rate(0)
+
+
+def _run(engine: Engine, *statements: str) -> None:
+    with engine.connect() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def test_fingerprint() -> None:
+    """Tests that literals, parameters and list lengths do not change the fingerprint."""
+    digest, normalized = fingerprint(
+        "SELECT id FROM defect_2023_08\n WHERE id IN ($1, $2) LIMIT 10",
+    )
+
+    assert normalized == "SELECT id FROM defect_2023_08 WHERE id IN (...) LIMIT ?"
+    assert fingerprint("SELECT id FROM defect_2023_08 WHERE id IN ($1) LIMIT 5")[0] == digest
+    _, inserted = fingerprint("INSERT INTO t VALUES (?, 'a'), (?, 'b')")
+    assert inserted == "INSERT INTO t VALUES (?, ?), ..."
+    assert fingerprint("SELECT id FROM defect_2023_09 WHERE id IN ($1) LIMIT 5")[0] != digest
+
+
+def test_query_tracer(tracer: QueryTracer) -> None:
+    """Tests that statements are traced only while enabled, into a ring buffer."""
+    engine = create_engine("sqlite://")
+    _run(engine, "CREATE TABLE item (id INTEGER)")
+    assert not event.contains(Engine, "before_cursor_execute", tracer._before)
+    assert tracer.traces() == []
+
+    tracer.set_sample_rate(1)
+    _run(
+        engine,
+        "INSERT INTO item VALUES (1), (2)",
+        "UPDATE item SET id = 3 WHERE id = 1",
+        "UPDATE item SET id = 4 WHERE id = 2",
+        "UPDATE item SET id = 5 WHERE id = 9",
+    )
+    tracer.set_sample_rate(0)
+    _run(engine, "DELETE FROM item")
+
+    traces = tracer.traces()
+    assert [trace.rows for trace in traces] == [0, 1, 1]
+    assert {trace.statement for trace in traces} == {"UPDATE item SET id = ? WHERE id = ?"}
+    assert traces[0].caller.startswith("tests/test_query_tracing.py:")
+    assert traces[0].caller.endswith(" _run")
+    [statement] = tracer.statements()
+    assert statement.count == 3
+    assert statement.total_ms == pytest.approx(sum(trace.duration_ms for trace in traces))
+
+    tracer.clear()
+    assert tracer.traces() == []
+    with pytest.raises(ValueError):
+        tracer.set_sample_rate(1.5)
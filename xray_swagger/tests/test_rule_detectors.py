@@ -0,0 +1,212 @@
+import itertools
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+from xray_settings.routers.contaminant.rule import (
+    Al003e,
+    AlatHP,
+    Aldong1,
+    RuleDetectSettingTemplate,
+)
+
+from xray_swagger.services.detection.pipeline import (
+    DetectionError,
+    DetectionPipeline,
+    RuleDefect,
+    merge_defects,
+    rule_templates,
+)
+from xray_swagger.services.detection.rules import (
+    FrameImages,
+    box_mean,
+    detect,
+    detect_al003e,
+    detect_alathp,
+    detect_aldong1,
+    label_boxes,
+    template_parameters,
+)
+
+NO_MASK = [0.0, 0.0, 0.0, 0.0]
+
+
+@pytest.fixture
+def frame() -> np.ndarray:
+    """A 16-bit strip: air, a product with two densities and two dark contaminants."""
+    image = np.full((200, 300), 65000, dtype=np.uint16)
+    image[40:160, 50:150] = 30000
+    image[40:160, 150:250] = 45000
+    image += np.random.default_rng(0).integers(0, 200, image.shape, dtype=np.uint16)
+    image[80:84, 100:103] = 20000
+    image[120:122, 200:210] = 34000
+    return image
+
+
+def _flood_fill_boxes(mask: np.ndarray) -> list[list[int]]:
+    labels = np.full(mask.shape, -1)
+    boxes = []
+    for start in zip(*np.nonzero(mask)):
+        if labels[start] >= 0:
+            continue
+        labels[start] = len(boxes)
+        stack, pixels = [start], [start]
+        while stack:
+            row, col = stack.pop()
+            for dy, dx in itertools.product((-1, 0, 1), repeat=2):
+                y, x = row + dy, col + dx
+                if 0 <= y < mask.shape[0] and 0 <= x < mask.shape[1]:
+                    if mask[y, x] and labels[y, x] < 0:
+                        labels[y, x] = len(boxes)
+                        stack.append((y, x))
+                        pixels.append((y, x))
+        ys, xs = np.array(pixels).T
+        boxes.append([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1])
+    return boxes
+
+
+def test_label_boxes_match_flood_fill() -> None:
+    """Tests the run based 8-connected labelling against a flood fill."""
+    mask = np.random.default_rng(1).random((60, 70)) < 0.4
+
+    boxes = label_boxes(mask, 1)
+
+    assert sorted(map(tuple, boxes)) == sorted(map(tuple, _flood_fill_boxes(mask)))
+    assert label_boxes(mask, 1000) == []
+    assert label_boxes(np.zeros((3, 3), dtype=bool), 1) == []
+
+
+def test_box_mean() -> None:
+    """Tests the summed-area box filter against a direct window mean."""
+    image = np.random.default_rng(2).random((9, 11)).astype(np.float32)
+    padded = np.pad(image, 2, mode="reflect")
+
+    expected = np.array(
+        [[padded[y : y + 5, x : x + 5].mean() for x in range(11)] for y in range(9)],
+    )
+
+    assert np.allclose(box_mean(image, 5), expected, atol=1e-5)
+
+
+def test_detectors_find_contaminants(frame: np.ndarray) -> None:
+    """Tests that every detector finds both contaminants and not the product outline."""
+    for boxes in (
+        detect_alathp(frame, AlatHP(DetectionArea=4, MaskValue=NO_MASK)),
+        detect_al003e(frame, Al003e(BinaryThreshold=80, DetectionArea=4, MaskValue=NO_MASK)),
+        detect_aldong1(frame, Aldong1(ReduceValue=20, DetectionArea=4, MaskValue=NO_MASK)),
+    ):
+        # 밀도가 다른 두 부분의 경계는 과검출된다 (ReduceValue 설명 참고)
+        assert len(boxes) == 3
+        left, top, right, bottom = boxes[1]
+        assert left <= 100 and top <= 80 and right >= 103 and bottom >= 84
+        left, top, right, bottom = boxes[2]
+        assert left <= 200 and top <= 120 and right >= 210 and bottom >= 122
+
+
+def test_detection_parameters(frame: np.ndarray) -> None:
+    """Tests the mask margins, the minimum area and the sensitivity."""
+    masked = detect_alathp(frame, AlatHP(DetectionArea=4, MaskValue=[0.0, 0.0, 0.5, 0.0]))
+    assert masked == [[200, 119, 210, 123]]
+    assert detect_alathp(frame, AlatHP(DetectionArea=200, MaskValue=NO_MASK))[1:] == []
+    assert detect_alathp(frame, AlatHP(SmThThreshold=255, DetectionArea=4, MaskValue=NO_MASK)) == []
+    air = np.full((50, 50), 255, dtype=np.uint8)
+    assert detect_alathp(air, AlatHP(DetectionArea=1, MaskValue=NO_MASK)) == []
+
+
+def test_template_parameters(frame: np.ndarray) -> None:
+    """Tests that parameters are validated as the model of the algorithm name."""
+    template = RuleDetectSettingTemplate(
+        exec_order=1,
+        algorithm_name="Aldong1",
+        parameters={"ReduceValue": 20, "DetectionArea": 4, "MaskValue": NO_MASK},
+    )
+    assert isinstance(template.parameters, AlatHP)
+    assert isinstance(template_parameters(template), Aldong1)
+    assert detect(frame, template) == detect_aldong1(frame, template_parameters(template))
+
+    mismatched = template.model_copy(update={"algorithm_name": "Al003e"})
+    with pytest.raises(ValidationError):
+        template_parameters(mismatched)
+
+
+def _template(exec_order: int, algorithm_name: str, **parameters) -> RuleDetectSettingTemplate:
+    return RuleDetectSettingTemplate(
+        exec_order=exec_order,
+        algorithm_name=algorithm_name,
+        parameters={"DetectionArea": 4, "MaskValue": NO_MASK, **parameters},
+    )
+
+
+def test_pipeline_shares_filtered_images(frame: np.ndarray) -> None:
+    """Tests that detectors with the same smoothing filter the frame once, in exec_order."""
+    pipeline = DetectionPipeline(
+        [
+            _template(3, "Aldong1", ReduceValue=20, SmoothingDim=5),
+            _template(1, "AlatHP"),
+            _template(2, "Al003e", BinaryThreshold=80),
+        ],
+    )
+    images = FrameImages(frame)
+    timings: list[tuple[str, float]] = []
+
+    for step in pipeline.steps:
+        step.detector(images, step.params)
+    defects = pipeline.run(frame, timings)
+
+    assert [step.algorithm_name for step in pipeline.steps] == ["AlatHP", "Al003e", "Aldong1"]
+    assert [name for name, _ in timings] == ["AlatHP", "Al003e", "Aldong1"]
+    assert [key for key in images.computed if key[0] != "product"] == [
+        ("smoothed", 3),
+        ("hipass", 3, 9),
+        ("margins", *NO_MASK),
+        ("smoothed", 5),
+        ("hipass", 5, 9),
+    ]
+    assert [defect.inspection_module for defect in defects] == ["AlatHP"] * 3
+    assert defects == merge_defects(
+        [
+            RuleDefect(step.algorithm_name, box)
+            for step in pipeline.steps
+            for box in step.detector(frame, step.params)
+        ],
+    )
+
+
+def test_merge_defects() -> None:
+    """Tests that overlapping boxes merge into the first detector and touching ones do not."""
+    defects = [
+        RuleDefect("AlatHP", [10, 10, 20, 20]),
+        RuleDefect("AlatHP", [0, 0, 5, 5]),
+        RuleDefect("Al003e", [15, 15, 30, 25]),
+        RuleDefect("Aldong1", [28, 0, 40, 16]),
+        RuleDefect("Aldong1", [5, 0, 8, 5]),
+    ]
+
+    assert merge_defects(defects) == [
+        RuleDefect("AlatHP", [0, 0, 5, 5]),
+        RuleDefect("Aldong1", [5, 0, 8, 5]),
+        RuleDefect("AlatHP", [10, 0, 40, 25]),
+    ]
+    assert merge_defects([]) == []
+
+
+def test_merge_defects_long_chain() -> None:
+    """Tests that a long chain of boxes each overlapping the next merges into one defect."""
+    # 뒤에서부터 이어지는 사슬: 작은 index로 수렴하려면 사슬 길이만큼 전파되어야 한다
+    defects = [RuleDefect(f"Al{index}", [2 * index, 0, 2 * index + 3, 3]) for index in range(2000)]
+
+    assert merge_defects(defects[::-1]) == [RuleDefect("Al1999", [0, 0, 4001, 3])]
+
+
+def test_invalid_pipelines() -> None:
+    """Tests duplicated exec_order, mismatched parameters and setting values."""
+    with pytest.raises(DetectionError):
+        DetectionPipeline([_template(1, "AlatHP"), _template(1, "Aldong1")])
+    with pytest.raises(DetectionError):
+        DetectionPipeline([_template(1, "Al003e", SmThThreshold=80)])
+    with pytest.raises(DetectionError):
+        rule_templates({"exec_order": 7, "algorithm_name": "AlatHP", "parameters": {}})
+
+    single = _template(1, "AlatHP").model_dump()
+    assert len(rule_templates(single)) == 1
+    assert len(rule_templates([single, {**single, "exec_order": 2}])) == 2
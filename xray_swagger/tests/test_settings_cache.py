@@ -0,0 +1,45 @@
+import pytest
+from redis.asyncio import ConnectionPool
+
+from xray_swagger.services.redis.settings_cache import ProductSettingsCache
+
+
+@pytest.mark.anyio
+async def test_bundle_roundtrip(fake_redis_pool: ConnectionPool) -> None:
+    """
+    Tests that a stored bundle is read back until it is invalidated.
+
+    :param fake_redis_pool: fake redis pool.
+    """
+    cache = ProductSettingsCache(fake_redis_pool)
+    bundle = b'[{"product_id":1,"setting_param_name":"Contour","version":3,"value":{}}]'
+
+    assert await cache.get(1) is None
+    await cache.set(1, await cache.generation(1), 3, '"ps1-3-abc"', bundle)
+    assert await cache.get(1) == ('"ps1-3-abc"', bundle)
+    assert await cache.get_etag(1) == '"ps1-3-abc"'
+    assert await cache.get(2) is None
+
+    await cache.invalidate(1)
+    assert await cache.get(1) is None
+    assert await cache.get_etag(1) is None
+
+
+@pytest.mark.anyio
+async def test_stale_bundle_is_not_stored(fake_redis_pool: ConnectionPool) -> None:
+    """
+    Tests that a bundle read before an invalidation is not stored after it.
+
+    :param fake_redis_pool: fake redis pool.
+    """
+    cache = ProductSettingsCache(fake_redis_pool)
+    bundle = b'[{"product_id":1,"setting_param_name":"Contour","version":3,"value":{}}]'
+
+    generation = await cache.generation(1)
+    # 다른 요청이 설정을 수정하고 commit 후에 무효화한다
+    await cache.invalidate(1)
+    await cache.set(1, generation, 3, '"ps1-3-abc"', bundle)
+    assert await cache.get(1) is None
+
+    await cache.set(1, await cache.generation(1), 4, '"ps1-4-def"', bundle)
+    assert await cache.get_etag(1) == '"ps1-4-def"'
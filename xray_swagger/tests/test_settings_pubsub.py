@@ -0,0 +1,190 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeConnection
+from redis.asyncio import ConnectionPool, Redis
+
+from xray_swagger.db.tracing import QueryTracer
+from xray_swagger.services.redis.pubsub import (
+    QUERY_TRACING_CHANNEL,
+    SETTINGS_CHANNEL,
+    SettingsChangeHub,
+    SettingsChangePublisher,
+)
+from xray_swagger.services.redis.settings_cache import ProductSettingsCache
+from xray_swagger.web.api.monitoring.schema import QueryTracingDTO
+from xray_swagger.web.api.monitoring.views import set_query_tracing
+from xray_swagger.web.api.settings.schema import SettingsChangeEventDTO
+from xray_swagger.web.api.settings.views import (
+    update_conveyor_direction,
+    update_product_setting,
+)
+
+
+@pytest.mark.anyio
+async def test_slow_subscriber_drops_oldest() -> None:
+    """Tests that a full subscriber queue keeps the newest events."""
+    hub = SettingsChangeHub(ConnectionPool(connection_class=FakeConnection, server=FakeServer()))
+    hub.queue_size = 2
+    queue = hub.subscribe()
+
+    for n in range(3):
+        hub._broadcast(str(n).encode())  # noqa: WPS437
+
+    assert [queue.get_nowait() for _ in range(2)] == [b"1", b"2"]
+
+
+@pytest.mark.anyio
+async def test_unsubscribed_queue_is_skipped() -> None:
+    """Tests that events are not delivered after unsubscribing."""
+    hub = SettingsChangeHub(ConnectionPool(connection_class=FakeConnection, server=FakeServer()))
+    queue = hub.subscribe()
+    hub.unsubscribe(queue)
+
+    hub._broadcast(b"{}")  # noqa: WPS437
+
+    assert queue.empty()
+
+
+def test_event_serialization() -> None:
+    """Tests the JSON payload of a product setting change."""
+    event = SettingsChangeEventDTO(
+        scope="product",
+        setting_param_name="Conveyor.Velocity",
+        product_id=1,
+        version=3,
+    )
+
+    restored = SettingsChangeEventDTO.model_validate_json(event.model_dump_json())
+
+    assert restored == event
+
+
+class _Session:
+    async def commit(self) -> None:
+        """Nothing to commit."""
+
+
+class _SettingsDAO:
+    def __init__(self, row: Any) -> None:
+        self.row = row
+        self.session = _Session()
+
+    async def get(self, *key: Any) -> Any:
+        return self.row
+
+    async def update(self, row: Any, update: Any) -> None:
+        """Updates are checked through the published events."""
+
+
+@pytest.mark.anyio
+async def test_failed_event_does_not_stop_the_hub() -> None:
+    """Tests that the subscription outlives an event failing to be dispatched."""
+    pool = ConnectionPool(connection_class=FakeConnection, server=FakeServer())
+    hub = SettingsChangeHub(pool)
+    queue = hub.subscribe()
+    broadcast = hub._broadcast  # noqa: WPS437
+
+    def fail_once(data: bytes) -> None:
+        hub._broadcast = broadcast  # noqa: WPS437
+        raise ValueError(data)
+
+    hub._broadcast = fail_once  # noqa: WPS437
+    hub.start()
+    async with Redis(connection_pool=pool) as redis:
+        async with asyncio.timeout(1):
+            while not (await redis.pubsub_numsub(SETTINGS_CHANNEL))[0][1]:
+                await asyncio.sleep(0.01)
+        await redis.publish(SETTINGS_CHANNEL, b"first")
+        await redis.publish(SETTINGS_CHANNEL, b"second")
+
+    assert await asyncio.wait_for(queue.get(), timeout=1) == b"second"
+    await hub.stop()
+
+
+@pytest.mark.anyio
+async def test_update_endpoints_publish() -> None:
+    """Tests that updating a global or a product setting publishes a change event."""
+    pool = ConnectionPool(connection_class=FakeConnection, server=FakeServer())
+    publisher = SettingsChangePublisher(pool)
+
+    async with Redis(connection_pool=pool) as redis:
+        async with redis.pubsub() as pubsub:
+            await pubsub.subscribe(SETTINGS_CHANNEL)
+
+            await update_conveyor_direction(
+                new_value=1,
+                dao=_SettingsDAO(SimpleNamespace(setting_param_name="Conveyor.Direction")),
+                publisher=publisher,
+            )
+            await update_product_setting(
+                product_id=1,
+                setting_param_name="Conveyor.Velocity",
+                value="5",
+                settings_product_dao=_SettingsDAO(SimpleNamespace(value=3, version=2)),
+                param_dao=_SettingsDAO(SimpleNamespace(json_schema={"type": "integer"})),
+                cache=ProductSettingsCache(pool),
+                publisher=publisher,
+            )
+
+            events = []
+            async with asyncio.timeout(1):
+                while len(events) < 2:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+                    if message is not None:
+                        events.append(json.loads(message["data"]))
+
+    for event in events:
+        event.pop("changed_at")
+    assert events == [
+        {
+            "scope": "global",
+            "setting_param_name": "Conveyor.Direction",
+            "product_id": None,
+            "version": None,
+        },
+        {
+            "scope": "product",
+            "setting_param_name": "Conveyor.Velocity",
+            "product_id": 1,
+            "version": 3,
+        },
+    ]
+
+
+@pytest.mark.anyio
+async def test_query_tracing_reaches_every_worker() -> None:
+    """Tests that a sample rate set on one worker is applied by the hub of another."""
+    pool = ConnectionPool(connection_class=FakeConnection, server=FakeServer())
+    tracer = QueryTracer(8)
+    other_worker = QueryTracer(8)
+    hub = SettingsChangeHub(pool)
+    queue = hub.subscribe()
+    hub.handle(QUERY_TRACING_CHANNEL, other_worker.apply_message)
+    hub.start()
+    try:
+        async with Redis(connection_pool=pool) as redis:
+            async with asyncio.timeout(1):
+                while not (await redis.pubsub_numsub(QUERY_TRACING_CHANNEL))[0][1]:
+                    await asyncio.sleep(0.01)
+
+        await set_query_tracing(
+            payload=QueryTracingDTO(sample_rate=0.5),
+            tracer=tracer,
+            publisher=SettingsChangePublisher(pool),
+        )
+        async with asyncio.timeout(1):
+            while other_worker.sample_rate != 0.5:
+                await asyncio.sleep(0.01)
+
+        assert tracer.sample_rate == 0.5
+        # WebSocket client에는 전달되지 않는다
+        assert queue.empty()
+    finally:
+        await hub.stop()
+        tracer.set_sample_rate(0)
+        other_worker.set_sample_rate(0)
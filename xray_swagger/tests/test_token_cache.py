@@ -0,0 +1,62 @@
+from time import time
+
+import pytest
+from jose import ExpiredSignatureError, JWTError, jwt
+
+from xray_swagger.services.auth.tokens import TokenCache
+
+KEY = "secret"
+
+
+def _token(subject: str, exp: float | None) -> str:
+    claims = {"sub": subject} if exp is None else {"sub": subject, "exp": int(exp)}
+    return jwt.encode(claims, KEY, algorithm="HS256")
+
+
+def test_token_cache_hits() -> None:
+    """Tests that a verified token is decoded once and only for the same key."""
+    cache = TokenCache(8)
+    token = _token("kim", time() + 60)
+
+    assert cache.decode(token, KEY, ["HS256"])["sub"] == "kim"
+    assert cache.decode(token, KEY, ["HS256"])["sub"] == "kim"
+    with pytest.raises(JWTError):
+        cache.decode(token, "other", ["HS256"])
+    with pytest.raises(JWTError):
+        cache.decode(token[:-2], KEY, ["HS256"])
+
+    assert cache.stats() == {
+        "size": 1,
+        "hits": 1,
+        "misses": 3,
+        "hit_rate": 0.25,
+        "expired": 0,
+        "evictions": 0,
+    }
+
+
+def test_token_cache_bounds() -> None:
+    """Tests the LRU bound, the drop at exp and that tokens without exp are not kept."""
+    cache = TokenCache(2)
+    tokens = [_token(name, time() + 60) for name in ("a", "b", "c")]
+
+    cache.decode(tokens[0], KEY, ["HS256"])
+    cache.decode(tokens[1], KEY, ["HS256"])
+    cache.decode(tokens[0], KEY, ["HS256"])
+    cache.decode(tokens[2], KEY, ["HS256"])
+    assert cache.stats()["evictions"] == 1
+    assert list(cache._claims) == [
+        TokenCache.key(tokens[0], KEY, ["HS256"]),
+        TokenCache.key(tokens[2], KEY, ["HS256"]),
+    ]
+
+    cache.decode(_token("d", None), KEY, ["HS256"])
+    assert cache.stats()["size"] == 2
+
+    expired = _token("e", time() + 60)
+    digest = TokenCache.key(expired, KEY, ["HS256"])
+    cache._claims[digest] = (time() - 1, {"sub": "e", "exp": int(time() - 1)})
+    with pytest.raises(ExpiredSignatureError):
+        cache.decode(_token("e", time() - 1), KEY, ["HS256"])
+    assert cache.decode(expired, KEY, ["HS256"])["sub"] == "e"
+    assert cache.stats()["expired"] == 1
@@ -0,0 +1,144 @@
+from contextlib import AbstractAsyncContextManager, nullcontext
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+import pytest
+from redis.asyncio import ConnectionPool, Redis
+
+from xray_swagger.db.dao.user_dao import UserDAO
+from xray_swagger.db.models.user import AuthLevel, User
+from xray_swagger.services.redis.user_cache import UserCache, _user_key
+from xray_swagger.web.api.users.schema import CurrentUserDTO, UserUpdateDTO
+from xray_swagger.web.api.users.views import update_user
+
+
+def _user(username: str, deleted_at: datetime | None = None) -> User:
+    return User(
+        id=1,
+        username=username,
+        password="hashed",
+        fullname="Kim",
+        joined_at=datetime(2023, 8, 1),
+        deleted_at=deleted_at,
+        authlevel=AuthLevel.ENGINEER,
+    )
+
+
+@pytest.mark.anyio
+async def test_user_cache_tiers(fake_redis_pool: ConnectionPool) -> None:
+    """
+    Tests local hits, shared hits from another worker and invalidation.
+
+    :param fake_redis_pool: fake redis pool.
+    """
+    cache = UserCache(CurrentUserDTO, ttl=60, local_ttl=60, local_size=8)
+    other_worker = UserCache(CurrentUserDTO, ttl=60, local_ttl=60, local_size=8)
+
+    assert await cache.get(fake_redis_pool, "kim", 100) is None
+    user = await cache.set(fake_redis_pool, 100, _user("kim"), 0)
+    assert await cache.get(fake_redis_pool, "kim", 100) == user
+    assert await cache.get(fake_redis_pool, "kim", 101) is None
+
+    shared = await other_worker.get(fake_redis_pool, "kim", 100)
+    assert shared.model_dump(exclude={"password"}) == user.model_dump(exclude={"password"})
+    async with Redis(connection_pool=fake_redis_pool) as redis:
+        assert b"hashed" not in await redis.hget(_user_key("kim"), "100")
+
+    await cache.invalidate(fake_redis_pool, "kim")
+    assert await cache.get(fake_redis_pool, "kim", 100) is None
+    assert cache.stats() == {
+        "size": 0,
+        "local_hits": 1,
+        "shared_hits": 0,
+        "misses": 3,
+        "evictions": 0,
+        "invalidations": 1,
+    }
+    assert other_worker.stats()["shared_hits"] == 1
+
+
+@pytest.mark.anyio
+async def test_user_cache_bounds(fake_redis_pool: ConnectionPool) -> None:
+    """
+    Tests the LRU bound of the local tier and that deleted users are not cached.
+
+    :param fake_redis_pool: fake redis pool.
+    """
+    cache = UserCache(CurrentUserDTO, ttl=60, local_ttl=60, local_size=2)
+
+    for iat in (1, 2):
+        await cache.set(fake_redis_pool, iat, _user("kim"), 0)
+    await cache.get(fake_redis_pool, "kim", 1)
+    await cache.set(fake_redis_pool, 3, _user("kim"), 0)
+
+    assert list(cache._local) == [("kim", 1), ("kim", 3)]
+    assert cache.stats()["evictions"] == 1
+    assert await cache.get(fake_redis_pool, "kim", 2) is not None
+
+    deleted = await cache.set(fake_redis_pool, 4, _user("lee", datetime(2023, 9, 1)), 0)
+    assert deleted.deleted_at is not None
+    assert await cache.get(fake_redis_pool, "lee", 4) is None
+
+
+class _Result:
+    def __init__(self, user: User) -> None:
+        self.user = user
+
+    def scalar(self) -> User:
+        return self.user
+
+
+class _Session:
+    """Runs a concurrent request before the first commit takes effect."""
+
+    def __init__(self, user: User, concurrent_request: Callable[[], Awaitable[None]]) -> None:
+        self.user = user
+        self.concurrent_request = concurrent_request
+        self.commits = 0
+
+    async def execute(self, statement: Any) -> _Result:
+        return _Result(self.user)
+
+    def begin_nested(self) -> AbstractAsyncContextManager:
+        return nullcontext()
+
+    async def commit(self) -> None:
+        if not self.commits:
+            await self.concurrent_request()
+        self.commits += 1
+
+
+@pytest.mark.anyio
+async def test_update_invalidates_after_commit(fake_redis_pool: ConnectionPool) -> None:
+    """
+    Tests that a user re-read between the update and its commit is not served afterwards.
+
+    The other worker caches the old row before the invalidation and again after it.
+
+    :param fake_redis_pool: fake redis pool.
+    """
+    cache = UserCache(CurrentUserDTO, ttl=60, local_ttl=60, local_size=8)
+    other_worker = UserCache(CurrentUserDTO, ttl=60, local_ttl=0, local_size=8)
+    generations = []
+
+    async def read_committed_row() -> None:
+        # 다른 worker의 get_current_user가 아직 commit되지 않은 변경 전 row를 읽는다
+        generations.append(await other_worker.generation(fake_redis_pool, "kim"))
+        await other_worker.set(fake_redis_pool, 100, _user("kim"), generations[0])
+
+    session = _Session(_user("kim"), read_committed_row)
+    await update_user(
+        user_id=1,
+        update_payload=UserUpdateDTO(authlevel=AuthLevel.OPERATOR),
+        user_dao=UserDAO(session),
+        redis_pool=fake_redis_pool,
+        user_cache=cache,
+    )
+    # get_db_session의 teardown commit
+    await session.commit()
+    # 변경 전 row를 읽은 요청이 무효화 뒤에야 cache를 채운다
+    await other_worker.set(fake_redis_pool, 101, _user("kim"), generations[0])
+
+    assert session.commits == 2
+    assert await cache.get(fake_redis_pool, "kim", 100) is None
+    assert await cache.get(fake_redis_pool, "kim", 101) is None
@@ -0,0 +1,99 @@
+import sys
+import types
+
+import fastjsonschema
+import pytest
+from loguru import logger
+from xray_settings.routers.contour import ContourDetectionSetting
+from xray_settings.validators import COMPILED_PACKAGE, ValidatorRegistry, compiled_module_name
+
+
+def test_validator_is_compiled_once() -> None:
+    """Tests that a validator is reused while its schema is unchanged."""
+    registry = ValidatorRegistry()
+    schema = {"type": "integer", "minimum": 0}
+
+    first = registry.get("Conveyor.Velocity", schema)
+    second = registry.get("Conveyor.Velocity", dict(schema))
+
+    assert first is second
+    assert registry.stats()["hits"] == 1
+    assert registry.stats()["misses"] == 1
+
+
+def test_changed_schema_recompiles() -> None:
+    """Tests that a new schema digest replaces the stale validator."""
+    registry = ValidatorRegistry()
+    registry.warm("Conveyor.Velocity", {"type": "integer", "maximum": 255})
+
+    validator = registry.get("Conveyor.Velocity", {"type": "integer", "maximum": 10})
+
+    with pytest.raises(fastjsonschema.JsonSchemaValueException):
+        validator(100)
+    assert registry.stats()["size"] == 1
+
+
+def test_invalidate() -> None:
+    """Tests that invalidation forces a recompilation."""
+    registry = ValidatorRegistry()
+    schema = {"type": "boolean"}
+    registry.warm("Watchdog.Timer", schema)
+
+    registry.invalidate("Watchdog.Timer")
+    registry.get("Watchdog.Timer", schema)
+
+    assert registry.stats()["invalidations"] == 1
+    assert registry.stats()["misses"] == 1
+
+
+def test_model_validator() -> None:
+    """Tests validators compiled from pydantic models."""
+    registry = ValidatorRegistry()
+
+    validator = registry.get_for_model(ContourDetectionSetting)
+
+    assert registry.get_for_model(ContourDetectionSetting) is validator
+    with pytest.raises(fastjsonschema.JsonSchemaValueException):
+        validator({"enabled": True, "unknown": 1})
+
+
+def test_generated_validator_module() -> None:
+    """Tests that a generated validator module behaves like a compiled one."""
+    from xray_settings.build_validators import render
+    from xray_settings.routers.contaminant.rule import AlatHP
+
+    digest, source = render(AlatHP)
+    namespace: dict = {}
+    exec(source, namespace)  # noqa: S102
+
+    assert namespace["SCHEMA_DIGEST"] == digest
+    namespace["validate"]({"DetectionArea": 3, "MaskValue": [0.1, 0.2, 0.3, 0.4]})
+    with pytest.raises(fastjsonschema.JsonSchemaValueException):
+        namespace["validate"]({"DetectionArea": 3, "MaskValue": [0.1]})
+
+
+def test_stale_generated_module_is_ignored(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Tests that a module generated from another schema falls back to runtime compilation."""
+    # 생성된 module은 gitignore 대상이므로 stub을 sys.modules에 넣는다
+    package = types.ModuleType(COMPILED_PACKAGE)
+    package.__path__ = []
+    compiled = types.ModuleType(f"{COMPILED_PACKAGE}.{compiled_module_name(ContourDetectionSetting)}")
+    compiled.SCHEMA_DIGEST = "0" * 40
+    compiled.validate = lambda data: data
+    monkeypatch.setitem(sys.modules, package.__name__, package)
+    monkeypatch.setitem(sys.modules, compiled.__name__, compiled)
+    registry = ValidatorRegistry()
+
+    messages: list[str] = []
+    handler_id = logger.add(messages.append, format="{message}", level="WARNING")
+    try:
+        validator = registry.get_for_model(ContourDetectionSetting)
+    finally:
+        logger.remove(handler_id)
+
+    assert len(messages) == 1
+    assert "stale" in messages[0]
+    assert validator is not compiled.validate
+    assert registry.stats()["compiled_ahead"] == 0
+    with pytest.raises(fastjsonschema.JsonSchemaValueException):
+        validator({"enabled": True, "unknown": 1})
@@ -0,0 +1,97 @@
+"""Request body helpers of the batch endpoints (JSON array or NDJSON)."""
+from typing import Any, Type, TypeVar
+
+from fastapi import HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+NDJSON_MEDIA_TYPES = frozenset(("application/x-ndjson", "application/jsonl"))
+
+
+def batch_openapi_body(model: Type[BaseModel]) -> dict[str, Any]:
+    """`openapi_extra` documenting a body read by `read_batch`."""
+    schema = {"type": "array", "items": model.model_json_schema()}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": schema},
+                "application/x-ndjson": {"schema": schema},
+            },
+        },
+    }
+
+
+async def read_batch(
+    request: Request,
+    model: Type[ModelT],
+    max_rows: int,
+    max_bytes: int,
+) -> list[ModelT]:
+    """
+    Validates a JSON array or an NDJSON (one object per line) request body.
+
+    Bodies over `max_bytes` are refused before they are read in full,
+    and NDJSON bodies over `max_rows` before the extra rows are parsed.
+    Errors are raised as the usual 422 response with the row index in `loc`.
+    """
+    body = await _read_body(request, max_bytes)
+    media_type = request.headers.get("content-type", "").split(";", 1)[0].strip()
+    try:
+        if media_type in NDJSON_MEDIA_TYPES:
+            rows = _read_ndjson(body, model, max_rows)
+        else:
+            rows = TypeAdapter(list[model]).validate_json(body)  # type: ignore[valid-type]
+    except ValidationError as err:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in err.errors()],
+        )
+    if len(rows) > max_rows:
+        raise _too_many_rows(max_rows)
+    return rows
+
+
+def _too_many_rows(max_rows: int) -> HTTPException:
+    return HTTPException(
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        f"Batch exceeds the limit of {max_rows} rows.",
+    )
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        f"Batch exceeds the limit of {max_bytes} bytes.",
+    )
+
+
+async def _read_body(request: Request, max_bytes: int) -> bytes:
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_bytes:
+        raise _too_large(max_bytes)
+    # chunked body는 Content-Length가 없으므로 읽으면서 센다
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise _too_large(max_bytes)
+    return bytes(body)
+
+
+def _read_ndjson(body: bytes, model: Type[ModelT], max_rows: int) -> list[ModelT]:
+    rows = []
+    errors = []
+    for index, line in enumerate(line for line in body.splitlines() if line.strip()):
+        if index == max_rows:
+            raise _too_many_rows(max_rows)
+        try:
+            rows.append(model.model_validate_json(line))
+        except ValidationError as err:
+            errors.extend(
+                {**error, "loc": ("body", index, *error["loc"])} for error in err.errors()
+            )
+    if errors:
+        raise RequestValidationError(errors)
+    return rows
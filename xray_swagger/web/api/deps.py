@@ -9,8 +9,13 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from loguru import logger
 from pydantic import BaseModel
+from redis.asyncio import ConnectionPool
 
 from xray_swagger.db.dao.user_dao import UserDAO
+from xray_swagger.logging import debug
+from xray_swagger.services.auth.tokens import TokenCache, get_token_cache
+from xray_swagger.services.redis.dependency import get_redis_pool
+from xray_swagger.services.redis.user_cache import UserCache, get_user_cache
 
 
 class Token(BaseModel):
@@ -58,7 +63,8 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # iat은 사용자 캐시 key의 일부
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -66,27 +72,37 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 async def get_current_user(
     token: Annotated[str, Depends(security)],
     user_dao: UserDAO = Depends(),
+    redis_pool: ConnectionPool = Depends(get_redis_pool),
+    user_cache: UserCache = Depends(get_user_cache),
+    token_cache: TokenCache = Depends(get_token_cache),
 ):
+    """The user of the bearer token, from the token and user caches when it was seen before."""
     CredentialsException = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid authentication credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    logger.debug(type(token))
+    debug("{}", type(token))
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        logger.debug(payload)
+        payload = token_cache.decode(token, SECRET_KEY, [ALGORITHM])
+        debug("{}", payload)
         username: str = payload.get("sub")
         if username is None:
             raise CredentialsException
         token_data = TokenData(username=username)
     except JWTError:
         raise CredentialsException
-    user = await user_dao.get_by_username(token_data.username)
-    if user is None:
+    # iat 이전에 발급된 토큰은 exp로 구분한다
+    issued_at = payload.get("iat", payload.get("exp"))
+
+    user = await user_cache.get(redis_pool, token_data.username, issued_at)
+    if user is not None:
+        return user
+    generation = await user_cache.generation(redis_pool, token_data.username)
+    db_user = await user_dao.get_by_username(token_data.username)
+    if db_user is None:
         raise CredentialsException
-
-    return user
+    return await user_cache.set(redis_pool, issued_at, db_user, generation)
 
 
 async def get_current_active_user(
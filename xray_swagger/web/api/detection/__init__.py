@@ -0,0 +1,4 @@
+"""Rule detection API."""
+from xray_swagger.web.api.detection.views import router
+
+__all__ = ["router"]
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from xray_settings.routers.contaminant.rule import RuleDetectSettingTemplate
+
+
+class RuleDetectionDTO(RuleDetectSettingTemplate):
+    """A rule setting to try on the image of an inspection session."""
+
+    product_id: int
+    isp_sess_id: int
+
+
+class RulePipelineDTO(BaseModel):
+    """
+    Rule settings to run in `exec_order` on the image of an inspection session.
+
+    `templates` default to the `Inspection.Contaminant.RuleBased` setting of the product.
+    """
+
+    product_id: int
+    isp_sess_id: int
+    templates: list[RuleDetectSettingTemplate] | None = None
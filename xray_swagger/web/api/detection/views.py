@@ -0,0 +1,163 @@
+import numpy as np
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.param_functions import Depends
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from xray_settings.routers.contaminant.rule import RuleDetectSettingTemplate
+
+from xray_swagger.db.dao.mmap_session_dao import MmapSessionDAO
+from xray_swagger.db.dao.products_dao import InspectionSessionDAO
+from xray_swagger.db.dao.settings_dao import SettingsProductDAO
+from xray_swagger.db.models.defect import DefectCategory
+from xray_swagger.services.detection.pipeline import (
+    RULE_SETTING,
+    DetectionError,
+    DetectionPipeline,
+    RuleDefect,
+    rule_templates,
+)
+from xray_swagger.services.detection.rules import Box, detect, template_parameters
+from xray_swagger.services.imaging.preview import decode_scan_lines
+from xray_swagger.services.mmap.reader import FrameSpan, MmapFrameReader, get_frame_reader
+from xray_swagger.settings import settings
+from xray_swagger.web.api.frames import get_isp_sess_spans
+from xray_swagger.web.api.products.schema import SessionDefectCreateDTO
+from xray_swagger.web.api.timing import SERVER_TIMING_HEADER, server_timing
+from xray_swagger.web.middlewares.permissions import (
+    IsAuthenticated,
+    IsEngineer,
+    PermissionsDependency,
+)
+
+from .schema import RuleDetectionDTO, RulePipelineDTO
+
+router = APIRouter()
+
+
+def _read_frame(spans: list[FrameSpan], reader: MmapFrameReader) -> np.ndarray:
+    return decode_scan_lines(
+        b"".join(reader.iter_bytes(spans)),
+        settings.mmap_line_width,
+        settings.mmap_bytes_per_pixel,
+    )
+
+
+def _detect(
+    template: RuleDetectSettingTemplate,
+    spans: list[FrameSpan],
+    reader: MmapFrameReader,
+) -> list[Box]:
+    return detect(_read_frame(spans, reader), template)
+
+
+def _run_pipeline(
+    pipeline: DetectionPipeline,
+    spans: list[FrameSpan],
+    reader: MmapFrameReader,
+) -> tuple[list[RuleDefect], list[tuple[str, float]]]:
+    timings: list[tuple[str, float]] = []
+    defects = pipeline.run(_read_frame(spans, reader), timings)
+    return defects, timings
+
+
+async def _session_spans(
+    product_id: int,
+    isp_sess_id: int,
+    isp_sess_dao: InspectionSessionDAO,
+    mmap_sess_dao: MmapSessionDAO,
+    reader: MmapFrameReader,
+) -> list[FrameSpan]:
+    spans = await get_isp_sess_spans(product_id, isp_sess_id, isp_sess_dao, mmap_sess_dao, reader)
+    if not sum(span.size for span in spans):
+        raise HTTPException(status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, "Empty image")
+    return spans
+
+
+@router.post(
+    "/run",
+    dependencies=[Depends(PermissionsDependency([IsAuthenticated, IsEngineer]))],
+)
+async def run_rule_detection(
+    payload: RuleDetectionDTO,
+    isp_sess_dao: InspectionSessionDAO = Depends(),
+    mmap_sess_dao: MmapSessionDAO = Depends(),
+    reader: MmapFrameReader = Depends(get_frame_reader),
+) -> list[SessionDefectCreateDTO]:
+    """
+    Runs a rule detector on the image of an inspection session.
+
+    Nothing is stored. The defects come back the way `POST .../defects/batch` takes them,
+    `coordinates` being `[left, top, right, bottom]` with right and bottom exclusive.
+    """
+    try:
+        template_parameters(payload)
+    except ValidationError as err:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, err.errors())
+    spans = await _session_spans(
+        payload.product_id,
+        payload.isp_sess_id,
+        isp_sess_dao,
+        mmap_sess_dao,
+        reader,
+    )
+    boxes = await run_in_threadpool(_detect, payload, spans, reader)
+    return [
+        SessionDefectCreateDTO(
+            defect_category=DefectCategory.CONTAMINANT,
+            inspection_module=payload.algorithm_name,
+            coordinates=box,
+        )
+        for box in boxes
+    ]
+
+
+@router.post(
+    "/pipeline",
+    dependencies=[Depends(PermissionsDependency([IsAuthenticated, IsEngineer]))],
+)
+async def run_rule_pipeline(
+    payload: RulePipelineDTO,
+    response: Response,
+    isp_sess_dao: InspectionSessionDAO = Depends(),
+    mmap_sess_dao: MmapSessionDAO = Depends(),
+    settings_dao: SettingsProductDAO = Depends(),
+    reader: MmapFrameReader = Depends(get_frame_reader),
+) -> list[SessionDefectCreateDTO]:
+    """
+    Runs every rule detector of a product in `exec_order` on the image of an inspection session.
+
+    Detectors with the same smoothing share the filtered images, and overlapping boxes
+    are merged into the defect of the first detector that found them.
+    The `Server-Timing` header holds the milliseconds of every detector.
+    """
+    templates = payload.templates
+    try:
+        if templates is None:
+            row = await settings_dao.get(payload.product_id, RULE_SETTING)
+            if row is None or row.value is None:
+                raise HTTPException(
+                    status.HTTP_404_NOT_FOUND,
+                    f"Product <id: {payload.product_id}> has no {RULE_SETTING} setting",
+                )
+            templates = rule_templates(row.value)
+        pipeline = DetectionPipeline(templates)
+    except DetectionError as err:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(err))
+    spans = await _session_spans(
+        payload.product_id,
+        payload.isp_sess_id,
+        isp_sess_dao,
+        mmap_sess_dao,
+        reader,
+    )
+
+    defects, timings = await run_in_threadpool(_run_pipeline, pipeline, spans, reader)
+    response.headers[SERVER_TIMING_HEADER] = server_timing(timings)
+    return [
+        SessionDefectCreateDTO(
+            defect_category=DefectCategory.CONTAMINANT,
+            inspection_module=defect.inspection_module,
+            coordinates=defect.coordinates,
+        )
+        for defect in defects
+    ]
@@ -0,0 +1,38 @@
+"""Conditional GET helpers (`ETag` / `If-None-Match`)."""
+import hashlib
+from datetime import datetime
+from typing import Iterable
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts: object) -> str:
+    """Strong entity tag joined from `parts`."""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def timestamp_etag(prefix: str, *parts: object, modified_at: Iterable[datetime | None]) -> str:
+    """Entity tag of rows versioned by a `modified_at` column."""
+    latest = max((ts for ts in modified_at if ts is not None), default=None)
+    return make_etag(prefix, *parts, latest.timestamp() if latest else 0)
+
+
+def digest_etag(prefix: str, *parts: object, versions: Iterable[tuple[str, int]]) -> str:
+    """Entity tag of a set of (name, version) pairs."""
+    pairs = sorted(versions)
+    digest = hashlib.sha1(repr(pairs).encode()).hexdigest()[:16]
+    return make_etag(prefix, *parts, max((v for _, v in pairs), default=0), digest)
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Whether `If-None-Match` of the request matches `etag` (weak comparison, RFC 9110)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,40 @@
+"""Scan line spans of the inspection session images."""
+from fastapi import HTTPException, status
+from loguru import logger
+
+from xray_swagger.db.dao.mmap_session_dao import MmapSessionDAO
+from xray_swagger.db.dao.products_dao import InspectionSessionDAO
+from xray_swagger.services.mmap.reader import (
+    FrameRangeError,
+    FrameSpan,
+    InvalidImageKey,
+    MmapFrameReader,
+)
+from xray_swagger.services.mmap.sessions import BrokenSessionChain, isp_sess_spans
+
+
+async def get_isp_sess_spans(
+    product_id: int,
+    isp_sess_id: int,
+    isp_sess_dao: InspectionSessionDAO,
+    mmap_sess_dao: MmapSessionDAO,
+    reader: MmapFrameReader,
+) -> list[FrameSpan]:
+    """Byte spans of the session scan lines, from the start ptr through the end ptr."""
+    row = await isp_sess_dao.get_with_mmap_sessions(product_id, isp_sess_id)
+    if not row:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            f"InspectionSession <id: {isp_sess_id}> Not Found",
+        )
+
+    try:
+        spans = await isp_sess_spans(*row, mmap_sess_dao, reader)
+    except BrokenSessionChain as err:
+        raise HTTPException(status.HTTP_409_CONFLICT, str(err))
+    except (FileNotFoundError, InvalidImageKey) as err:
+        logger.warning(f"MMAP buffer unavailable: {err}")
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "MMAP buffer Not Found")
+    except FrameRangeError as err:
+        raise HTTPException(status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, str(err))
+    return spans
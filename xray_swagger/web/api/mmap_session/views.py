@@ -1,10 +1,19 @@
+from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, status
 from fastapi.param_functions import Depends
+from fastapi.responses import StreamingResponse
 from loguru import logger
 
 from xray_swagger.db.dao.mmap_session_dao import MmapSessionDAO
+from xray_swagger.logging import debug
+from xray_swagger.services.mmap.reader import (
+    FrameRangeError,
+    InvalidImageKey,
+    MmapFrameReader,
+    get_frame_reader,
+)
 
 from .schema import MmapSessionCreateDTO, MmapSessionDTO, MmapSessionUpdateDTO
 
@@ -18,7 +27,7 @@ async def get_all_mmap_sessions(
     d = await dao.filter()
     if not d:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Nothing.")
-    logger.debug(d[0].__dict__)
+    debug("{}", d[0].__dict__)
     return d
 
 
@@ -33,13 +42,70 @@ async def get_mmap_session_by_uuid(
     return d
 
 
+@router.get(
+    path="/sessions/{uuid}/frames",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
+async def get_mmap_session_frames(
+    uuid: UUID,
+    start: Annotated[int, Query(ge=0)] = 0,
+    end: Annotated[int | None, Query(ge=0)] = None,
+    end_uuid: UUID | None = None,
+    dao: MmapSessionDAO = Depends(),
+    reader: MmapFrameReader = Depends(get_frame_reader),
+):
+    """
+    Raw scan lines from line `start` of session `uuid` up to line `end` (exclusive).
+
+    With `end_uuid`, `end` is a line of that session and the range continues
+    through every session acquired in between. `end` defaults to the end of the buffer.
+    """
+    first = await dao.get(uuid)
+    if not first:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, f"MMAP session <uuid: {uuid}> Not Found")
+    chain = [first]
+    if end_uuid is not None and end_uuid != uuid:
+        last = await dao.get(end_uuid)
+        if not last:
+            raise HTTPException(
+                status.HTTP_404_NOT_FOUND,
+                f"MMAP session <uuid: {end_uuid}> Not Found",
+            )
+        chain = await dao.get_chain(first, last)
+        if not chain:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST,
+                f"MMAP session <uuid: {end_uuid}> was acquired before <uuid: {uuid}>",
+            )
+
+    try:
+        spans = reader.spans([row.image_s3_key for row in chain], start, end)
+    except (FileNotFoundError, InvalidImageKey) as err:
+        logger.warning(f"MMAP buffer unavailable: {err}")
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "MMAP buffer Not Found")
+    except FrameRangeError as err:
+        raise HTTPException(status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, str(err))
+
+    size = sum(span.size for span in spans)
+    return StreamingResponse(
+        reader.iter_bytes(spans),
+        media_type="application/octet-stream",
+        headers={
+            "Content-Length": str(size),
+            "X-Scan-Line-Bytes": str(reader.line_bytes),
+            "X-Scan-Lines": str(size // reader.line_bytes),
+        },
+    )
+
+
 @router.post(path="/sessions", status_code=status.HTTP_201_CREATED, response_model=MmapSessionDTO)
 async def create_mmap_session(
     payload: MmapSessionCreateDTO,
     dao: MmapSessionDAO = Depends(),
 ):
-    logger.debug(payload)
-    logger.debug(payload.model_dump(exclude_none=True))
+    debug("{}", payload)
+    debug("{}", lambda: payload.model_dump(exclude_none=True), lazy=True)
     new = await dao.create(payload)
     return new
 
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+class QueryTraceDTO(BaseModel):
+    fingerprint: str
+    statement: str
+    executed_at: datetime
+    duration_ms: float
+    rows: int | None = None
+    caller: str | None = None
+
+
+class QueryStatementDTO(BaseModel):
+    """The traces of one statement fingerprint in the buffer."""
+
+    fingerprint: str
+    statement: str
+    count: int
+    total_ms: float
+    max_ms: float
+
+
+class QueryTracingDTO(BaseModel):
+    """Fraction of SQL statements the workers trace, 0 disables tracing."""
+
+    sample_rate: float = Field(ge=0, le=1)
+
+
+class QueryTracesDTO(QueryTracingDTO):
+    size: int
+    statements: list[QueryStatementDTO]
+    queries: list[QueryTraceDTO]
@@ -1,4 +1,21 @@
-from fastapi import APIRouter
+from typing import Annotated
+
+from fastapi import APIRouter, Query, status
+from fastapi.param_functions import Depends
+from xray_settings.validators import validator_registry
+
+from xray_swagger.db.tracing import QueryTracer, get_query_tracer
+from xray_swagger.services.auth.tokens import get_token_cache
+from xray_swagger.services.imaging.thumbnails import get_thumbnail_cache
+from xray_swagger.services.redis.pubsub import QUERY_TRACING_CHANNEL, SettingsChangePublisher
+from xray_swagger.services.redis.user_cache import get_user_cache
+from xray_swagger.web.middlewares.permissions import (
+    IsAuthenticated,
+    IsEngineer,
+    PermissionsDependency,
+)
+
+from .schema import QueryStatementDTO, QueryTraceDTO, QueryTracesDTO, QueryTracingDTO
 
 router = APIRouter()
 
@@ -10,3 +27,64 @@ def health_check() -> None:
 
     It returns 200 if the project is healthy.
     """
+
+
+@router.get("/monitoring/caches")
+def get_cache_stats() -> dict[str, dict[str, float]]:
+    """
+    Returns hit/miss counters of in-process caches.
+
+    It is per worker process.
+    """
+    return {
+        "validators": validator_registry.stats(),
+        "thumbnails": get_thumbnail_cache().stats(),
+        "users": get_user_cache().stats(),
+        "tokens": get_token_cache().stats(),
+    }
+
+
+@router.get(
+    "/monitoring/queries",
+    dependencies=[Depends(PermissionsDependency([IsAuthenticated, IsEngineer]))],
+)
+def get_query_traces(
+    limit: Annotated[int, Query(ge=1)] = 100,
+    tracer: QueryTracer = Depends(get_query_tracer),
+) -> QueryTracesDTO:
+    """
+    Returns the latest traced SQL statements and their totals by fingerprint.
+
+    It is per worker process.
+    """
+    return QueryTracesDTO(
+        sample_rate=tracer.sample_rate,
+        size=tracer.size,
+        statements=[QueryStatementDTO(**row._asdict()) for row in tracer.statements()],
+        queries=[QueryTraceDTO(**trace._asdict()) for trace in tracer.traces()[:limit]],
+    )
+
+
+@router.put(
+    "/monitoring/queries",
+    dependencies=[Depends(PermissionsDependency([IsAuthenticated, IsEngineer]))],
+)
+async def set_query_tracing(
+    payload: QueryTracingDTO,
+    tracer: QueryTracer = Depends(get_query_tracer),
+    publisher: SettingsChangePublisher = Depends(),
+) -> QueryTracingDTO:
+    """Traces `sample_rate` of the SQL statements of every worker from now on."""
+    tracer.set_sample_rate(payload.sample_rate)
+    # 다른 worker는 settings hub의 구독으로 적용한다
+    await publisher.publish(payload, QUERY_TRACING_CHANNEL)
+    return QueryTracingDTO(sample_rate=tracer.sample_rate)
+
+
+@router.delete(
+    "/monitoring/queries",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(PermissionsDependency([IsAuthenticated, IsEngineer]))],
+)
+def clear_query_traces(tracer: QueryTracer = Depends(get_query_tracer)) -> None:
+    tracer.clear()
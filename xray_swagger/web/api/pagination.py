@@ -0,0 +1,19 @@
+"""Cursor pagination headers of the list endpoints."""
+from fastapi import Response
+
+from xray_swagger.db.dao._keyset import Page
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PREV_CURSOR_HEADER = "X-Prev-Cursor"
+
+
+def set_cursor_headers(response: Response, page: Page) -> None:
+    """
+    Exposes the cursors of `page` as headers, so list bodies stay plain arrays.
+
+    A missing header means there is no page in that direction.
+    """
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    if page.prev_cursor:
+        response.headers[PREV_CURSOR_HEADER] = page.prev_cursor
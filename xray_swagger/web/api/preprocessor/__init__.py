@@ -0,0 +1,4 @@
+"""Preprocessor API."""
+from xray_swagger.web.api.preprocessor.views import router
+
+__all__ = ["router"]
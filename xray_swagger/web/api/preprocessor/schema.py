@@ -0,0 +1,18 @@
+from typing import Literal
+
+from pydantic import BaseModel
+from xray_settings.routers.preprocessor import PreprocessorCascadingFunctionSetting
+
+
+class PreprocessorPreviewDTO(PreprocessorCascadingFunctionSetting):
+    """A cascade to try on the image of an inspection session."""
+
+    product_id: int
+    isp_sess_id: int
+
+
+class PreprocessorPassDTO(BaseModel):
+    """One sweep over the frame: a fused lookup table or a spatial filter."""
+
+    kind: Literal["lut", "spatial"]
+    filters: list[str]
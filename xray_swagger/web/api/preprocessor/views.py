@@ -0,0 +1,135 @@
+from typing import Iterator
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.param_functions import Depends
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from xray_settings.routers.preprocessor import PreprocessorCascadingFunctionSetting
+
+from xray_swagger.db.dao.mmap_session_dao import MmapSessionDAO
+from xray_swagger.db.dao.products_dao import InspectionSessionDAO
+from xray_swagger.services.imaging.png import encode_png
+from xray_swagger.services.imaging.preview import decode_scan_lines
+from xray_swagger.services.mmap.reader import FrameSpan, MmapFrameReader, get_frame_reader
+from xray_swagger.services.preprocessor.filters import PreprocessorError
+from xray_swagger.services.preprocessor.pipeline import Pipeline, compile_cascade
+from xray_swagger.settings import settings
+from xray_swagger.web.api.frames import get_isp_sess_spans
+from xray_swagger.web.api.timing import SERVER_TIMING_HEADER, server_timing
+from xray_swagger.web.middlewares.permissions import (
+    IsAuthenticated,
+    IsEngineer,
+    PermissionsDependency,
+)
+
+from .schema import PreprocessorPassDTO, PreprocessorPreviewDTO
+
+router = APIRouter()
+
+
+def _compile(payload: PreprocessorCascadingFunctionSetting) -> Pipeline:
+    try:
+        return compile_cascade(payload.functions, 1 << (8 * settings.mmap_bytes_per_pixel))
+    except PreprocessorError as err:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(err))
+
+
+def _run_preview(
+    pipeline: Pipeline,
+    spans: list[FrameSpan],
+    reader: MmapFrameReader,
+) -> tuple[bytes, list[tuple[str, float]]]:
+    frame = decode_scan_lines(
+        b"".join(reader.iter_bytes(spans)),
+        settings.mmap_line_width,
+        settings.mmap_bytes_per_pixel,
+    )
+    timings: list[tuple[str, float]] = []
+    result = pipeline.run(frame, timings=timings)
+    height, width = result.shape
+    png = encode_png(
+        [result.astype(result.dtype.newbyteorder("<"), copy=False).tobytes()],
+        width,
+        height,
+        settings.mmap_bytes_per_pixel,
+    )
+    return b"".join(png), timings
+
+
+def _stream_preview(
+    pipeline: Pipeline,
+    spans: list[FrameSpan],
+    reader: MmapFrameReader,
+) -> Iterator[bytes]:
+    width = settings.mmap_line_width
+    height = sum(span.size for span in spans) // reader.line_bytes
+
+    def read_rows(start: int, stop: int) -> np.ndarray:
+        raw = reader.read_lines(spans, start, stop)
+        return decode_scan_lines(raw, width, settings.mmap_bytes_per_pixel)
+
+    tiles = pipeline.run_tiled(
+        read_rows,
+        (height, width),
+        settings.preprocessor_tile_rows,
+        settings.preprocessor_thread_count,
+    )
+    return encode_png(
+        (tile.astype(tile.dtype.newbyteorder("<"), copy=False).tobytes() for tile in tiles),
+        width,
+        height,
+        settings.mmap_bytes_per_pixel,
+    )
+
+
+@router.post(
+    "/preview",
+    response_class=Response,
+    responses={200: {"content": {"image/png": {}}}},
+    dependencies=[Depends(PermissionsDependency([IsAuthenticated, IsEngineer]))],
+)
+async def preview_cascade(
+    payload: PreprocessorPreviewDTO,
+    tiled: bool = False,
+    isp_sess_dao: InspectionSessionDAO = Depends(),
+    mmap_sess_dao: MmapSessionDAO = Depends(),
+    reader: MmapFrameReader = Depends(get_frame_reader),
+) -> Response:
+    """
+    Runs a cascade on the image of an inspection session.
+
+    The response is a PNG of the acquisition depth.
+    The `Server-Timing` header holds the milliseconds of every pass, see `/plan`.
+
+    With `tiled`, the strip is processed in tiles of `preprocessor_tile_rows` scan lines
+    by `preprocessor_workers` threads and streamed instead, with the same pixels,
+    bounded memory and no timings.
+    """
+    pipeline = _compile(payload)
+    spans = await get_isp_sess_spans(
+        payload.product_id,
+        payload.isp_sess_id,
+        isp_sess_dao,
+        mmap_sess_dao,
+        reader,
+    )
+    if not sum(span.size for span in spans):
+        raise HTTPException(status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, "Empty image")
+
+    if tiled:
+        return StreamingResponse(_stream_preview(pipeline, spans, reader), media_type="image/png")
+    png, timings = await run_in_threadpool(_run_preview, pipeline, spans, reader)
+    return Response(
+        png,
+        media_type="image/png",
+        headers={SERVER_TIMING_HEADER: server_timing(timings)},
+    )
+
+
+@router.post("/plan")
+async def plan_cascade(payload: PreprocessorCascadingFunctionSetting) -> list[PreprocessorPassDTO]:
+    """Passes a cascade compiles to, consecutive pointwise filters share one lookup table."""
+    return [
+        PreprocessorPassDTO(kind=kind, filters=filters) for kind, filters in _compile(payload).plan()
+    ]
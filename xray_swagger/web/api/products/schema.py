@@ -1,9 +1,19 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Literal
+from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict, Field, field_serializer
+from pydantic import BaseModel, ConfigDict, field_serializer
 from pydantic.types import AnyType, conlist
 
 from xray_swagger.db.models.defect import DefectCategory
+from xray_swagger.db.models.rollup import RollupGranularity
+
+
+def naive_utc(ts: datetime) -> datetime:
+    # DB의 DateTime 컬럼은 timezone 없는 UTC
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
 
 
 class ProductDTO(BaseModel):
@@ -53,14 +63,35 @@ class InspectionSessionCreateDTO(BaseModel):
     product_id: int | None = None
     image_s3_key: str
 
-    session_started_at: datetime = Field(default_factory=datetime.utcnow)
+    # image_s3_key와 함께 session의 고유 key이므로 client가 보내야 한다 (재시도 시 중복 방지)
+    session_started_at: datetime
     # Docker 내부에서 timezone 이슈 발생할것
 
     system_error: str | None = None
 
+    start_mmap_session_uuid: UUID | None = None
+    start_mmap_session_ptr: int | None = None
+    end_mmap_session_uuid: UUID | None = None
+    end_mmap_session_ptr: int | None = None
+
     @field_serializer("session_started_at")
     def serialize_session_started_at(self, value: datetime, _info):
-        return value.replace(tzinfo=None)
+        return naive_utc(value)
+
+
+class InspectionSessionConflictDTO(BaseModel):
+    index: int
+    image_s3_key: str
+    # UTC
+    session_started_at: datetime
+    # exists: 이미 저장된 (image_s3_key, session_started_at), duplicate: 같은 batch 안에서 중복
+    reason: Literal["exists", "duplicate"]
+
+
+class InspectionSessionBatchResultDTO(BaseModel):
+    # 요청 순서대로의 id. 충돌한 row는 null
+    ids: list[int | None]
+    conflicts: list[InspectionSessionConflictDTO]
 
 
 class DefectDTO(BaseModel):
@@ -78,3 +109,34 @@ class DefectCreateDTO(BaseModel):
     coordinates: conlist(int, min_length=4, max_length=4)
     product_id: int | None = None
     inspection_session_id: int
+
+
+class SessionDefectCreateDTO(BaseModel):
+    # inspection session은 path로 지정
+    defect_category: DefectCategory
+    inspection_module: str
+    coordinates: conlist(int, min_length=4, max_length=4)
+
+
+class DefectCategoryCountDTO(BaseModel):
+    defect_category: DefectCategory
+    defect_count: int
+    ng_session_count: int
+
+
+class DefectRateBucketDTO(BaseModel):
+    bucket_start: datetime
+    session_count: int
+    ng_session_count: int
+    defect_rate: float
+    categories: list[DefectCategoryCountDTO]
+
+
+class DefectRateDTO(BaseModel):
+    product_id: int
+    bucket: RollupGranularity
+    session_count: int
+    ng_session_count: int
+    defect_rate: float
+    categories: list[DefectCategoryCountDTO]
+    buckets: list[DefectRateBucketDTO]
@@ -1,21 +1,48 @@
+from collections import Counter, defaultdict
 from datetime import datetime
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.exceptions import RequestValidationError
 from fastapi.param_functions import Depends
+from fastapi.responses import StreamingResponse
 from loguru import logger
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from xray_settings.routers.image import ImageInspectionPreviewPostprocessing
 
+from xray_swagger.db.dao.mmap_session_dao import MmapSessionDAO
 from xray_swagger.db.dao.products_dao import DefectDAO, InspectionSessionDAO, ProductDAO
+from xray_swagger.db.dao.rollup_dao import DefectRateRollupDAO
+from xray_swagger.db.dao.settings_dao import SettingsGlobalDAO
 from xray_swagger.db.models.defect import DefectCategory
+from xray_swagger.db.models.rollup import RollupGranularity
+from xray_swagger.logging import debug
+from xray_swagger.services.imaging.png import encode_png
+from xray_swagger.services.imaging.preview import PREVIEW_SETTING, preview_png, render_preview
+from xray_swagger.services.imaging.thumbnails import ThumbnailCache, get_thumbnail_cache
+from xray_swagger.services.mmap.reader import FrameSpan, MmapFrameReader, get_frame_reader
+from xray_swagger.settings import settings
+from xray_swagger.web.api.batch import batch_openapi_body, read_batch
 from xray_swagger.web.api.deps import get_current_active_user
+from xray_swagger.web.api.etag import is_not_modified, not_modified, timestamp_etag
+from xray_swagger.web.api.frames import get_isp_sess_spans
+from xray_swagger.web.api.pagination import set_cursor_headers
 from xray_swagger.web.api.users.schema import UserModelDTO
 
 from .schema import (
+    DefectCategoryCountDTO,
     DefectCreateDTO,
     DefectDTO,
+    DefectRateBucketDTO,
+    DefectRateDTO,
+    InspectionSessionBatchResultDTO,
+    InspectionSessionConflictDTO,
     InspectionSessionCreateDTO,
     InspectionSessionDTO,
     ProductDTO,
+    SessionDefectCreateDTO,
+    naive_utc,
 )
 
 router = APIRouter()
@@ -38,23 +65,39 @@ async def create_product(
 
 @router.get(path="/", response_model=list[ProductDTO])
 async def get_all_products(
+    request: Request,
+    response: Response,
+    cursor: str | None = None,
+    size: Annotated[int, Query(ge=1, le=100)] = 20,
     dao: ProductDAO = Depends(),
 ):
-    d = await dao.get_all()
+    page = await dao.get_all(cursor, limit=size)
+    d = page.items
     if not d:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Nothing.")
-    logger.debug(d[0].__dict__)
+    etag = timestamp_etag("pl", len(d), d[0].id, modified_at=(row.modified_at for row in d))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    set_cursor_headers(response, page)
+    debug("{}", d[0].__dict__)
     return d
 
 
 @router.get(path="/{product_id}", response_model=ProductDTO)
 async def get_product_by_id(
+    request: Request,
+    response: Response,
     product_id: int,
     dao: ProductDAO = Depends(),
 ):
     d = await dao.get(product_id)
     if not d:
         raise HTTPException(status.HTTP_404_NOT_FOUND, f"Product <id: {product_id} Not Found")
+    etag = timestamp_etag("p", product_id, modified_at=[d.modified_at])
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return d
 
 
@@ -86,6 +129,7 @@ async def create_inspection_session(
     product_id: int,
     payload: InspectionSessionCreateDTO,
     isp_sess_dao: InspectionSessionDAO = Depends(),
+    rollup_dao: DefectRateRollupDAO = Depends(),
 ) -> InspectionSessionDTO:
     # if isp_sess_dupl := await isp_sess_dao.get_sess(product_id, payload.image_s3_key):
     #     logger.warning(f"User name: {isp_sess_dupl.username} Fullname: {isp_sess_dupl.fullname}")
@@ -95,22 +139,107 @@ async def create_inspection_session(
     #     )
     payload.product_id = product_id
     new_isp_sess = await isp_sess_dao.create(payload)
+    await rollup_dao.record_sessions(product_id, [naive_utc(new_isp_sess.session_started_at)])
     logger.info(new_isp_sess.__dict__)
     return new_isp_sess
 
 
+@router.post(
+    path="/{product_id}/inspection-sessions/batch",
+    status_code=status.HTTP_201_CREATED,
+    tags=["inspection-sessions"],
+    openapi_extra=batch_openapi_body(InspectionSessionCreateDTO),
+)
+async def create_inspection_sessions_batch(
+    product_id: int,
+    request: Request,
+    product_dao: ProductDAO = Depends(),
+    isp_sess_dao: InspectionSessionDAO = Depends(),
+    rollup_dao: DefectRateRollupDAO = Depends(),
+) -> InspectionSessionBatchResultDTO:
+    """
+    Creates inspection sessions from a JSON array or NDJSON body in a few INSERT statements.
+
+    `ids` follows the request order. A session is unique by `image_s3_key` plus the
+    required `session_started_at`, so a retried batch creates nothing new. Rows that
+    already exist, or repeat an earlier row of the batch, are reported in `conflicts`
+    instead.
+    """
+    payloads = await read_batch(
+        request,
+        InspectionSessionCreateDTO,
+        settings.batch_max_rows,
+        settings.batch_max_bytes,
+    )
+    missing = [
+        {"type": "missing", "loc": ("body", index, field), "msg": "Field required", "input": None}
+        for index, payload in enumerate(payloads)
+        for field in ("start_mmap_session_uuid", "start_mmap_session_ptr")
+        if getattr(payload, field) is None
+    ]
+    if missing:
+        raise RequestValidationError(missing)
+    if not await product_dao.get(product_id):
+        raise HTTPException(status.HTTP_404_NOT_FOUND, f"Product <id: {product_id} Not Found")
+
+    conflicts = []
+    unique = {}
+    for index, payload in enumerate(payloads):
+        payload.product_id = product_id
+        key = (payload.image_s3_key, naive_utc(payload.session_started_at))
+        if key in unique:
+            conflicts.append(
+                InspectionSessionConflictDTO(
+                    index=index,
+                    image_s3_key=key[0],
+                    session_started_at=key[1],
+                    reason="duplicate",
+                ),
+            )
+        else:
+            unique[key] = index
+
+    created = await isp_sess_dao.create_many([payloads[index] for index in unique.values()])
+    await rollup_dao.record_sessions(product_id, (started_at for _, started_at in created))
+    await isp_sess_dao.session.commit()
+
+    ids: list[int | None] = [None] * len(payloads)
+    for key, index in unique.items():
+        if key in created:
+            ids[index] = created[key]
+        else:
+            conflicts.append(
+                InspectionSessionConflictDTO(
+                    index=index,
+                    image_s3_key=key[0],
+                    session_started_at=key[1],
+                    reason="exists",
+                ),
+            )
+    conflicts.sort(key=lambda conflict: conflict.index)
+    logger.info(f"Batch of {len(payloads)} inspection sessions: {len(created)} created")
+    return InspectionSessionBatchResultDTO(ids=ids, conflicts=conflicts)
+
+
 @router.get(
     path="/{product_id}/inspection-sessions",
     tags=["inspection-sessions"],
 )
 async def get_inspection_sessions(
     product_id: int,
-    page: int = 0,
-    size: int = 20,
+    response: Response,
+    cursor: str | None = None,
+    size: Annotated[int, Query(ge=1, le=100)] = 20,
     dao: InspectionSessionDAO = Depends(),
 ) -> list[InspectionSessionDTO]:
-    d = await dao.get_all(product_id, offset=page, limit=size)
-    return d
+    """
+    Latest sessions first.
+
+    Pass the `X-Next-Cursor` / `X-Prev-Cursor` response header as `cursor` for the next page.
+    """
+    page = await dao.get_all(product_id, cursor, limit=size)
+    set_cursor_headers(response, page)
+    return page.items
 
 
 # TODO: 인조키가 아닌 식별 가능한 복합키를 고안할 것.
@@ -126,7 +255,7 @@ async def get_inspection_session_by_id(
     d = await dao.get_by_id(product_id, isp_sess_id)
     if not d:
         raise HTTPException(status.HTTP_404_NOT_FOUND, f"Product <id: {product_id} Not Found")
-    logger.debug(d.image_s3_key)
+    debug("{}", d.image_s3_key)
     # DTO에서 기본적으로 relationship field를 집어넣으려면 selectinload or joinedload를 사용해서 미리 넣어둔다.
     # 그렇지 않고 때때로 쓰거나 쓰지 않으면 AsyncAttrs Mixin에 의해 lazyload하도록 둔다.
     # https://docs.sqlalchemy.org/en/20/orm/extensions/asyncio.html#preventing-implicit-io-when-using-asyncsession
@@ -135,6 +264,125 @@ async def get_inspection_session_by_id(
     return d
 
 
+@router.get(
+    path="/{product_id}/inspection-sessions/{isp_sess_id}/image",
+    tags=["inspection-sessions"],
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/octet-stream": {}, "image/png": {}}}},
+)
+async def get_inspection_session_image(
+    product_id: int,
+    isp_sess_id: int,
+    format: Literal["raw", "png"] = "raw",
+    isp_sess_dao: InspectionSessionDAO = Depends(),
+    mmap_sess_dao: MmapSessionDAO = Depends(),
+    reader: MmapFrameReader = Depends(get_frame_reader),
+):
+    """
+    Scan lines of the session, from the start ptr through the end ptr.
+
+    `raw` streams the pixels as stored, `png` a grayscale PNG of `mmap_line_width` pixels wide.
+    A session without an end is read up to the end of its start buffer.
+    """
+    spans = await get_isp_sess_spans(product_id, isp_sess_id, isp_sess_dao, mmap_sess_dao, reader)
+
+    size = sum(span.size for span in spans)
+    lines = size // reader.line_bytes
+    if format == "png":
+        if not lines:
+            raise HTTPException(status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, "Empty image")
+        return StreamingResponse(
+            encode_png(
+                reader.iter_bytes(spans),
+                settings.mmap_line_width,
+                lines,
+                settings.mmap_bytes_per_pixel,
+            ),
+            media_type="image/png",
+        )
+    return StreamingResponse(
+        reader.iter_bytes(spans),
+        media_type="application/octet-stream",
+        headers={
+            "Content-Length": str(size),
+            "X-Scan-Line-Bytes": str(reader.line_bytes),
+            "X-Scan-Lines": str(lines),
+        },
+    )
+
+
+def _render_preview_png(
+    spans: list[FrameSpan],
+    reader: MmapFrameReader,
+    params: ImageInspectionPreviewPostprocessing,
+    max_width: int,
+) -> bytes:
+    preview = render_preview(
+        b"".join(reader.iter_bytes(spans)),
+        settings.mmap_line_width,
+        settings.mmap_bytes_per_pixel,
+        params,
+        max_width,
+    )
+    return preview_png(preview)
+
+
+@router.get(
+    path="/{product_id}/inspection-sessions/{isp_sess_id}/preview",
+    tags=["inspection-sessions"],
+    response_class=Response,
+    responses={200: {"content": {"image/png": {}}}},
+)
+async def get_inspection_session_preview(
+    product_id: int,
+    isp_sess_id: int,
+    gamma: int | None = None,
+    inversion: int | None = None,
+    contrast: int | None = None,
+    sharpening: int | None = None,
+    width: Annotated[int | None, Query(ge=1)] = None,
+    isp_sess_dao: InspectionSessionDAO = Depends(),
+    mmap_sess_dao: MmapSessionDAO = Depends(),
+    settings_dao: SettingsGlobalDAO = Depends(),
+    reader: MmapFrameReader = Depends(get_frame_reader),
+    cache: ThumbnailCache = Depends(get_thumbnail_cache),
+):
+    """
+    Post-processed 8-bit PNG preview of the session image.
+
+    Adjustments not given default to the global `Image.InspectionPreviewPostprocessing` setting,
+    `width` to `preview_max_width`. Rendered previews are cached on disk.
+    """
+    row = await settings_dao.get(PREVIEW_SETTING)
+    try:
+        params = ImageInspectionPreviewPostprocessing.model_validate(row.value if row else {})
+    except ValidationError:
+        logger.warning(f"Invalid {PREVIEW_SETTING}: {row.value!r}")
+        params = ImageInspectionPreviewPostprocessing()
+    overrides = {
+        "gamma": gamma,
+        "inversion": inversion,
+        "contrast": contrast,
+        "sharpening": sharpening,
+    }
+    params = params.model_copy(
+        update={name: value for name, value in overrides.items() if value is not None},
+    )
+    max_width = width or settings.preview_max_width
+
+    spans = await get_isp_sess_spans(product_id, isp_sess_id, isp_sess_dao, mmap_sess_dao, reader)
+    size = sum(span.size for span in spans)
+    if not size:
+        raise HTTPException(status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, "Empty image")
+    # 진행 중인 session은 이미지가 자라므로 크기도 key에 포함
+    key = cache.key(product_id, isp_sess_id, size, sorted(params.model_dump().items()), max_width)
+    png = await run_in_threadpool(cache.get, key)
+    if png is None:
+        png = await run_in_threadpool(_render_preview_png, spans, reader, params, max_width)
+        await run_in_threadpool(cache.put, key, png)
+    return Response(png, media_type="image/png")
+
+
 @router.post(
     path="/{product_id}/defects",
     status_code=status.HTTP_201_CREATED,
@@ -143,26 +391,144 @@ async def get_inspection_session_by_id(
 async def create_defect(
     product_id: int,
     payload: DefectCreateDTO,
-    isp_sess_dao: DefectDAO = Depends(),
+    isp_sess_dao: InspectionSessionDAO = Depends(),
+    defect_dao: DefectDAO = Depends(),
+    rollup_dao: DefectRateRollupDAO = Depends(),
 ) -> DefectDTO:
-    # TODO: integrity check
     payload.product_id = product_id
-    new_defect = await isp_sess_dao.create(payload)
+    # 파티션 키(session_started_at)를 session에서 가져온다
+    isp_sess = await isp_sess_dao.get_by_id(product_id, payload.inspection_session_id)
+    if not isp_sess:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            f"InspectionSession <id: {payload.inspection_session_id}> "
+            f"of Product <id: {product_id}> Not Found",
+        )
+    await rollup_dao.record_defects(
+        product_id,
+        payload.inspection_session_id,
+        [payload.defect_category],
+    )
+    new_defect = await defect_dao.create(payload, isp_sess)
     logger.info(new_defect.__dict__)
     return new_defect
 
 
+@router.post(
+    path="/{product_id}/inspection-sessions/{isp_sess_id}/defects/batch",
+    status_code=status.HTTP_201_CREATED,
+    tags=["product-defects"],
+    openapi_extra=batch_openapi_body(SessionDefectCreateDTO),
+)
+async def create_session_defects_batch(
+    product_id: int,
+    isp_sess_id: int,
+    request: Request,
+    isp_sess_dao: InspectionSessionDAO = Depends(),
+    defect_dao: DefectDAO = Depends(),
+    rollup_dao: DefectRateRollupDAO = Depends(),
+) -> list[int]:
+    """Creates every defect of one inspection session in a single INSERT, returning ids in order."""
+    payloads = await read_batch(
+        request,
+        SessionDefectCreateDTO,
+        settings.batch_max_rows,
+        settings.batch_max_bytes,
+    )
+    isp_sess = await isp_sess_dao.get_by_id(product_id, isp_sess_id)
+    if not isp_sess:
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND,
+            f"InspectionSession <id: {isp_sess_id}> of Product <id: {product_id}> Not Found",
+        )
+    await rollup_dao.record_defects(
+        product_id,
+        isp_sess_id,
+        (payload.defect_category for payload in payloads),
+    )
+    ids = await defect_dao.create_many(isp_sess, payloads)
+    await defect_dao.session.commit()
+    debug("{} defects of InspectionSession <id: {}> created", len(ids), isp_sess_id)
+    return ids
+
+
 @router.get(
     path="/{product_id}/defects",
     tags=["product-defects"],
 )
 async def get_defects(
     product_id: int,
+    response: Response,
     isp_sess_id: int | None = None,
     defect_category: int | None = None,
+    cursor: str | None = None,
+    size: Annotated[int, Query(ge=1, le=1000)] = 100,
     dao: DefectDAO = Depends(),
 ) -> list[DefectDTO]:
-    defect_category = DefectCategory(defect_category)
-    print(defect_category)
-    d = await dao.filter(product_id, isp_sess_id, defect_category)
-    return d
+    """Latest defects first, paginated like the inspection sessions."""
+    category = DefectCategory(defect_category) if defect_category is not None else None
+    debug("category={!r}", category)
+    page = await dao.filter(product_id, isp_sess_id, category, cursor, limit=size)
+    set_cursor_headers(response, page)
+    return page.items
+
+
+def _rate(ng_session_count: int, session_count: int) -> float:
+    return ng_session_count / session_count if session_count else 0.0
+
+
+@router.get(
+    path="/{product_id}/defect-rate",
+    tags=["product-defects"],
+)
+async def get_defect_rate(
+    product_id: int,
+    from_: Annotated[datetime, Query(alias="from")],
+    to: datetime,
+    bucket: RollupGranularity = RollupGranularity.HOUR,
+    dao: DefectRateRollupDAO = Depends(),
+) -> DefectRateDTO:
+    """
+    Defect rate (NG sessions / sessions) per hour or day bucket, read from the rollup tables.
+
+    Buckets are aligned to UTC, and the bucket containing `from` is included.
+    """
+    rates, categories = await dao.get_buckets(product_id, bucket, naive_utc(from_), naive_utc(to))
+
+    bucket_categories = defaultdict(list)
+    total_defects: Counter[DefectCategory] = Counter()
+    total_ng_sessions: Counter[DefectCategory] = Counter()
+    for row in categories:
+        bucket_categories[row.bucket_start].append(
+            DefectCategoryCountDTO.model_validate(row, from_attributes=True),
+        )
+        total_defects[row.defect_category] += row.defect_count
+        total_ng_sessions[row.defect_category] += row.ng_session_count
+
+    session_count = sum(row.session_count for row in rates)
+    ng_session_count = sum(row.ng_session_count for row in rates)
+    return DefectRateDTO(
+        product_id=product_id,
+        bucket=bucket,
+        session_count=session_count,
+        ng_session_count=ng_session_count,
+        defect_rate=_rate(ng_session_count, session_count),
+        categories=[
+            DefectCategoryCountDTO(
+                defect_category=category,
+                defect_count=count,
+                ng_session_count=total_ng_sessions[category],
+            )
+            for category, count in total_defects.items()
+        ],
+        buckets=[
+            DefectRateBucketDTO(
+                bucket_start=row.bucket_start,
+                session_count=row.session_count,
+                ng_session_count=row.ng_session_count,
+                defect_rate=_rate(row.ng_session_count, row.session_count),
+                categories=bucket_categories[row.bucket_start],
+            )
+            for row in rates
+        ],
+    )
@@ -1,10 +1,12 @@
 from fastapi.routing import APIRouter
 
 from xray_swagger.web.api import (
+    detection,
     dummy,
     echo,
     mmap_session,
     monitoring,
+    preprocessor,
     products,
     redis,
     settings,
@@ -21,3 +23,5 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(settings.router, prefix="/settings", tags=["settings"])
 api_router.include_router(products.router, prefix="/products", tags=["products"])
 api_router.include_router(mmap_session.router, prefix="/mmap", tags=["mmap"])
+api_router.include_router(preprocessor.router, prefix="/preprocessor", tags=["preprocessor"])
+api_router.include_router(detection.router, prefix="/detection", tags=["detection"])
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Literal
 
 from pydantic import BaseModel, ConfigDict, Field
 from pydantic.json_schema import JsonSchemaValue
@@ -67,3 +68,13 @@ class SettingsProductUpdateDTO(BaseModel):
 
 class FullSettingsProductDTO(TimestampMixin, AuthorMixin, SettingsProductDTO):
     ...
+
+
+class SettingsChangeEventDTO(BaseModel):
+    """Compact notification of a changed setting. Clients fetch the new value by themselves."""
+
+    scope: Literal["global", "product"]
+    setting_param_name: str
+    product_id: int | None = None
+    version: int | None = None
+    changed_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,16 +1,27 @@
+import asyncio
 import json
 from typing import Any
 
-import fastjsonschema
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, Response, WebSocket, status
 from fastapi.param_functions import Depends
-from loguru import logger
+from pydantic import TypeAdapter
+from xray_settings.validators import validator_registry
 
 from xray_swagger.db.dao.settings_dao import (
     SettingsGlobalDAO,
     SettingsProductDAO,
     SettingsProductParameterDAO,
 )
+from xray_swagger.logging import debug
+from xray_swagger.services.redis.pubsub import SettingsChangePublisher
+from xray_swagger.services.redis.settings_cache import ProductSettingsCache
+from xray_swagger.web.api.etag import (
+    digest_etag,
+    is_not_modified,
+    make_etag,
+    not_modified,
+    timestamp_etag,
+)
 from xray_swagger.web.middlewares.permissions import (
     IsAuthenticated,
     IsEngineer,
@@ -20,6 +31,7 @@ from xray_swagger.web.middlewares.permissions import (
 
 from .schema import (
     FullSettingsProductDTO,
+    SettingsChangeEventDTO,
     SettingsGlobalDTO,
     SettingsProductDTO,
     SettingsProductParameterDTO,
@@ -28,12 +40,20 @@ from .schema import (
 
 router = APIRouter()
 
+SettingsBundle = TypeAdapter(list[SettingsProductDTO])
+
 
 @router.get(path="/global", response_model=list[SettingsGlobalDTO])
 async def get_all_global_settings(
+    request: Request,
+    response: Response,
     dao: SettingsGlobalDAO = Depends(),
 ):
     d = await dao.get_all()
+    etag = timestamp_etag("sg", len(d), modified_at=(row.modified_at for row in d))
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
     return d
 
 
@@ -45,10 +65,14 @@ async def update_watchdog_timer(
     new_value: bool,
     authorize: bool = Depends(PermissionsDependency([IsAuthenticated, IsEngineer])),
     dao: SettingsGlobalDAO = Depends(),
+    publisher: SettingsChangePublisher = Depends(),
 ):
-    logger.debug(f"User permission check <IsEngineer> passed? {authorize=}")
+    debug("User permission check <IsEngineer> passed? authorize={}", authorize)
     d = await dao.get("Watchdog.Timer")
     await dao.update(d, new_value)
+    await publisher.publish(
+        SettingsChangeEventDTO(scope="global", setting_param_name=d.setting_param_name),
+    )
 
     return d
 
@@ -61,9 +85,13 @@ async def update_watchdog_timer(
 async def update_conveyor_direction(
     new_value: int,
     dao: SettingsGlobalDAO = Depends(),
+    publisher: SettingsChangePublisher = Depends(),
 ):
     d = await dao.get("Conveyor.Direction")
     await dao.update(d, new_value)
+    await publisher.publish(
+        SettingsChangeEventDTO(scope="global", setting_param_name=d.setting_param_name),
+    )
 
     return d
 
@@ -76,9 +104,13 @@ async def update_conveyor_direction(
 async def update_inspection_mode(
     new_value: int,
     dao: SettingsGlobalDAO = Depends(),
+    publisher: SettingsChangePublisher = Depends(),
 ):
     d = await dao.get("Inspection.Mode")
     await dao.update(d, new_value)
+    await publisher.publish(
+        SettingsChangeEventDTO(scope="global", setting_param_name=d.setting_param_name),
+    )
 
     return d
 
@@ -92,7 +124,7 @@ async def get_settings_product_params(
     dao: SettingsProductParameterDAO = Depends(),
 ):
     if name_query:
-        logger.debug(f"{name_query=}")
+        debug("name_query={!r}", name_query)
         d = await dao.filter(name_query)
     else:
         d = await dao.get_all()
@@ -100,8 +132,8 @@ async def get_settings_product_params(
     if not d:
         raise HTTPException(status.HTTP_404_NOT_FOUND)
 
-    logger.debug(f"{len(d)=}")
-    logger.debug(d[0].__dict__)
+    debug("len(d)={}", len(d))
+    debug("{}", d[0].__dict__)
 
     return d
 
@@ -116,6 +148,42 @@ async def get_settings_product_param_by_name(
     return SettingsProductParameterDTO.model_validate(d)
 
 
+@router.websocket("/changes")
+async def watch_settings_changes(websocket: WebSocket, product_id: int | None = None):
+    """
+    Pushes a `SettingsChangeEventDTO` JSON text message for every changed setting.
+
+    With `product_id`, product scoped events of the other products are skipped.
+    """
+    hub = websocket.app.state.settings_hub
+    await websocket.accept()
+    queue = hub.subscribe()
+    disconnected = asyncio.create_task(_wait_disconnect(websocket))
+    try:
+        while True:
+            next_event = asyncio.create_task(queue.get())
+            await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                next_event.cancel()
+                break
+            data = next_event.result()
+            if product_id is not None:
+                event = json.loads(data)
+                if event["scope"] == "product" and event["product_id"] != product_id:
+                    continue
+            await websocket.send_text(data.decode())
+    finally:
+        hub.unsubscribe(queue)
+        disconnected.cancel()
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
 ##########################################################################################
 #
 ##########################################################################################
@@ -134,9 +202,11 @@ async def create_product_setting(
     value: Any,
     settings_product_dao: SettingsProductDAO = Depends(),
     param_dao: SettingsProductParameterDAO = Depends(),
+    cache: ProductSettingsCache = Depends(),
+    publisher: SettingsChangePublisher = Depends(),
 ):
-    logger.debug(f"{setting_param_name}")
-    logger.debug(f"{value}({type(value)})")
+    debug("{}", setting_param_name)
+    debug("{}({})", value, type(value))
     param = await param_dao.get(setting_param_name)
     if not param:
         HTTPException(
@@ -145,10 +215,9 @@ async def create_product_setting(
         )
     param_schema = param.json_schema
     value = json.loads(value)
-    logger.debug(f"{value}({type(value)})")
-    json_validator = fastjsonschema.compile(param_schema)
-    value = json_validator(value)
-    logger.debug(f"{value}({type(value)})")
+    debug("{}({})", value, type(value))
+    value = await validate(setting_param_name, value, param_schema)
+    debug("{}({})", value, type(value))
     # insert
     new_row = FullSettingsProductDTO(
         setting_param_name=setting_param_name,
@@ -159,6 +228,17 @@ async def create_product_setting(
         last_editor_id=1,
     )
     await settings_product_dao.create(new_row)
+    # 캐시를 다시 채우는 요청이 이전 값을 읽지 않도록 commit 후에 무효화한다.
+    await settings_product_dao.session.commit()
+    await cache.invalidate(product_id)
+    await publisher.publish(
+        SettingsChangeEventDTO(
+            scope="product",
+            setting_param_name=setting_param_name,
+            product_id=product_id,
+            version=new_row.version,
+        ),
+    )
 
 
 @products_router.get(
@@ -167,11 +247,29 @@ async def create_product_setting(
     tags=["settings"],
 )
 async def get_all_product_settings(
+    request: Request,
     product_id: int,  # TODO: set current product to session
     dao: SettingsProductDAO = Depends(),
+    cache: ProductSettingsCache = Depends(),
 ):
-    d = await dao.filter_by_product(product_id)
-    return d
+    # 캐시된 ETag로 확인 가능하면 DB 조회 없이 304를 응답한다.
+    cached_etag = await cache.get_etag(product_id)
+    if cached_etag is not None and is_not_modified(request, cached_etag):
+        return not_modified(cached_etag)
+
+    cached = await cache.get(product_id)
+    if cached is None:
+        generation = await cache.generation(product_id)
+        d = await dao.filter_by_product(product_id)
+        versions = [(row.setting_param_name, row.version) for row in d]
+        etag = digest_etag("ps", product_id, versions=versions)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        bundle = SettingsBundle.dump_json(SettingsBundle.validate_python(d, from_attributes=True))
+        await cache.set(product_id, generation, max((v for _, v in versions), default=0), etag, bundle)
+    else:
+        etag, bundle = cached
+    return Response(content=bundle, media_type="application/json", headers={"ETag": etag})
 
 
 @products_router.get(
@@ -180,11 +278,18 @@ async def get_all_product_settings(
     tags=["settings"],
 )
 async def get_product_setting(
+    request: Request,
+    response: Response,
     product_id: int,
     setting_param_name: str,
     dao: SettingsProductDAO = Depends(),
 ):
     d = await dao.get(product_id, setting_param_name)
+    if d is not None:
+        etag = make_etag("ps", product_id, setting_param_name, d.version)
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
     return d
 
 
@@ -200,8 +305,10 @@ async def update_product_setting(
     value: Any,
     settings_product_dao: SettingsProductDAO = Depends(),
     param_dao: SettingsProductParameterDAO = Depends(),
+    cache: ProductSettingsCache = Depends(),
+    publisher: SettingsChangePublisher = Depends(),
 ):
-    logger.debug(f"{value=}({type(value)})")
+    debug("value={!r}({})", value, type(value))
     param = await param_dao.get(setting_param_name)
     settings_product = await settings_product_dao.get(product_id, setting_param_name)
     if not param or not settings_product:
@@ -210,20 +317,31 @@ async def update_product_setting(
             f"Not found settings param: {setting_param_name}",
         )
     old_value = settings_product.value
-    logger.debug(f"{settings_product=!s}")
+    debug("settings_product={!s}", settings_product)
 
-    value = await validate(json.loads(value), param.json_schema)
-    logger.debug(f"{value=}({type(value)})")
-    logger.debug(f"{old_value=} == {value=}")
+    value = await validate(setting_param_name, json.loads(value), param.json_schema)
+    debug("value={!r}({})", value, type(value))
+    debug("old_value={!r} == value={!r}", old_value, value)
     # Update only when the new value is not equal to the old value
     if old_value != value:  # TODO: non hashable type comparison
         version = settings_product.version + 1
         update_payload = SettingsProductUpdateDTO(version=version, value=value, last_editor_id=2)
         await settings_product_dao.update(settings_product, update_payload)
+        # 캐시를 다시 채우는 요청이 이전 값을 읽지 않도록 commit 후에 무효화한다.
+        await settings_product_dao.session.commit()
+        await cache.invalidate(product_id)
+        await publisher.publish(
+            SettingsChangeEventDTO(
+                scope="product",
+                setting_param_name=setting_param_name,
+                product_id=product_id,
+                version=version,
+            ),
+        )
 
     return settings_product
 
 
-async def validate(value: Any, schema: dict):
-    json_validator = fastjsonschema.compile(schema)
+async def validate(setting_param_name: str, value: Any, schema: dict):
+    json_validator = validator_registry.get(setting_param_name, schema)
     return json_validator(value)
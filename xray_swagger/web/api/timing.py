@@ -0,0 +1,15 @@
+"""`Server-Timing` header of the endpoints reporting their processing steps."""
+from typing import Iterable
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+
+def server_timing(timings: Iterable[tuple[str, float]]) -> str:
+    """
+    Header value of (step name, seconds) pairs, in milliseconds.
+
+    Steps are prefixed with their index, so repeated names stay distinct.
+    """
+    return ", ".join(
+        f"{index}-{name};dur={seconds * 1000:.3f}" for index, (name, seconds) in enumerate(timings)
+    )
@@ -26,6 +26,12 @@ class UserModelDTO(BaseModel):
     authlevel: AuthLevel
 
 
+class CurrentUserDTO(UserModelDTO):
+    """The user of a bearer token, as cached between requests."""
+
+    id: int
+
+
 class UserCreateDTO(BaseModel):
     """Schema for User creation"""
 
@@ -1,10 +1,15 @@
+from pprint import pformat
 from typing import Annotated
 
 from fastapi import APIRouter, HTTPException, Request, status
 from fastapi.param_functions import Depends
 from loguru import logger
+from redis.asyncio import ConnectionPool
 
 from xray_swagger.db.dao.user_dao import UserDAO
+from xray_swagger.logging import debug
+from xray_swagger.services.redis.dependency import get_redis_pool
+from xray_swagger.services.redis.user_cache import UserCache, get_user_cache
 from xray_swagger.web.api.deps import get_current_active_user
 from xray_swagger.web.middlewares.permissions import (
     IsAuthenticated,
@@ -21,8 +26,8 @@ router = APIRouter()
 def read_current_user(
     user: Annotated[UserModelDTO, Depends(get_current_active_user)],
 ) -> UserModelDTO:
-    logger.debug(type(user))
-    logger.debug(user)
+    debug("{}", type(user))
+    debug("{}", user)
     return user
 
 
@@ -71,12 +76,10 @@ async def read_all_user(
     authorize: bool = Depends(PermissionsDependency([IsAuthenticated, IsSupervisor])),
     user_dao: UserDAO = Depends(),
 ):
-    from pprint import pformat
-
-    logger.debug(request)
-    logger.debug(pformat(request.scope))
-    logger.debug(pformat(request.headers.__dict__))
-    logger.debug(pformat(request.state.__dict__))
+    debug("{}", request)
+    debug("{}", lambda: pformat(request.scope), lazy=True)
+    debug("{}", lambda: pformat(request.headers.__dict__), lazy=True)
+    debug("{}", lambda: pformat(request.state.__dict__), lazy=True)
     # logger.debug(request.auth)
     # logger.debug(request.user)
     # logger.debug(request.session)
@@ -100,7 +103,7 @@ async def read_user_by_id(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Specified user not found",
         )
-    print(user.__dict__)
+    debug("{}", user.__dict__)
     # return UserModelDTO.model_validate(user)
     return user
 
@@ -111,6 +114,8 @@ async def update_user(
     user_id: int,
     update_payload: UserUpdateDTO,
     user_dao: UserDAO = Depends(),
+    redis_pool: ConnectionPool = Depends(get_redis_pool),
+    user_cache: UserCache = Depends(get_user_cache),
 ):
     user = await user_dao.get_by_id(user_id)
 
@@ -122,7 +127,11 @@ async def update_user(
     logger.info(
         f"Update user[{user.username}] with: {update_payload.model_dump(exclude_none=True)}",
     )
+    username = user.username
     user = await user_dao.update(user, update_payload)
+    # commit 전에 무효화하면 그 사이에 이전 row를 읽은 요청이 캐시를 다시 채운다
+    await user_dao.session.commit()
+    await user_cache.invalidate(redis_pool, username)
 
     return user
 
@@ -135,6 +144,8 @@ async def delete_user(
     *,
     user_id: int,
     user_dao: UserDAO = Depends(),
+    redis_pool: ConnectionPool = Depends(get_redis_pool),
+    user_cache: UserCache = Depends(get_user_cache),
 ):
     user = await user_dao.get_by_id(user_id)
 
@@ -146,3 +157,4 @@ async def delete_user(
     logger.info(f"Delete user[{user.username}]")
 
     await user_dao.delete(user)
+    await user_cache.invalidate(redis_pool, user.username)
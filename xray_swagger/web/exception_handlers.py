@@ -7,6 +7,8 @@ from fastapi.exceptions import ResponseValidationError
 from fastapi.responses import UJSONResponse
 from loguru import logger
 
+from xray_swagger.db.dao._keyset import InvalidCursor
+
 if typing.TYPE_CHECKING:
     from fastapi import Request
 
@@ -32,3 +34,13 @@ def register_exception_handlers(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content=validation_errors,
         )
+
+    @app.exception_handler(InvalidCursor)
+    async def _invalid_cursor_handler(
+        _: Request,
+        exc: InvalidCursor,
+    ):
+        return UJSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "Invalid cursor."},
+        )
@@ -1,46 +1,25 @@
 from __future__ import annotations
 
-import re
-from typing import TYPE_CHECKING, Awaitable, Callable
+import asyncio
+from typing import Awaitable, Callable
 
 from fastapi import FastAPI
 from loguru import logger
-from sqlalchemy import Engine, event
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
-
-from xray_swagger.services.redis.lifetime import init_redis, shutdown_redis
+from xray_settings.validators import validator_registry
+
+from xray_swagger.db.dao.settings_dao import SettingsGlobalDAO, SettingsProductParameterDAO
+from xray_swagger.db.partitions import run_partition_manager
+from xray_swagger.db.tracing import get_query_tracer
+from xray_swagger.services.redis.lifetime import (
+    init_redis,
+    init_settings_hub,
+    shutdown_redis,
+    shutdown_settings_hub,
+)
 from xray_swagger.settings import settings
 
-if TYPE_CHECKING:
-    from sqlalchemy.engine import ExecutionContext
-    from sqlalchemy.engine.base import Connection
-    from sqlalchemy.engine.interfaces import DBAPICursor, _DBAPIAnyExecuteParams
-
-    # from sqlalchemy.dialects.postgresql.asyncpg import AsyncAdapt_asyncpg_cursor
-    # from sqlalchemy.dialects.postgresql.asyncpg import PGExecutionContext_asyncpg
-
-STMT_INTPLTN = re.compile(r"\$(\d+)")
-
-
-@event.listens_for(Engine, "before_cursor_execute")
-def receive_before_cursor_execute(
-    conn: Connection,
-    cursor: DBAPICursor,
-    statement: str,
-    parameters: _DBAPIAnyExecuteParams,
-    context: ExecutionContext,
-    executemany: bool,
-):
-    "listen for the 'before_cursor_execute' event"
-    logger.debug("\n====================================================")
-    logger.debug(context.dialect.name)
-    if parameters:
-        sub_statement = re.sub(STMT_INTPLTN, r'"{\1}"', statement)
-        # logger.debug(sub_statement)
-        logger.debug("\n" + sub_statement.format(None, *parameters))
-    else:
-        logger.debug("\n" + statement)
-
 
 def _setup_db(app: FastAPI) -> None:  # pragma: no cover
     """
@@ -59,6 +38,53 @@ def _setup_db(app: FastAPI) -> None:  # pragma: no cover
     )
     app.state.db_engine = engine
     app.state.db_session_factory = session_factory
+    get_query_tracer().set_sample_rate(settings.query_trace_sample_rate)
+
+
+async def _warm_validators(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Compiles JSON schema validators of every settings parameter.
+
+    A database failure only leaves the registry cold,
+    validators are then compiled on the first write.
+
+    :param app: fastAPI application.
+    """
+    try:
+        async with app.state.db_session_factory() as session:
+            params = await SettingsProductParameterDAO(session).get_all()
+            global_settings = await SettingsGlobalDAO(session).get_all()
+    except (SQLAlchemyError, OSError) as err:
+        logger.warning(f"Skip warming validators: {err}")
+        return
+
+    for row in [*params, *global_settings]:
+        validator_registry.warm(row.setting_param_name, row.json_schema)
+    logger.info(f"Validators warmed: {validator_registry.stats()}")
+
+
+def _start_partition_manager(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Starts the monthly partition maintenance of inspection_session and defect.
+
+    :param app: fastAPI application.
+    """
+    app.state.partition_manager = None
+    if settings.partition_maintenance_interval > 0:
+        app.state.partition_manager = asyncio.create_task(
+            run_partition_manager(app.state.db_session_factory),
+        )
+
+
+async def _stop_partition_manager(app: FastAPI) -> None:  # pragma: no cover
+    task = app.state.partition_manager
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass  # noqa: WPS420
 
 
 def register_startup_event(
@@ -78,6 +104,9 @@ def register_startup_event(
     async def _startup() -> None:  # noqa: WPS430
         _setup_db(app)
         init_redis(app)
+        init_settings_hub(app)
+        await _warm_validators(app)
+        _start_partition_manager(app)
         pass  # noqa: WPS420
 
     return _startup
@@ -95,8 +124,10 @@ def register_shutdown_event(
 
     @app.on_event("shutdown")
     async def _shutdown() -> None:  # noqa: WPS430
+        await _stop_partition_manager(app)
         await app.state.db_engine.dispose()
 
+        await shutdown_settings_hub(app)
         await shutdown_redis(app)
         pass  # noqa: WPS420
 
@@ -3,9 +3,9 @@ from typing import TYPE_CHECKING, Annotated
 
 from fastapi import HTTPException, Request, status
 from fastapi.param_functions import Depends
-from loguru import logger
 
 from xray_swagger.db.models.user import AuthLevel
+from xray_swagger.logging import debug
 from xray_swagger.web.api.deps import get_current_active_user
 
 if TYPE_CHECKING:
@@ -64,11 +64,11 @@ class IsAuthenticated(BasePermission):
     status_code = status.HTTP_401_UNAUTHORIZED
 
     def has_required_permissions(self, request: Request, user: "UserModelDTO") -> bool:
-        logger.debug("=== Is Authenticated?")
-        logger.debug(user)
-        logger.debug(user.authlevel)
-        logger.debug(type(request))
-        logger.debug(request.state.__dict__)
+        debug("=== Is Authenticated?")
+        debug("{}", user)
+        debug("{}", user.authlevel)
+        debug("{}", type(request))
+        debug("{}", request.state.__dict__)
         return user is not None
 
 
@@ -77,11 +77,14 @@ class IsSupervisor(BasePermission):
     status_code = status.HTTP_403_FORBIDDEN
 
     def has_required_permissions(self, request: Request, user: "UserModelDTO") -> bool:
-        logger.debug("=== Is Supervisor?")
-        logger.debug(user)
-        logger.debug(f"{user.authlevel} = {user.authlevel.value}")
-        logger.debug(f"{AuthLevel.SUPERVISOR} = {AuthLevel.SUPERVISOR.value}")
-        logger.debug(f"{user.authlevel.value >= AuthLevel.SUPERVISOR.value=}")
+        debug("=== Is Supervisor?")
+        debug("{}", user)
+        debug("{} = {}", user.authlevel, user.authlevel.value)
+        debug("{} = {}", AuthLevel.SUPERVISOR, AuthLevel.SUPERVISOR.value)
+        debug(
+            "user.authlevel.value >= AuthLevel.SUPERVISOR.value={}",
+            user.authlevel.value >= AuthLevel.SUPERVISOR.value,
+        )
         return user.authlevel.value >= AuthLevel.SUPERVISOR.value
 
 
@@ -90,8 +93,8 @@ class IsEngineer(BasePermission):
     status_code = status.HTTP_403_FORBIDDEN
 
     def has_required_permissions(self, request: Request, user: "UserModelDTO") -> bool:
-        logger.debug("=== Is Engineer?")
-        logger.debug(f"{user.authlevel} = {user.authlevel.value}")
+        debug("=== Is Engineer?")
+        debug("{} = {}", user.authlevel, user.authlevel.value)
         return user.authlevel.value >= AuthLevel.ENGINEER.value
 
 
@@ -102,7 +105,7 @@ class PermissionsDependency:
     """
 
     def __init__(self, permissions_classes: list):
-        logger.debug("=== Permission List", permissions_classes)
+        debug("=== Permission List {}", permissions_classes)
         self.permissions_classes = permissions_classes
 
     def __call__(
@@ -110,7 +113,7 @@ class PermissionsDependency:
         request: Request,
         user: Annotated["UserModelDTO", Depends(get_current_active_user)],
     ):
-        logger.debug("Permission deps resolving".center(100, "#"))
+        debug("{:#^100}", "Permission deps resolving")
         for permission_class in self.permissions_classes:
             permission_class(request=request, user=user)
         return True